@@ -0,0 +1,111 @@
+"""
+Измерение времени отрисовки и размера PNG файлов трех графиков (профиль скорости, U+(Y+) в логарифмическом
+масштабе и коэффициент трения) при росте числа точек на линиях, с прореживанием кривых и без него, а также
+отличия изображений: доли отличающихся пикселей и наибольшего отличия цвета пикселя. Кривые строятся по
+синтетическим данным с добавленным шумом, чтобы прореживание сохраняло не только гладкую форму кривой.
+
+Пример: python decimation_benchmark.py --sizes 1e3 1e4 1e5 1e6
+"""
+from synthetic_data import project_dir, pln_set1_ends, FlowState, get_line_fields
+from pipeline_benchmark import get_commit, get_timing
+from plot_creation import get_velocity_profile_spec, get_u_plus_spec, get_friction_coefficient_spec
+from plot_rendering import CurveSpec, RenderJob, render_job, _init_worker
+import numpy as np
+import argparse
+import datetime
+import json
+import os
+import platform
+import tempfile
+import time
+import typing
+
+colors = ['red', 'blue', 'green']
+
+
+def get_curves(num_points: int, num_curves=3, noise=0.002, seed=0) -> typing.Dict[int, list]:
+    """
+    :return: словарь, ставящий в соответствие номеру линии список кривых (x, y, style) для графиков
+        профиля скорости, U+(Y+) и коэффициента трения
+    """
+    random = np.random.RandomState(seed)
+    result = {0: [], 1: [], 2: []}
+    for n in range(num_curves):
+        state = FlowState(velocity=88. * (1 + 0.02 * n))
+        for line, (start, end) in enumerate(pln_set1_ends):
+            fields = get_line_fields(start, end, num_points, state)
+            style = {'lw': 2, 'color': colors[n % len(colors)], 'label': 'case %s' % n, 'linestyle': '-'}
+            u = fields['U'] * (1 + noise * random.standard_normal(num_points))
+            if line == 0:
+                result[line].append((u, fields['Z'], style))
+            elif line == 1:
+                u_tau = np.sqrt(fields['wall_shear'] / state.density)
+                result[line].append((fields['y_plus'], u / u_tau, style))
+            else:
+                result[line].append((fields['X'], fields['cf'] * (1 + noise * random.standard_normal(num_points)),
+                                     style))
+    return result
+
+
+def get_image_difference(filename1, filename2) -> typing.Tuple[float, float]:
+    """
+    :return: доля отличающихся пикселей и наибольшее отличие значения канала цвета (от 0 до 1)
+    """
+    import matplotlib.image
+    image1, image2 = matplotlib.image.imread(filename1), matplotlib.image.imread(filename2)
+    difference = np.abs(image1 - image2).max(axis=2)
+    return float((difference > 0).mean()), float(difference.max())
+
+
+def run_benchmark(dirname, num_points: int, repeat=3) -> typing.List[dict]:
+    curves = get_curves(num_points)
+    spec_functions = {0: get_velocity_profile_spec, 1: get_u_plus_spec, 2: get_friction_coefficient_spec}
+    result = []
+    for line, get_spec in sorted(spec_functions.items()):
+        filenames = {}
+        for decimate in (False, True):
+            filename = os.path.join(dirname, 'line_%s_%s.png' % (line, 'decimated' if decimate else 'full'))
+            spec = get_spec(filename, [CurveSpec('synthetic', 'case_%s' % n, style['label'], style['color'])
+                                       for n, (_, _, style) in enumerate(curves[line])])
+            spec.decimate = decimate
+            job = RenderJob(spec, curves[line], [])
+            timings = get_timing(lambda: render_job(job), repeat)
+            filenames[decimate] = filename
+            result.append({'line': line, 'points': num_points, 'decimate': decimate, 'min': min(timings),
+                           'median': float(np.median(timings)), 'timings': timings,
+                           'png_bytes': os.path.getsize(filename)})
+        changed, max_difference = get_image_difference(filenames[False], filenames[True])
+        result[-1].update(changed_pixels=changed, max_pixel_difference=max_difference)
+    return result
+
+
+def get_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', type=lambda value: int(float(value)),
+                        default=[10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6], help='числа точек на линиях')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=os.path.join(project_dir, 'benchmarks', 'results',
+                                                          'decimation_%s.json' % time.strftime('%Y%m%d_%H%M%S')))
+    return parser
+
+
+if __name__ == '__main__':
+    _init_worker()
+    args = get_arg_parser().parse_args()
+    results = []
+    with tempfile.TemporaryDirectory() as dirname:
+        for num_points in args.sizes:
+            for record in run_benchmark(dirname, num_points, args.repeat):
+                results.append(record)
+                print('line %s, %8s points, %-9s min %8.4f s, %8s bytes%s' %
+                      (record['line'], num_points, 'decimated' if record['decimate'] else 'full', record['min'],
+                       record['png_bytes'],
+                       ', changed pixels %.4f%%, max difference %.3f' %
+                       (100 * record['changed_pixels'], record['max_pixel_difference'])
+                       if 'changed_pixels' in record else ''))
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as file:
+        json.dump({'commit': get_commit(), 'date': datetime.datetime.now().isoformat(),
+                   'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+                   'results': results}, file, indent=1)
+    print('results are saved to %s' % args.output)
@@ -0,0 +1,35 @@
+"""
+Измерение времени импорта модуля plot_creation. Каждый замер выполняется в отдельном процессе: полное время
+импорта и собственное время модуля (при заранее импортированном numpy).
+"""
+import subprocess
+import statistics
+import sys
+import os
+import typing
+
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+template = """
+import time
+%s
+start = time.perf_counter()
+import %s
+print(time.perf_counter() - start)
+"""
+
+
+def get_import_time(module_name, preimport='', repeat=7) -> typing.List[float]:
+    result = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', template % (preimport, module_name)],
+                                         cwd=project_dir)
+        result.append(float(output.decode().strip().splitlines()[-1]))
+    return result
+
+
+if __name__ == '__main__':
+    for name, preimport in (('total', ''), ('module only', 'import numpy')):
+        timings = get_import_time('plot_creation', preimport)
+        print('plot_creation import, %-12s min %7.1f ms, median %7.1f ms' %
+              (name, min(timings) * 1e3, statistics.median(timings) * 1e3))
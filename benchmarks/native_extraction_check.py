@@ -0,0 +1,155 @@
+"""
+Проверка извлечения данных по полилиниям без Tecplot (polyline_extraction) на синтетических сетках:
+интерполяция линейного поля на криволинейной сетке с точностью до ошибок округления, отбрасывание точек вне
+сетки и прерывание извлечения при большой доле таких точек, чтение файлов .plt с зонами ORDERED и FEBRICK,
+записанных write_plt.
+
+Пример: python native_extraction_check.py
+"""
+import numpy as np
+import os
+import struct
+import sys
+import tempfile
+import typing
+import warnings
+
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_dir not in sys.path:
+    sys.path.insert(0, project_dir)
+
+from tecplot_lib import PolyLine, Point
+from polyline_extraction import SolutionZone, get_structured_zone, get_ordered_cells, read_plt, CellLocator, \
+    NativeLineDataExtractor, plt_zone_marker, plt_end_of_header_marker, plt_ordered_zone, plt_febrick_zone
+from line_data import read_line_block_file
+
+variables = ['X', 'Y', 'Z', 'U']
+
+
+def get_linear_field(x, y, z):
+    return 2. * x - 3. * y + 0.5 * z + 1.
+
+
+def get_curvilinear_zone(shape=(9, 7, 6), distortion=0.15) -> SolutionZone:
+    """
+    :return: зона на искривленной сетке в кубе [0, 1]^3 (граница куба сохраняется) с линейным полем U
+    """
+    i, j, k = np.meshgrid(*[np.linspace(0, 1, n) for n in shape], indexing='ij')
+    bump = distortion * np.sin(np.pi * i) * np.sin(np.pi * j) * np.sin(np.pi * k)
+    x, y, z = i + bump, j + 0.5 * bump, k - 0.5 * bump
+    return get_structured_zone(variables, [x, y, z, get_linear_field(x, y, z)])
+
+
+def _pack_string(string: str) -> bytes:
+    return struct.pack('<%si' % (len(string) + 1), *[ord(char) for char in string], 0)
+
+
+def write_plt(filename, zones: typing.List[SolutionZone], shapes: typing.List[typing.Optional[tuple]]):
+    """
+    Записывает минимальный бинарный файл Tecplot версии 112 (значения double в узлах).
+
+    :param shapes: (IMax, JMax, KMax) для зон ORDERED, None для зон FEBRICK
+    """
+    names = zones[0].variables
+    header = b'#!TDV112' + struct.pack('<ii', 1, 0) + _pack_string('synthetic') + struct.pack('<i', len(names))
+    header += b''.join(_pack_string(name) for name in names)
+    data = b''
+    for n, (zone, shape) in enumerate(zip(zones, shapes)):
+        zone_type = plt_ordered_zone if shape is not None else plt_febrick_zone
+        header += struct.pack('<f', plt_zone_marker) + _pack_string('zone %s' % n)
+        header += struct.pack('<iidiiiii', -1, -1, 0., -1, zone_type, 0, 0, 0)
+        if shape is not None:
+            header += struct.pack('<3i', *shape)
+        else:
+            header += struct.pack('<5i', zone.data.shape[1], len(zone.cells), 0, 0, 0)
+        header += struct.pack('<i', 0)
+        data += struct.pack('<f', plt_zone_marker) + struct.pack('<%si' % len(names), *[2] * len(names))
+        data += struct.pack('<iii', 0, 0, -1)
+        data += struct.pack('<%sd' % (2 * len(names)), *np.array([zone.data.min(axis=1),
+                                                                   zone.data.max(axis=1)]).T.ravel())
+        data += np.ascontiguousarray(zone.data, dtype='<f8').tobytes()
+        if shape is None:
+            data += np.ascontiguousarray(zone.cells, dtype='<i4').tobytes()
+    with open(filename, 'wb') as file:
+        file.write(header + struct.pack('<f', plt_end_of_header_marker) + data)
+
+
+def check_linear_interpolation(num_points=2000, seed=0) -> float:
+    """
+    :return: наибольшее отклонение интерполированного линейного поля от точного
+    """
+    zone = get_curvilinear_zone()
+    points = 0.05 + 0.9 * np.random.RandomState(seed).random_sample((num_points, 3))
+    found, values = CellLocator([zone]).interpolate(points)
+    assert found.all(), '%s of %s interior points are not found' % (np.count_nonzero(~found), num_points)
+    error = np.abs(values[variables.index('U')] - get_linear_field(*points.T)).max()
+    assert error < 1e-10, 'Linear field is not reproduced: max error %.3e' % error
+    return error
+
+
+def check_lost_points(dirname):
+    """
+    Точки полилинии вне сетки не записываются; при доле больше max_lost_fraction извлечение прерывается.
+    """
+    datafiles_dir = os.path.join(dirname, 'lost_points')
+    os.makedirs(datafiles_dir)
+    zone = get_curvilinear_zone()
+    arrays = {name: values.reshape((9, 7, 6), order='F') for name, values in zip(variables, zone.data)}
+    np.savez(os.path.join(datafiles_dir, 'grid.npz'), variables=np.array(variables), **arrays)
+    # 100 точек от 0 до 1.5 по X: треть полилинии вне сетки
+    polylines = [[PolyLine([Point(0., 0.5, 0.5), Point(1.5, 0.5, 0.5)], 100)]]
+    output_dir = os.path.join(dirname, 'lost_points_output')
+    try:
+        NativeLineDataExtractor(datafiles_dir, output_dir, polylines).run_extraction()
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError('Extraction with 33% of lost points must fail')
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        NativeLineDataExtractor(datafiles_dir, output_dir, polylines, max_lost_fraction=0.5).run_extraction()
+    assert any('33 of 100' in str(warning.message) for warning in caught), 'Lost points are not reported'
+    block = read_line_block_file(os.path.join(output_dir, 'grid_line_0.dat'))
+    assert block.data.shape[1] == 67, 'Unexpected number of rows: %s' % block.data.shape[1]
+    assert np.all(block.data[variables.index('X')] <= 1.), 'Points outside the grid are written'
+
+
+def check_plt_reading(dirname) -> float:
+    """
+    Файл с зоной ORDERED и зоной FEBRICK (смещенной по X) считывается без изменений, извлечение из него дает
+    линейное поле.
+
+    :return: наибольшее отклонение извлеченного поля от точного
+    """
+    ordered = get_curvilinear_zone()
+    data = ordered.data.copy()
+    data[0] += 1.
+    data[3] = get_linear_field(*data[:3])
+    febrick = SolutionZone(variables, data, get_ordered_cells(9, 7, 6))
+    datafiles_dir = os.path.join(dirname, 'plt')
+    os.makedirs(datafiles_dir)
+    filename = os.path.join(datafiles_dir, 'grid.plt')
+    write_plt(filename, [ordered, febrick], [(9, 7, 6), None])
+    zones = read_plt(filename)
+    assert [zone.variables for zone in zones] == [variables, variables]
+    for zone, expected in zip(zones, (ordered, febrick)):
+        assert np.array_equal(zone.data, expected.data), 'Zone data differ'
+        assert np.array_equal(zone.cells, expected.cells), 'Zone cells differ'
+    polylines = [[PolyLine([Point(0.05, 0.3, 0.6), Point(1.95, 0.7, 0.4)], 200)]]
+    output_dir = os.path.join(dirname, 'plt_output')
+    NativeLineDataExtractor(datafiles_dir, output_dir, polylines).run_extraction()
+    block = read_line_block_file(os.path.join(output_dir, 'grid_line_0.dat'))
+    assert block.data.shape[1] == 200, 'Unexpected number of rows: %s' % block.data.shape[1]
+    error = np.abs(block.data[variables.index('U')] - get_linear_field(*block.data[:3])).max()
+    # значения в .dat файле записываются с конечным числом знаков
+    assert error < 1e-6, 'Linear field is not reproduced: max error %.3e' % error
+    return error
+
+
+if __name__ == '__main__':
+    print('linear field on a curvilinear grid: max error %.2e' % check_linear_interpolation())
+    with tempfile.TemporaryDirectory() as dirname:
+        check_lost_points(dirname)
+        print('points outside the grid: reported and dropped, extraction fails above max_lost_fraction')
+        print('ORDERED and FEBRICK .plt zones: read back, max error of extracted field %.2e' %
+              check_plt_reading(dirname))
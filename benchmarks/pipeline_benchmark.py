@@ -0,0 +1,140 @@
+"""
+Измерение времени загрузки, расчета производных величин и отрисовки графиков на синтетических данных
+разного объема. Загрузка измеряется для LineDataLoader из tecplot_lib и для CachedLineDataLoader (без кэша,
+с построением кэша и с готовым кэшем), расчет - для apply_wall_units, отрисовка - для трех графиков
+(профиль скорости, U+(Y+) и коэффициент трения) со всеми расчетными случаями. Результаты сохраняются в JSON
+вместе с хэшем коммита, чтобы их можно было сравнивать между версиями.
+
+Пример: python pipeline_benchmark.py --solvers ace cfx --cases 1 10 --sizes 1500,3000,2000 100000
+"""
+from synthetic_data import project_dir, generate_study
+from tecplot_lib import LineDataLoader
+from case_registry import parse_data_filename
+from line_data import CachedLineDataLoader, LineDataCache
+from plot_creation import add_ace_wall_units, add_cfx_wall_units, get_theory_curves, get_velocity_profile_spec, \
+    get_u_plus_spec, get_friction_coefficient_spec
+from plot_rendering import CurveSpec, render_plots
+import numpy as np
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import typing
+
+derive_functions = {'ace': add_ace_wall_units, 'cfx': add_cfx_wall_units}
+
+# наибольшее число точек в файле, при котором измеряется LineDataLoader из tecplot_lib (он разбирает
+# файлы построчно средствами Python и на больших файлах работает минутами)
+original_loader_max_points = 10 ** 4
+
+
+def get_commit() -> typing.Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=project_dir,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_timing(function: typing.Callable[[], None], repeat: int, setup: typing.Callable[[], None]=None) -> \
+        typing.List[float]:
+    result = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        result.append(time.perf_counter() - start)
+    return result
+
+
+def get_keys(solver: str, loader: CachedLineDataLoader) -> typing.List[tuple]:
+    return [(solver,) + parse_data_filename(filename) for filename in loader.filenames]
+
+
+def run_benchmark(dirname, solver: str, repeat=3, original_loader=True) -> typing.Dict[str, typing.List[float]]:
+    """
+    :param dirname: папка с синтетическими данными одного решателя
+    :param solver: 'ace' или 'cfx'
+    :param repeat: число повторений каждого замера
+    :param original_loader: измерять ли время загрузки LineDataLoader из tecplot_lib
+    :return: словарь, ставящий в соответствие имени этапа список времен выполнения в секундах
+    """
+    result = {}
+    cache = LineDataCache(dirname)
+    if original_loader:
+        result['load: LineDataLoader'] = get_timing(lambda: LineDataLoader(dirname).load(), repeat)
+    result['load: text'] = get_timing(lambda: CachedLineDataLoader(dirname, use_cache=False).load(), repeat)
+    result['load: cache build'] = get_timing(lambda: CachedLineDataLoader(dirname).load(), repeat, cache.clear)
+    result['load: cache hit'] = get_timing(lambda: CachedLineDataLoader(dirname).load(), repeat)
+
+    loader = CachedLineDataLoader(dirname, mmap=False)
+    loader.load()
+    keys = get_keys(solver, loader)
+    result['derive: wall units'] = get_timing(lambda: derive_functions[solver](keys, loader.frames), repeat)
+
+    frames = dict(zip(keys, loader.frames))
+    cases = sorted({key[1] for key in keys})
+    colors = ['red', 'blue', 'green', 'black', 'orange', 'magenta']
+    curves = [CurveSpec(solver, case, case, colors[n % len(colors)]) for n, case in enumerate(cases)]
+    with tempfile.TemporaryDirectory() as plots_dir:
+        specs = [get_velocity_profile_spec(os.path.join(plots_dir, 'velocity.png'), curves),
+                 get_u_plus_spec(os.path.join(plots_dir, 'u_plus.png'), curves),
+                 get_friction_coefficient_spec(os.path.join(plots_dir, 'friction_coefficient.png'), curves)]
+        theory = get_theory_curves()
+        result['render: 3 figures'] = get_timing(
+            lambda: render_plots(specs, lambda keys: [frames[key] for key in keys], theory, processes=1), repeat)
+    cache.clear()
+    return result
+
+
+def parse_sizes(string: str) -> typing.Tuple[int, int, int]:
+    sizes = [int(float(value)) for value in string.split(',')]
+    return tuple(sizes) if len(sizes) == 3 else tuple(sizes * 3)
+
+
+def get_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--solvers', nargs='+', default=['ace', 'cfx'], choices=['ace', 'cfx'])
+    parser.add_argument('--cases', nargs='+', type=int, default=[1, 10], help='числа расчетных случаев')
+    parser.add_argument('--sizes', nargs='+', type=parse_sizes, default=[(1500, 3000, 2000), (10 ** 5,) * 3],
+                        help='числа точек на линиях 0, 1, 2 через запятую или одно число для всех линий, '
+                             'например, 1500,3000,2000 или 1e6')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=os.path.join(project_dir, 'benchmarks', 'results',
+                                                          'pipeline_%s.json' % time.strftime('%Y%m%d_%H%M%S')))
+    return parser
+
+
+if __name__ == '__main__':
+    import matplotlib
+    matplotlib.use('Agg')
+    args = get_arg_parser().parse_args()
+    # теоретические зависимости строятся по состоянию в ядре потока из extracted_data
+    os.chdir(project_dir)
+    results = []
+    for solver in args.solvers:
+        for num_cases in args.cases:
+            for sizes in args.sizes:
+                with tempfile.TemporaryDirectory() as dirname:
+                    data_dirname = os.path.join(dirname, solver)
+                    filenames = generate_study(data_dirname, solver, num_cases, sizes)
+                    size = sum(os.path.getsize(filename) for filename in filenames)
+                    stages = run_benchmark(data_dirname, solver, args.repeat,
+                                           original_loader=max(sizes) <= original_loader_max_points)
+                    for stage, timings in stages.items():
+                        results.append({'solver': solver, 'cases': num_cases, 'line_sizes': list(sizes),
+                                        'bytes': size, 'stage': stage, 'min': min(timings),
+                                        'median': float(np.median(timings)), 'timings': timings})
+                        print('%s, %3s cases, lines %-20s %-22s min %9.4f s' %
+                              (solver, num_cases, ','.join(map(str, sizes)), stage, min(timings)))
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as file:
+        json.dump({'commit': get_commit(), 'date': datetime.datetime.now().isoformat(),
+                   'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+                   'results': results}, file, indent=1)
+    print('results are saved to %s' % args.output)
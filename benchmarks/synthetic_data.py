@@ -0,0 +1,156 @@
+"""
+Генератор синтетических данных пограничного слоя на пластине в формате файлов, извлекаемых Tecplot по
+полилиниям, со столбцами ACE (21 переменная) или CFX (34 переменные). Профили скорости у стенки следуют
+закону стенки get_u_plus_theory, коэффициент трения вдоль пластины - формуле Шлихтинга.
+"""
+import numpy as np
+import os
+import sys
+import typing
+
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_dir not in sys.path:
+    sys.path.insert(0, project_dir)
+
+from plot_creation import get_u_plus_theory, get_schlichting_friction_coefficient
+
+ace_variables = ['X', 'Y', 'Z', 'RHO', 'U', 'V', 'W', 'VelocityMagnitude', 'Mach', 'P', 'P_tot', 'Vislam',
+                 'SkinFrictionCoefficient', 'T', 'H0', 'COND_TURB', 'CP', 'COND_eff', 'Ywall', 'VIS_T', 'YPLUS']
+
+cfx_variables = ['X', 'Y', 'Z', 'Density', 'Shear Strain Rate', 'Mach Number', 'Pressure', 'Absolute Pressure',
+                 'Total Pressure', 'Temperature', 'Total Temperature', 'Turbulent Kinetic Energy',
+                 'Bulk Energy Flow Rate', 'X Bulk Momentum Flow Rate', 'Y Bulk Momentum Flow Rate',
+                 'Z Bulk Momentum Flow Rate', 'X Wall Shear', 'Y Wall Shear', 'Z Wall Shear', 'U', 'V', 'W',
+                 'Dynamic Viscosity', 'Eddy Viscosity', 'X Vorticity', 'Y Vorticity', 'Z Vorticity', 'Y Plus',
+                 'Solver Y Plus', 'Node UserID', 'Element UserID', 'Material ID', 'Part ID', 'Property ID']
+
+solver_variables = {'ace': ace_variables, 'cfx': cfx_variables}
+
+# число точек на линиях набора pln_set1 из data_extraction.py
+pln_set1_sizes = (1500, 3000, 2000)
+
+# линии набора pln_set1: начальная и конечная точки
+pln_set1_ends = [((7.9, 0.15, 0), (7.9, 0.15, 0.35)),
+                 ((7.9, 0.15, 0), (7.9, 0.15, 0.003)),
+                 ((0, 0.15, 0), (8, 0.15, 0))]
+
+
+class FlowState:
+    def __init__(self, velocity=88., density=1.125, viscosity=1.823e-5, temperature=300., pressure=-4500.):
+        """
+        :param velocity: скорость в ядре потока
+        :param density: плотность
+        :param viscosity: динамическая вязкость
+        :param temperature: температура
+        :param pressure: давление
+        """
+        self.velocity = velocity
+        self.density = density
+        self.viscosity = viscosity
+        self.temperature = temperature
+        self.pressure = pressure
+
+
+def get_line_fields(start: tuple, end: tuple, num_points: int, state: FlowState) -> typing.Dict[str, np.ndarray]:
+    """
+    :return: координаты точек линии и значения основных величин в них; коэффициент трения и касательное
+        напряжение определяются по продольной координате точки, скорость - по закону стенки
+    """
+    t = np.linspace(0, 1, num_points)
+    x, y, z = [start[i] + (end[i] - start[i]) * t for i in range(3)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reynolds_number = state.density * state.velocity * x / state.viscosity
+        cf = np.nan_to_num(get_schlichting_friction_coefficient(reynolds_number))
+    wall_shear = 0.5 * state.density * state.velocity ** 2 * cf
+    u_tau = np.sqrt(wall_shear / state.density)
+    y_plus = state.density * z * u_tau / state.viscosity
+    with np.errstate(divide='ignore', invalid='ignore'):
+        u = np.minimum(np.nan_to_num(u_tau * get_u_plus_theory(y_plus)), state.velocity)
+    return {'X': x, 'Y': y, 'Z': z, 'U': u, 'cf': cf, 'wall_shear': wall_shear, 'y_plus': y_plus}
+
+
+def get_ace_data(fields: typing.Dict[str, np.ndarray], state: FlowState) -> np.ndarray:
+    full = np.ones_like(fields['X'])
+    mach = fields['U'] / np.sqrt(1.4 * 287 * state.temperature)
+    values = {
+        'X': fields['X'], 'Y': fields['Y'], 'Z': fields['Z'], 'RHO': state.density * full, 'U': fields['U'],
+        'VelocityMagnitude': fields['U'], 'Mach': mach, 'P': state.pressure * full,
+        'P_tot': state.pressure + 0.5 * state.density * fields['U'] ** 2, 'Vislam': state.viscosity * full,
+        'SkinFrictionCoefficient': fields['cf'], 'T': state.temperature * full,
+        'H0': 1007 * state.temperature + 0.5 * fields['U'] ** 2, 'CP': 1007 * full, 'Ywall': fields['Z'],
+        'YPLUS': fields['y_plus']
+    }
+    return np.array([values.get(name, 0 * full) for name in ace_variables])
+
+
+def get_cfx_data(fields: typing.Dict[str, np.ndarray], state: FlowState) -> np.ndarray:
+    full = np.ones_like(fields['X'])
+    values = {
+        'X': fields['X'], 'Y': fields['Y'], 'Z': fields['Z'], 'Density': state.density * full, 'U': fields['U'],
+        'Mach Number': fields['U'] / np.sqrt(1.4 * 287 * state.temperature), 'Pressure': state.pressure * full,
+        'Absolute Pressure': (101325 + state.pressure) * full,
+        'Total Pressure': state.pressure + 0.5 * state.density * fields['U'] ** 2,
+        'Temperature': state.temperature * full, 'Total Temperature': state.temperature * full,
+        'X Wall Shear': fields['wall_shear'], 'Dynamic Viscosity': state.viscosity * full,
+        'Eddy Viscosity': 0.41 * state.density * fields['Z'] * np.sqrt(fields['wall_shear'] / state.density),
+        'Y Plus': fields['y_plus'], 'Solver Y Plus': fields['y_plus']
+    }
+    return np.array([values.get(name, 0 * full) for name in cfx_variables])
+
+
+solver_data = {'ace': get_ace_data, 'cfx': get_cfx_data}
+
+
+def write_synthetic_file(filename, variables: typing.List[str], data: np.ndarray):
+    """
+    Записывает файл в формате POINT, который Tecplot создает при извлечении данных по полилинии.
+    """
+    with open(filename, 'w') as file:
+        file.write('VARIABLES = %s\n' % '\n '.join('"%s"' % name for name in variables))
+        file.write('ZONE\nDT=(%s)\n' % ','.join(['DOUBLE'] * len(variables)))
+        np.savetxt(file, data.T, fmt='%23.15G', delimiter=' ', newline=' \n')
+
+
+def generate_case(dirname, solver: str, case: str, line_sizes=pln_set1_sizes, state: FlowState=None) -> \
+        typing.List[str]:
+    """
+    Записывает файлы <case>_line_<n>.dat для линий набора pln_set1.
+
+    :param dirname: папка для файлов
+    :param solver: 'ace' или 'cfx'
+    :param case: имя расчетного случая
+    :param line_sizes: число точек на каждой линии
+    :param state: параметры потока
+    :return: имена записанных файлов
+    """
+    state = state if state is not None else FlowState()
+    result = []
+    for n, ((start, end), num_points) in enumerate(zip(pln_set1_ends, line_sizes)):
+        fields = get_line_fields(start, end, num_points, state)
+        filename = os.path.join(dirname, '%s_line_%s.dat' % (case, n))
+        write_synthetic_file(filename, solver_variables[solver], solver_data[solver](fields, state))
+        result.append(filename)
+    return result
+
+
+def generate_study(dirname, solver: str, num_cases: int, line_sizes=pln_set1_sizes, seed=0) -> typing.List[str]:
+    """
+    Записывает num_cases расчетных случаев synthetic_<n>, отличающихся скоростью и вязкостью в ядре потока
+    (в пределах 5 %).
+
+    :return: имена записанных файлов
+    """
+    os.makedirs(dirname, exist_ok=True)
+    random_state = np.random.RandomState(seed)
+    result = []
+    for n in range(num_cases):
+        velocity_factor, viscosity_factor = 1 + 0.05 * (random_state.rand(2) - 0.5)
+        state = FlowState(velocity=88. * velocity_factor, viscosity=1.823e-5 * viscosity_factor)
+        result += generate_case(dirname, solver, 'synthetic_%03d' % n, line_sizes, state)
+    return result
+
+
+if __name__ == '__main__':
+    for solver in ('ace', 'cfx'):
+        filenames = generate_study(os.path.join('synthetic_data', solver), solver, num_cases=3)
+        print('%s: %s files' % (solver, len(filenames)))
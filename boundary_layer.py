@@ -0,0 +1,147 @@
+"""
+Интегральные параметры пограничного слоя для большого числа профилей сразу. Профили, направленные по нормали
+к стенке, передаются двумерными массивами (число профилей, число точек), первая точка каждого профиля лежит
+на стенке; профили разной длины дополняются в конце значениями NaN (см. stack_profiles). Все величины
+вычисляются операциями над массивами целиком, без циклов по профилям.
+"""
+from plot_creation import CoreState
+import numpy as np
+import collections
+import typing
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+BoundaryLayerParameters = collections.namedtuple('BoundaryLayerParameters', [
+    'delta99', 'displacement_thickness', 'momentum_thickness', 'shape_factor', 'Re_theta', 'u_tau'
+])
+
+# оценка касательного напряжения по разности скоростей в первых двух точках профиля верна, только если
+# вторая точка лежит в вязком подслое (y+ не больше first_point_max_y_plus)
+first_point_max_y_plus = 5.
+
+
+def stack_profiles(frames: typing.List['pd.DataFrame'], column: str) -> np.ndarray:
+    """
+    :return: массив (число профилей, наибольшее число точек) значений столбца column, дополненный NaN
+    """
+    lengths = np.array([len(frame) for frame in frames])
+    result = np.full((len(frames), lengths.max() if len(frames) else 0), np.nan)
+    result[np.arange(result.shape[1]) < lengths[:, np.newaxis]] = \
+        np.concatenate([np.asarray(frame[column], dtype=np.float64) for frame in frames]) if len(frames) else []
+    return result
+
+
+def get_last_values(values: np.ndarray) -> np.ndarray:
+    """
+    :return: последние не равные NaN значения каждой строки массива
+    """
+    last = values.shape[1] - 1 - np.argmax(~np.isnan(values[:, ::-1]), axis=1)
+    return values[np.arange(len(values)), last]
+
+
+def get_core_states(u: np.ndarray, density: np.ndarray=None, viscosity: np.ndarray=None) -> CoreState:
+    """
+    Состояние в ядре потока для каждого профиля, определенное, как в plot_creation.get_core_state, по
+    последней точке профиля.
+    """
+    return CoreState(U0=get_last_values(u),
+                     RHO0=get_last_values(density) if density is not None else None,
+                     Vislam0=get_last_values(viscosity) if viscosity is not None else None)
+
+
+def _integrate(values: np.ndarray, z: np.ndarray) -> np.ndarray:
+    segments = 0.5 * (values[:, 1:] + values[:, :-1]) * np.diff(z, axis=1)
+    return np.nansum(segments, axis=1)
+
+
+def get_delta99(z: np.ndarray, u: np.ndarray, u0: np.ndarray) -> np.ndarray:
+    """
+    :return: толщина пограничного слоя - расстояние от стенки, на котором скорость достигает 0.99 U0
+        (с линейной интерполяцией между точками профиля); NaN, если скорость не достигает этого значения
+    """
+    level = 0.99 * u0[:, np.newaxis]
+    with np.errstate(invalid='ignore'):
+        above = u >= level
+    index = np.argmax(above, axis=1)
+    rows = np.arange(len(u))
+    previous = np.maximum(index - 1, 0)
+    u1, u2 = u[rows, previous], u[rows, index]
+    z1, z2 = z[rows, previous], z[rows, index]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = np.where(u2 != u1, (level[:, 0] - u1) / (u2 - u1), 0.)
+    return np.where(above[rows, index], z1 + t * (z2 - z1), np.nan)
+
+
+def get_boundary_layer_parameters(z: np.ndarray, u: np.ndarray, core_state: CoreState=None,
+                                  density: np.ndarray=None, viscosity: np.ndarray=None,
+                                  wall_shear: np.ndarray=None, chunk_size=65536) -> BoundaryLayerParameters:
+    """
+    Вычисляет толщину пограничного слоя delta99, толщину вытеснения, толщину потери импульса, формпараметр H,
+    число Рейнольдса по толщине потери импульса и динамическую скорость.
+
+    :param z: расстояния от стенки, массив (число профилей, число точек)
+    :param u: продольная скорость того же размера
+    :param core_state: скорость, плотность и вязкость в ядре потока - числа или массивы по числу профилей;
+        по умолчанию определяются по последним точкам профилей (get_core_states)
+    :param density: плотность; если задана, толщины вычисляются с учетом сжимаемости
+    :param viscosity: динамическая вязкость; используется для определения касательного напряжения на стенке
+        и вязкости в ядре потока
+    :param wall_shear: касательное напряжение на стенке по числу профилей, например, столбец TAU решателя;
+        по умолчанию оценивается по разности скоростей в первых двух точках профиля. Такая оценка верна,
+        только если вторая точка лежит в вязком подслое; для профилей, у которых y+ этой точки больше
+        first_point_max_y_plus, динамическая скорость не определяется (NaN)
+    :param chunk_size: число одновременно обрабатываемых профилей, ограничивает объем временных массивов
+    """
+    z = np.asarray(z, dtype=np.float64)
+    u = np.asarray(u, dtype=np.float64)
+    n = len(u)
+    if core_state is None:
+        core_state = get_core_states(u, density, viscosity)
+    u0, rho0, mu0 = [np.broadcast_to(np.asarray(value if value is not None else np.nan, dtype=np.float64), (n,))
+                     for value in core_state]
+    displacement_thickness = np.empty(n)
+    momentum_thickness = np.empty(n)
+    delta99 = np.empty(n)
+    for start in range(0, n, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        velocity_ratio = u[chunk] / u0[chunk, np.newaxis]
+        mass_flux_ratio = velocity_ratio
+        if density is not None:
+            mass_flux_ratio = velocity_ratio * density[chunk] / rho0[chunk, np.newaxis]
+        displacement_thickness[chunk] = _integrate(1 - mass_flux_ratio, z[chunk])
+        momentum_thickness[chunk] = _integrate(mass_flux_ratio * (1 - velocity_ratio), z[chunk])
+        delta99[chunk] = get_delta99(z[chunk], u[chunk], u0[chunk])
+    wall_density = density[:, 0] if density is not None else rho0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if wall_shear is not None:
+            u_tau = np.sqrt(np.abs(wall_shear) / wall_density)
+        elif viscosity is not None:
+            u_tau = np.sqrt(np.abs(viscosity[:, 0] * (u[:, 1] - u[:, 0]) / (z[:, 1] - z[:, 0])) / wall_density)
+            first_point_y_plus = wall_density * (z[:, 1] - z[:, 0]) * u_tau / viscosity[:, 0]
+            u_tau = np.where(first_point_y_plus <= first_point_max_y_plus, u_tau, np.nan)
+        else:
+            u_tau = np.full(n, np.nan)
+        return BoundaryLayerParameters(
+            delta99=delta99, displacement_thickness=displacement_thickness, momentum_thickness=momentum_thickness,
+            shape_factor=displacement_thickness / momentum_thickness,
+            Re_theta=rho0 * u0 * momentum_thickness / mu0, u_tau=u_tau)
+
+
+if __name__ == '__main__':
+    import plot_creation
+    from wall_units import ace_schema, cfx_schema
+    schemas = {'ace': ace_schema, 'cfx': cfx_schema}
+    registry = plot_creation.registry
+    for solver in sorted(registry.data_dirs):
+        keys = [key for key in registry.keys() if key.solver == solver and key.line == 0]
+        frames = registry.load_many(keys)
+        schema = schemas[solver]
+        density, viscosity = stack_profiles(frames, schema.density), stack_profiles(frames, schema.viscosity)
+        # на линии 0 первая точка лежит вне вязкого подслоя, поэтому используется напряжение на стенке решателя
+        parameters = get_boundary_layer_parameters(stack_profiles(frames, 'Z'), stack_profiles(frames, 'U'),
+                                                   density=density, viscosity=viscosity,
+                                                   wall_shear=stack_profiles(frames, 'TAU')[:, 0])
+        for n, key in enumerate(keys):
+            print('%s %-50s delta99 = %.4f, delta* = %.5f, theta = %.5f, H = %.3f, Re_theta = %7.0f, u_tau = %.3f' %
+                  ((solver, key.case) + tuple(value[n] for value in parameters)))
@@ -0,0 +1,171 @@
+"""
+Граф сборки: извлечение данных из .plt файлов -> производные величины (универсальные координаты, коэффициент
+трения) -> графики. Повторно выполняются только задачи, входные данные которых изменились.
+"""
+from tecplot_lib import PolyLine, wrap_macro, get_data_file_extraction_macro_body, create_macro_file, execute_macro
+from case_registry import CaseKey, parse_data_filename
+from pipeline import Task, Pipeline
+from instrumentation import span, start_trace_from_env
+from plot_rendering import PlotSpec
+from polyline_extraction import solution_readers
+import data_extraction
+import plot_creation
+import numpy as np
+import collections
+import functools
+import os
+import time
+import typing
+import zipfile
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+# папка с таблицами производных величин, по одной на расчетный случай
+derived_dir = os.path.join('extracted_data', '.cache', 'derived')
+
+extractors = {'ace': data_extraction.ace_extractor, 'cfx': data_extraction.cfx_extractor}
+
+# модули, изменение которых меняет производные величины и графики
+derive_sources = ['wall_units.py', 'plot_creation.py']
+figure_sources = ['plot_creation.py', 'plot_rendering.py', 'decimation.py', 'log_law_fit.py', 'boundary_layer.py',
+                  'reference_curves.py']
+
+# расчетный случай, по которому определяется состояние в ядре потока для теоретических зависимостей
+core_state_case = ('ace', 'average_grid_density_sp_al')
+
+
+def get_derived_filename(solver: str, case: str) -> str:
+    return os.path.join(derived_dir, solver, case + '.npz')
+
+
+def write_derived_table(filename, frames: typing.Dict[int, 'pd.DataFrame']):
+    """
+    Записывает линии расчетного случая в .npz архив; массивы линии называются по ее номеру. Архив не содержит
+    времени записи, поэтому при тех же данных получается файл с тем же содержимым.
+
+    :param frames: словарь, ставящий в соответствие номеру линии ее данные
+    """
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with zipfile.ZipFile(filename + '.tmp', 'w') as archive:
+        for n, frame in sorted(frames.items()):
+            arrays = {'variables_%s' % n: np.array(list(frame.columns)),
+                      'line_%s' % n: np.ascontiguousarray(frame.values.T, dtype=np.float64)}
+            for name, array in sorted(arrays.items()):
+                with archive.open(zipfile.ZipInfo(name + '.npy'), 'w') as file:
+                    np.lib.format.write_array(file, array)
+    os.replace(filename + '.tmp', filename)
+
+
+def read_derived_table(filename) -> typing.Dict[int, 'pd.DataFrame']:
+    """
+    :return: словарь, ставящий в соответствие номеру линии ее данные
+    """
+    from line_data import get_frame
+    with np.load(filename) as archive:
+        lines = [int(name[len('line_'):]) for name in archive.files if name.startswith('line_')]
+        return {n: get_frame(list(archive['variables_%s' % n]), archive['line_%s' % n]) for n in sorted(lines)}
+
+
+def extract_data_file(datafile, polylines: typing.List[PolyLine], output_dir, macro_name,
+                      filenames: typing.List[str]):
+    from line_data import LineDataCache
+    create_macro_file(wrap_macro(get_data_file_extraction_macro_body(datafile, polylines, output_dir)), macro_name)
+    with span('execute_macro', macro=macro_name):
+        execute_macro(macro_name)
+    cache = LineDataCache(output_dir)
+    for filename in filenames:
+        cache.update(filename)
+
+
+def derive_case(solver: str, case: str, lines: typing.List[int], filename):
+    frames = plot_creation.registry.load_many([CaseKey(solver, case, line) for line in lines])
+    write_derived_table(filename, dict(zip(lines, frames)))
+
+
+def get_derived_frames(keys) -> list:
+    tables = {}
+    result = []
+    for solver, case, line in keys:
+        if (solver, case) not in tables:
+            tables[solver, case] = read_derived_table(get_derived_filename(solver, case))
+        result.append(tables[solver, case][line])
+    return result
+
+
+def render_figure(spec: PlotSpec):
+    from plot_rendering import get_render_job, render_job, _init_worker
+    _init_worker()
+    theory = plot_creation.get_theory_curves() if spec.theory is not None else {}
+    render_job(get_render_job(spec, get_derived_frames, theory))
+
+
+def get_polyline_params(polyline: PolyLine) -> dict:
+    return {'nodes': [(node.x, node.y, node.z) for node in polyline.nodes], 'numpoints': polyline.numpoints}
+
+
+def get_spec_params(spec: PlotSpec) -> dict:
+    return dict(vars(spec), curves=[vars(curve) for curve in spec.curves])
+
+
+def get_extraction_tasks(solver: str) -> typing.List[Task]:
+    extractor = extractors[solver]
+    if not os.path.isdir(extractor.datafiles_dir):
+        return []
+    result = []
+    # в папке с решениями также хранятся раскладки .lay, используемые при создании рисунков
+    datafiles = sorted(filename for filename in os.listdir(extractor.datafiles_dir)
+                       if os.path.splitext(filename)[1].lower() in solution_readers)
+    assert len(extractor.polylines_list) == len(datafiles), \
+        'Number of data files and number of sets of polylines must be same'
+    for datafile, polylines in zip(datafiles, extractor.polylines_list):
+        name = os.path.splitext(datafile)[0]
+        outputs = [os.path.join(plot_creation.registry.data_dirs[solver], '%s_line_%s.dat' % (name, n))
+                   for n in range(len(polylines))]
+        macro_name = os.path.join('macros', '%s_%s_extraction.mcr' % (solver, name))
+        datafile = os.path.join(extractor.datafiles_dir, datafile)
+        result.append(Task('extract/%s/%s' % (solver, name),
+                           functools.partial(extract_data_file, datafile, polylines, extractor.output_dir,
+                                             macro_name, outputs),
+                           inputs=[datafile], outputs=outputs,
+                           params=[get_polyline_params(polyline) for polyline in polylines]))
+    return result
+
+
+def get_pipeline() -> Pipeline:
+    tasks = []
+    data_files = collections.OrderedDict()
+    for solver, dirname in sorted(plot_creation.registry.data_dirs.items()):
+        extraction_tasks = get_extraction_tasks(solver)
+        tasks.extend(extraction_tasks)
+        filenames = [filename for task in extraction_tasks for filename in task.outputs]
+        if not extraction_tasks:
+            # без исходных .plt файлов извлеченные данные считаются исходными
+            filenames = [os.path.join(dirname, filename) for filename in sorted(os.listdir(dirname))]
+        for filename in filenames:
+            parsed = parse_data_filename(filename)
+            if parsed is not None:
+                data_files.setdefault((solver, parsed[0]), []).append((parsed[1], filename))
+    for (solver, case), lines in data_files.items():
+        filename = get_derived_filename(solver, case)
+        tasks.append(Task('derive/%s/%s' % (solver, case),
+                          functools.partial(derive_case, solver, case, [line for line, _ in lines], filename),
+                          inputs=[dat_filename for _, dat_filename in lines] + derive_sources,
+                          outputs=[filename], params={'columns': plot_creation.plot_columns.get(solver)}))
+    for spec in plot_creation.get_plot_specs():
+        inputs = {get_derived_filename(curve.solver, curve.case) for curve in spec.curves}
+        if spec.theory is not None:
+            inputs.add(get_derived_filename(*core_state_case))
+        tasks.append(Task('figure/%s' % spec.filename, functools.partial(render_figure, spec),
+                          inputs=sorted(inputs) + figure_sources, outputs=[spec.filename],
+                          params=get_spec_params(spec)))
+    return Pipeline(tasks)
+
+
+if __name__ == '__main__':
+    start_trace_from_env()
+    start = time.perf_counter()
+    executed = get_pipeline().run()
+    for name in executed:
+        print(name)
+    print('%s tasks executed in %.2f s' % (len(executed), time.perf_counter() - start))
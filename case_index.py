@@ -0,0 +1,205 @@
+"""
+Индекс извлеченных данных: для каждого файла <case>_line_<n>.dat хранятся решатель, модель турбулентности,
+пристеночная модель, густота сетки и число ячеек, граничное условие, интенсивность турбулентности, описание
+линии, число строк и список столбцов. Индекс записывается в extracted_data/case_index.json и обновляется
+инкрементально: заголовки перечитываются только у новых и изменившихся файлов. Запросы к индексу возвращают
+ключи и имена файлов, так что загружаются только выбранные файлы.
+"""
+from case_registry import CaseKey, parse_data_filename
+import collections
+import json
+import os
+import re
+import typing
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+    from case_registry import CaseRegistry
+
+index_filename = os.path.join('extracted_data', 'case_index.json')
+
+CaseRecord = collections.namedtuple('CaseRecord', [
+    'solver', 'case', 'line', 'filename', 'turbulence_model', 'wall_treatment', 'grid_density', 'cell_count',
+    'boundary_condition', 'turbulence_intensity', 'line_definition', 'rows', 'columns'
+])
+
+# число ячеек сеток различной густоты (см. подписи графиков в plot_creation.py)
+cell_counts = {'average': 1.0e6, 'high': 1.2e6, 'very_high': 1.6e6}
+
+# граничное условие на верхней границе, если оно не указано в имени расчетного случая; для отдельных
+# случаев уточняется в case_metadata_overrides
+default_boundary_conditions = {'ace': 'symmetry', 'cfx': 'opening'}
+
+# значения, которые нельзя определить по имени расчетного случая
+case_metadata_overrides = {}
+
+
+def get_case_metadata(solver: str, case: str) -> dict:
+    """
+    Определяет параметры расчета по имени расчетного случая, например, very_high_density_k_eps_farfield или
+    avareage_density_k_eps_i1; значения из case_metadata_overrides[(solver, case)] имеют приоритет.
+    """
+    if 'sp_al' in case:
+        turbulence_model, wall_treatment = 'spalart_allmaras', 'low_re'
+    elif 'k_eps' in case:
+        turbulence_model = 'k_epsilon'
+        wall_treatment = 'two_layer' if 'two_layer' in case else 'standard_wall'
+    else:
+        turbulence_model, wall_treatment = None, None
+    if case.startswith('very_high'):
+        grid_density = 'very_high'
+    elif case.startswith('high'):
+        grid_density = 'high'
+    elif case.startswith(('average', 'avareage')):
+        grid_density = 'average'
+    else:
+        grid_density = None
+    if 'farfield' in case:
+        boundary_condition = 'farfield'
+    elif 'outlet' in case:
+        boundary_condition = 'outlet'
+    else:
+        boundary_condition = default_boundary_conditions.get(solver)
+    intensity = re.search(r'_i(\d+)(_|$)', case)
+    result = {
+        'turbulence_model': turbulence_model, 'wall_treatment': wall_treatment, 'grid_density': grid_density,
+        'cell_count': cell_counts.get(grid_density), 'boundary_condition': boundary_condition,
+        'turbulence_intensity': float(intensity.group(1)) / 100 if intensity else None
+    }
+    result.update(case_metadata_overrides.get((solver, case), {}))
+    return result
+
+
+def _matches(value, condition) -> bool:
+    if callable(condition):
+        return bool(condition(value))
+    if isinstance(condition, (list, tuple, set, frozenset)):
+        return value in condition
+    return value == condition
+
+
+class CaseIndex:
+    """
+    Индекс файлов нескольких папок с извлеченными данными, например, {'ace': 'extracted_data/ace', ...}.
+    """
+    def __init__(self, data_dirs: typing.Dict[str, str], filename=index_filename,
+                 line_definitions: typing.Dict[int, dict]=None):
+        """
+        :param data_dirs: словарь, ставящий в соответствие имени решателя папку с извлеченными данными
+        :param filename: имя файла индекса
+        :param line_definitions: описания линий по их номерам, например, узлы полилинии и число точек;
+            сохраняются в файле индекса и дополняют ранее сохраненные описания
+        """
+        self.data_dirs = data_dirs
+        self.filename = filename
+        self.entries, self._saved_line_definitions = self._read()
+        self.line_definitions = dict(self._saved_line_definitions)
+        self.line_definitions.update(line_definitions or {})
+
+    def _read(self) -> typing.Tuple[dict, typing.Dict[int, dict]]:
+        if not os.path.exists(self.filename):
+            return {}, {}
+        with open(self.filename, 'r') as file:
+            index = json.load(file)
+        # ключи объектов JSON - строки
+        return index['files'], {int(line): definition
+                                for line, definition in index.get('line_definitions', {}).items()}
+
+    def save(self):
+        with open(self.filename + '.tmp', 'w') as file:
+            json.dump({'files': self.entries, 'line_definitions': self.line_definitions}, file, indent=1,
+                      sort_keys=True)
+        os.replace(self.filename + '.tmp', self.filename)
+        self._saved_line_definitions = dict(self.line_definitions)
+
+    def _get_entry(self, solver: str, case: str, line: int, path: str, stat: os.stat_result) -> dict:
+        from line_data import read_line_data_header
+        header = read_line_data_header(path)
+        entry = {'solver': solver, 'case': case, 'line': line, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                 'rows': sum(header.lengths), 'columns': header.variables}
+        entry.update(get_case_metadata(solver, case))
+        return entry
+
+    def update(self, save=True) -> int:
+        """
+        Добавляет в индекс новые и изменившиеся файлы и удаляет отсутствующие.
+
+        :param save: записать ли индекс в файл, если изменились записи или описания линий
+        :return: число добавленных, обновленных и удаленных записей
+        """
+        changes = 0
+        paths = set()
+        for solver, dirname in sorted(self.data_dirs.items()):
+            for filename in sorted(os.listdir(dirname)):
+                parsed = parse_data_filename(filename)
+                if parsed is None:
+                    continue
+                path = os.path.join(dirname, filename)
+                paths.add(path)
+                stat = os.stat(path)
+                entry = self.entries.get(path)
+                if entry is None or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+                    self.entries[path] = self._get_entry(solver, parsed[0], parsed[1], path, stat)
+                    changes += 1
+        for path in set(self.entries) - paths:
+            del self.entries[path]
+            changes += 1
+        if save and (changes or self.line_definitions != self._saved_line_definitions):
+            self.save()
+        return changes
+
+    def get_record(self, path: str) -> CaseRecord:
+        entry = self.entries[path]
+        values = {field: entry.get(field) for field in CaseRecord._fields}
+        # параметры по имени случая определяются заново, чтобы изменения правил и case_metadata_overrides
+        # действовали и для записей, сохраненных ранее
+        values.update(get_case_metadata(entry['solver'], entry['case']))
+        values['filename'] = path
+        values['line_definition'] = self.line_definitions.get(entry['line'])
+        return CaseRecord(**values)
+
+    def query(self, **conditions) -> typing.List[CaseRecord]:
+        """
+        Выбирает записи индекса, например, query(turbulence_model='k_epsilon', line=1,
+        boundary_condition='farfield'). Условие может быть значением, набором допустимых значений
+        (list, tuple, set) или функцией, возвращающей True для подходящих значений.
+
+        :return: записи в порядке (solver, case, line)
+        """
+        unknown = set(conditions) - set(CaseRecord._fields)
+        if unknown:
+            raise KeyError('Unknown fields: %s' % ', '.join(sorted(unknown)))
+        records = [self.get_record(path) for path in self.entries]
+        result = [record for record in records
+                  if all(_matches(getattr(record, field), condition) for field, condition in conditions.items())]
+        return sorted(result, key=lambda record: (record.solver, record.case, record.line))
+
+    def get_keys(self, **conditions) -> typing.List[CaseKey]:
+        return [CaseKey(record.solver, record.case, record.line) for record in self.query(**conditions)]
+
+    def get_filenames(self, **conditions) -> typing.List[str]:
+        return [record.filename for record in self.query(**conditions)]
+
+    def load(self, registry: 'CaseRegistry', **conditions) -> typing.List['pd.DataFrame']:
+        """
+        Загружает через реестр только выбранные линии.
+        """
+        return registry.load_many(self.get_keys(**conditions))
+
+
+def get_polyline_definitions(polylines) -> typing.Dict[int, dict]:
+    """
+    :param polylines: набор полилиний, по которым извлечены данные, например, pln_set1 из data_extraction
+    :return: описания линий по их номерам
+    """
+    return {n: {'nodes': [[node.x, node.y, node.z] for node in polyline.nodes], 'numpoints': polyline.numpoints}
+            for n, polyline in enumerate(polylines)}
+
+
+if __name__ == '__main__':
+    from data_extraction import pln_set1
+    index = CaseIndex({'ace': os.path.join('extracted_data', 'ace'), 'cfx': os.path.join('extracted_data', 'cfx')},
+                      line_definitions=get_polyline_definitions(pln_set1))
+    print('%s records changed' % index.update())
+    for record in index.query(turbulence_model='k_epsilon', line=1, boundary_condition='farfield'):
+        print(record.solver, record.case, record.rows, record.wall_treatment, record.cell_count)
@@ -0,0 +1,190 @@
+import collections
+import os
+import re
+import typing
+import warnings
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+CaseKey = collections.namedtuple('CaseKey', ['solver', 'case', 'line'])
+
+data_filename_pattern = re.compile(r'^(?P<case>.+)_line_(?P<line>\d+)\.dat$')
+
+
+def parse_data_filename(filename) -> typing.Optional[typing.Tuple[str, int]]:
+    """
+    :param filename: имя файла вида <case>_line_<n>.dat
+    :return: имя расчетного случая и номер линии, либо None, если имя файла не соответствует шаблону
+    """
+    match = data_filename_pattern.match(os.path.basename(filename))
+    if match is None:
+        return None
+    return match.group('case'), int(match.group('line'))
+
+
+def get_frame_size(frame: 'pd.DataFrame') -> int:
+    return int(frame.memory_usage(index=True, deep=False).sum())
+
+
+class CaseLines:
+    """
+    Набор линий одного расчетного случая. Обращение по номеру линии загружает соответствующий frame из
+    реестра, поэтому объект может использоваться вместо списка loader.frames[i:j].
+    """
+    def __init__(self, registry, solver: str, case: str):
+        self.registry = registry
+        self.solver = solver
+        self.case = case
+
+    @property
+    def lines(self) -> typing.List[int]:
+        return self.registry.get_lines(self.solver, self.case)
+
+    def __getitem__(self, line: int) -> 'pd.DataFrame':
+        return self.registry[CaseKey(self.solver, self.case, line)]
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __iter__(self):
+        for line in self.lines:
+            yield self[line]
+
+
+class CaseRegistry:
+    """
+    Реестр извлеченных данных с доступом по ключу (solver, case, line). Файл загружается только при первом
+    обращении к его ключу, загруженные frames хранятся в порядке последнего использования и при превышении
+    ограничения на занимаемую память вытесняются, начиная с давно не использовавшихся. Создание реестра
+    не требует ни импорта pandas, ни обращения к диску.
+    """
+    def __init__(self, data_dirs: typing.Dict[str, str], memory_limit=None,
+                 derive: typing.Dict[str, typing.Callable[[typing.List[CaseKey], typing.List['pd.DataFrame']], None]]=None,
+                 use_cache=True, columns: typing.Dict[str, typing.List[str]]=None, dtype=None, store=None):
+        """
+        :param data_dirs: словарь, ставящий в соответствие имени решателя папку с извлеченными данными
+        :param memory_limit: ограничение на объем памяти, занимаемый загруженными frames, в байтах,
+            по умолчанию не ограничен
+        :param derive: словарь, ставящий в соответствие имени решателя функцию (keys, frames), которая
+            дополняет загруженные одновременно frames производными величинами
+        :param use_cache: использовать ли бинарный кэш при загрузке
+        :param columns: словарь, ставящий в соответствие имени решателя список считываемых переменных,
+            по умолчанию считываются все переменные
+        :param dtype: тип значений загружаемых данных, по умолчанию float64
+        :param store: файл исследования (study_store.StudyStore); если задан, линии загружаются из него,
+            а не из папок data_dirs; линии, исходные .dat файлы которых изменились после записи файла
+            исследования, загружаются из .dat файлов
+        """
+        self.data_dirs = data_dirs
+        self.memory_limit = memory_limit
+        self.derive = derive if derive is not None else {}
+        self.use_cache = use_cache
+        self.columns = columns if columns is not None else {}
+        self.dtype = dtype
+        self.store = store
+        self._loaders = {}
+        self._filenames = None
+        self._frames = collections.OrderedDict()
+        self._sizes = {}
+        self.memory_usage = 0
+
+    @property
+    def filenames(self) -> typing.Dict[CaseKey, str]:
+        if self._filenames is None and self.store is not None:
+            self._filenames = {key: '%s_line_%s.dat' % (key.case, key.line) for key in self.store.keys()}
+        elif self._filenames is None:
+            self._filenames = {}
+            for solver, dirname in self.data_dirs.items():
+                for filename in sorted(os.listdir(dirname)):
+                    parsed = parse_data_filename(filename)
+                    if parsed is not None:
+                        self._filenames[CaseKey(solver, *parsed)] = filename
+        return self._filenames
+
+    def keys(self) -> typing.List[CaseKey]:
+        return sorted(self.filenames)
+
+    def get_cases(self, solver: str) -> typing.List[str]:
+        return sorted({key.case for key in self.filenames if key.solver == solver})
+
+    def get_lines(self, solver: str, case: str) -> typing.List[int]:
+        return sorted(key.line for key in self.filenames if key.solver == solver and key.case == case)
+
+    def case(self, solver: str, case: str) -> CaseLines:
+        return CaseLines(self, solver, case)
+
+    def is_loaded(self, key) -> bool:
+        return CaseKey(*key) in self._frames
+
+    def _get_loader(self, solver: str):
+        if solver not in self._loaders:
+            import numpy as np
+            from line_data import CachedLineDataLoader
+            self._loaders[solver] = CachedLineDataLoader(self.data_dirs[solver], use_cache=self.use_cache,
+                                                         columns=self.columns.get(solver),
+                                                         dtype=self.dtype if self.dtype is not None else np.float64)
+        return self._loaders[solver]
+
+    def _load_file(self, key: CaseKey) -> 'pd.DataFrame':
+        if self.store is None:
+            return self._get_loader(key.solver).load_file(self.filenames[key])
+        filename = os.path.join(self.data_dirs[key.solver], self.filenames[key])
+        if os.path.exists(filename) and not self.store.is_current(key, filename):
+            warnings.warn('%s is changed after %s was written, loading it instead' % (filename, self.store.filename))
+            return self._get_loader(key.solver).load_file(self.filenames[key])
+        frame = self.store.frame(key, self.columns.get(key.solver))
+        if self.dtype is not None:
+            frame = frame.astype(self.dtype, copy=False)
+        return frame
+
+    def _evict(self):
+        if self.memory_limit is None:
+            return
+        # последний использованный frame не вытесняется, даже если он один превышает ограничение
+        while self.memory_usage > self.memory_limit and len(self._frames) > 1:
+            key, _ = self._frames.popitem(last=False)
+            self.memory_usage -= self._sizes.pop(key)
+
+    def load_many(self, keys) -> typing.List['pd.DataFrame']:
+        """
+        Загружает несколько линий сразу, производные величины для не загруженных ранее линий каждого решателя
+        вычисляются одним вызовом функции derive.
+
+        :param keys: список ключей (solver, case, line)
+        :return: список frames в порядке ключей
+        """
+        keys = [CaseKey(*key) for key in keys]
+        result = {}
+        missing = collections.OrderedDict()
+        for key in keys:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                result[key] = self._frames[key]
+            elif key not in self.filenames:
+                raise KeyError(key)
+            else:
+                missing.setdefault(key.solver, collections.OrderedDict())[key] = None
+        for solver, solver_keys in missing.items():
+            solver_keys = list(solver_keys)
+            frames = [self._load_file(key) for key in solver_keys]
+            if solver in self.derive:
+                self.derive[solver](solver_keys, frames)
+            for key, frame in zip(solver_keys, frames):
+                result[key] = frame
+                self._frames[key] = frame
+                self._sizes[key] = get_frame_size(frame)
+                self.memory_usage += self._sizes[key]
+        self._evict()
+        return [result[key] for key in keys]
+
+    def __getitem__(self, key) -> 'pd.DataFrame':
+        return self.load_many([key])[0]
+
+    def get(self, solver: str, case: str, line: int) -> 'pd.DataFrame':
+        return self[solver, case, line]
+
+    def clear(self):
+        self._frames.clear()
+        self._sizes.clear()
+        self.memory_usage = 0
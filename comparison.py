@@ -0,0 +1,215 @@
+"""
+Количественное сравнение расчетных случаев вместо визуального сравнения графиков. Линии двух наборов
+случаев интерполируются на общую координату (Z для линий 0 и 1, X для линии 2), после чего для всех пар
+случаев сразу вычисляются среднеквадратичное (L2) и наибольшее (Linf) отклонения и относительное
+отклонение величин U, UPLUS и SkinFrictionCoefficient. В режиме проверки по эталону текущие результаты
+сравниваются с сохраненным эталонным расчетом, и отмечаются случаи, отклонение которых превышает допуск.
+"""
+from boundary_layer import stack_profiles
+from grid_convergence import interpolate_rows, line_coordinates
+import numpy as np
+import collections
+import os
+import typing
+
+if typing.TYPE_CHECKING:
+    from case_registry import CaseRegistry
+
+# сравниваемые величины для каждой линии
+comparison_variables = {0: ['U', 'UPLUS'], 1: ['U', 'UPLUS'], 2: ['SkinFrictionCoefficient']}
+
+# допустимые относительные отклонения от эталона
+default_tolerances = {'U': 1e-3, 'UPLUS': 1e-3, 'SkinFrictionCoefficient': 1e-3}
+
+# число пар, обрабатываемых одновременно
+pairs_chunk_size = 4096
+
+ComparisonRecord = collections.namedtuple('ComparisonRecord', [
+    'line', 'variable', 'case_a', 'case_b', 'l2', 'linf', 'relative', 'exceeded'
+])
+
+
+def get_common_coordinate(x: np.ndarray, num_points: int=None) -> np.ndarray:
+    """
+    :param x: координаты точек линий всех случаев, массив (число случаев, число точек), дополненный NaN
+    :return: равномерная координата на общем для всех линий интервале; по умолчанию число точек равно
+        наибольшему числу точек линии
+    """
+    lower = np.nanmax(np.nanmin(x, axis=1))
+    upper = np.nanmin(np.nanmax(x, axis=1))
+    return np.linspace(lower, upper, num_points if num_points is not None else x.shape[1])
+
+
+def align_frames(frames: list, line: int, variables: typing.List[str], coordinate: np.ndarray=None) -> \
+        typing.Tuple[np.ndarray, typing.Dict[str, np.ndarray]]:
+    """
+    :return: общая координата и словарь, ставящий в соответствие имени величины массив ее значений
+        (число случаев, число точек общей координаты)
+    """
+    x = stack_profiles(frames, line_coordinates[line])
+    if coordinate is None:
+        coordinate = get_common_coordinate(x)
+    return coordinate, {name: interpolate_rows(coordinate, x, stack_profiles(frames, name)) for name in variables}
+
+
+def get_pair_metrics(values_a: np.ndarray, values_b: np.ndarray, index_a: np.ndarray, index_b: np.ndarray) -> \
+        typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Отклонения для пар строк (values_a[index_a[n]], values_b[index_b[n]]) на равномерной общей координате.
+
+    :return: L2 - среднеквадратичное отклонение, Linf - наибольшее отклонение, относительное отклонение -
+        L2, отнесенное к среднеквадратичному значению величины в строке values_b
+    """
+    l2 = np.empty(len(index_a))
+    linf = np.empty(len(index_a))
+    scale = np.sqrt(np.nanmean(values_b ** 2, axis=1))
+    for start in range(0, len(index_a), pairs_chunk_size):
+        chunk = slice(start, start + pairs_chunk_size)
+        deviation = values_a[index_a[chunk]] - values_b[index_b[chunk]]
+        l2[chunk] = np.sqrt(np.nanmean(deviation ** 2, axis=1))
+        linf[chunk] = np.nanmax(np.abs(deviation), axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return l2, linf, l2 / scale[index_b]
+
+
+def compare_cases(registry: 'CaseRegistry', cases_a: typing.List[tuple], cases_b: typing.List[tuple]=None,
+                  lines: typing.Sequence[int]=(0, 1, 2)) -> typing.List[ComparisonRecord]:
+    """
+    Сравнивает каждый случай набора cases_a с каждым случаем набора cases_b (по умолчанию - все пары
+    случаев набора cases_a).
+
+    :param cases_a: расчетные случаи (solver, case)
+    :param cases_b: расчетные случаи (solver, case)
+    :return: записи, упорядоченные по убыванию относительного отклонения
+    """
+    if cases_b is None:
+        index_a, index_b = np.triu_indices(len(cases_a), 1)
+        cases = list(cases_a)
+    else:
+        index_a, index_b = [index.ravel() for index in np.meshgrid(np.arange(len(cases_a)),
+                                                                    len(cases_a) + np.arange(len(cases_b)),
+                                                                    indexing='ij')]
+        cases = list(cases_a) + list(cases_b)
+    result = []
+    for line in lines:
+        frames = registry.load_many([(solver, case, line) for solver, case in cases])
+        _, values = align_frames(frames, line, comparison_variables[line])
+        for name, variable_values in values.items():
+            l2, linf, relative = get_pair_metrics(variable_values, variable_values, index_a, index_b)
+            result.extend(ComparisonRecord(line, name, cases[a], cases[b], *metrics, exceeded=False)
+                          for a, b, metrics in zip(index_a, index_b, zip(l2, linf, relative)))
+    return rank_records(result)
+
+
+def rank_records(records: typing.List[ComparisonRecord]) -> typing.List[ComparisonRecord]:
+    return sorted(records, key=lambda record: -record.relative if np.isfinite(record.relative) else -np.inf)
+
+
+def _get_baseline_key(case: tuple, line: int, variable: str) -> str:
+    return '%s|%s|%s|%s' % (case[0], case[1], line, variable)
+
+
+def save_baseline(filename, registry: 'CaseRegistry', cases: typing.List[tuple],
+                  lines: typing.Sequence[int]=(0, 1, 2)):
+    """
+    Сохраняет эталон: значения сравниваемых величин случаев cases на общей координате каждой линии.
+    """
+    arrays = {}
+    for line in lines:
+        frames = registry.load_many([(solver, case, line) for solver, case in cases])
+        coordinate, values = align_frames(frames, line, comparison_variables[line])
+        arrays['coordinate|%s' % line] = coordinate
+        for name, variable_values in values.items():
+            for case, case_values in zip(cases, variable_values):
+                arrays[_get_baseline_key(case, line, name)] = case_values
+    dirname = os.path.dirname(filename)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    with open(filename + '.tmp', 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(filename + '.tmp', filename)
+
+
+def check_baseline(filename, registry: 'CaseRegistry', cases: typing.List[tuple]=None,
+                   tolerances: typing.Dict[str, float]=None) -> typing.List[ComparisonRecord]:
+    """
+    Сравнивает текущие данные с эталоном, сохраненным save_baseline. Отклонение случая, отсутствующего
+    в текущих данных или не покрывающего всех точек эталона, считается бесконечным.
+
+    :param cases: проверяемые случаи, по умолчанию все случаи эталона
+    :param tolerances: допустимые относительные отклонения величин, по умолчанию default_tolerances
+    :return: записи (case_a - текущий расчет, case_b - эталон), упорядоченные по убыванию относительного
+        отклонения; exceeded=True, если отклонение превышает допуск
+    """
+    tolerances = dict(default_tolerances, **(tolerances if tolerances is not None else {}))
+    result = []
+    with np.load(filename) as archive:
+        keys = [key.split('|') for key in archive.files if not key.startswith('coordinate|')]
+        lines = sorted({int(line) for _, _, line, _ in keys})
+        for line in lines:
+            coordinate = archive['coordinate|%s' % line]
+            line_keys = [((solver, case), variable) for solver, case, key_line, variable in keys
+                         if int(key_line) == line and (cases is None or (solver, case) in cases)]
+            line_cases = sorted({case for case, _ in line_keys})
+            available = [case for case in line_cases if (case[0], case[1], line) in registry.filenames]
+            frames = registry.load_many([(solver, case, line) for solver, case in available])
+            for name in sorted({variable for _, variable in line_keys}):
+                name_cases = [case for case, variable in line_keys if variable == name]
+                reference = np.array([archive[_get_baseline_key(case, line, name)] for case in name_cases])
+                current = np.full(reference.shape, np.nan)
+                current_cases = [case for case in name_cases if case in available]
+                if current_cases:
+                    _, values = align_frames([frames[available.index(case)] for case in current_cases], line,
+                                             [name], coordinate)
+                    current[[name_cases.index(case) for case in current_cases]] = values[name]
+                index = np.arange(len(name_cases))
+                l2, linf, relative = get_pair_metrics(current, reference, index, index)
+                # точки эталона, не покрытые текущей линией (линия стала короче или исчезла), не сравниваются
+                # по пересечению интервалов, а считаются отклонением
+                missing = np.any(np.isnan(current) & ~np.isnan(reference), axis=1)
+                relative[missing] = np.inf
+                for case, metrics in zip(name_cases, zip(l2, linf, relative)):
+                    exceeded = not metrics[2] <= tolerances.get(name, 0.)
+                    result.append(ComparisonRecord(line, name, case, case, *metrics, exceeded=exceeded))
+    return rank_records(result)
+
+
+def format_table(records: typing.List[ComparisonRecord], limit: int=None) -> str:
+    """
+    :return: таблица записей в порядке списка
+    """
+    result = '%4s %-4s %-24s %-52s %-52s %11s %11s %10s\n' % ('rank', 'line', 'variable', 'case a', 'case b', 'L2',
+                                                              'Linf', 'relative')
+    for rank, record in enumerate(records[:limit], 1):
+        result += '%4s %-4s %-24s %-52s %-52s %11.4e %11.4e %10.3e%s\n' % (
+            rank, record.line, record.variable, '/'.join(record.case_a), '/'.join(record.case_b), record.l2,
+            record.linf, record.relative, '  EXCEEDED' if record.exceeded else '')
+    return result
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import plot_creation
+    parser = argparse.ArgumentParser(description='Сравнение расчетных случаев ACE и CFX и проверка по эталону')
+    parser.add_argument('--save-baseline', help='сохранить эталон всех случаев в файл')
+    parser.add_argument('--check-baseline', help='проверить все случаи по эталону из файла')
+    parser.add_argument('--tolerance', type=float, help='допустимое относительное отклонение всех величин')
+    parser.add_argument('--limit', type=int, default=20, help='число строк таблицы')
+    args = parser.parse_args()
+    registry = plot_creation.registry
+    all_cases = sorted({(key.solver, key.case) for key in registry.keys()})
+    if args.save_baseline:
+        save_baseline(args.save_baseline, registry, all_cases)
+        print('baseline of %s cases is saved to %s' % (len(all_cases), args.save_baseline))
+    elif args.check_baseline:
+        tolerances = {name: args.tolerance for name in default_tolerances} if args.tolerance is not None else None
+        records = check_baseline(args.check_baseline, registry, tolerances=tolerances)
+        print(format_table(records, args.limit))
+        exceeded = [record for record in records if record.exceeded]
+        print('%s of %s checks exceeded tolerance' % (len(exceeded), len(records)))
+        sys.exit(1 if exceeded else 0)
+    else:
+        records = compare_cases(registry, [case for case in all_cases if case[0] == 'ace'],
+                                [case for case in all_cases if case[0] == 'cfx'])
+        print(format_table(records, args.limit))
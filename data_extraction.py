@@ -1,4 +1,6 @@
-from tecplot_lib import PolyLine, Point, LineDataExtractor
+from tecplot_lib import PolyLine, Point
+from line_data import CachedLineDataExtractor
+from instrumentation import start_trace_from_env
 import os
 
 pln_set1 = [PolyLine([Point(7.9, 0.15, 0), Point(7.9, 0.15, 0.35)], 1500),
@@ -12,14 +14,15 @@ ace_extracted_data_dir = r'extracted_data\ace'
 cfx_data_files_dir = os.path.join(data_files_dir, 'cfx')
 cfx_extracted_data_dir = r'extracted_data\cfx'
 
-ace_extractor = LineDataExtractor(ace_data_files_dir, ace_extracted_data_dir, [pln_set1, pln_set1, pln_set1,
-                                                                               pln_set1, pln_set1, pln_set1,
-                                                                               pln_set1, pln_set1, pln_set1],
-                                  r'macros\ace_data_extraction.mcr')
+ace_extractor = CachedLineDataExtractor(ace_data_files_dir, ace_extracted_data_dir, [pln_set1, pln_set1, pln_set1,
+                                                                                     pln_set1, pln_set1, pln_set1,
+                                                                                     pln_set1, pln_set1, pln_set1],
+                                        r'macros\ace_data_extraction.mcr')
 
-cfx_extractor = LineDataExtractor(cfx_data_files_dir, cfx_extracted_data_dir, [pln_set1, pln_set1],
-                                  r'macros\cfx_data_extraction.mcr')
+cfx_extractor = CachedLineDataExtractor(cfx_data_files_dir, cfx_extracted_data_dir, [pln_set1, pln_set1],
+                                        r'macros\cfx_data_extraction.mcr')
 
 if __name__ == '__main__':
+    start_trace_from_env()
     # ace_extractor.run_extraction()
     cfx_extractor.run_extraction()
@@ -0,0 +1,85 @@
+"""
+Прореживание кривых перед отрисовкой. Точки кривой группируются по столбцам пикселей вдоль монотонной оси
+(для профилей скорости - вертикальной), в каждом столбце сохраняются первая, последняя, наименьшая
+и наибольшая по другой оси точки (алгоритм M4). Ломаная по сохраненным точкам заполняет в каждом столбце
+те же пиксели, что и исходная, поэтому погрешность изображения не превышает одного пикселя, а число точек
+не превышает четырех на столбец независимо от числа точек кривой. Для логарифмической оси столбцы
+равномерны по логарифму координаты.
+"""
+import numpy as np
+import typing
+
+# кривые, число точек которых не превышает min_points_per_pixel * число пикселей, не прореживаются
+min_points_per_pixel = 4
+
+
+def _get_monotonic_axis(x: np.ndarray, y: np.ndarray) -> typing.Optional[int]:
+    for axis, values in enumerate((x, y)):
+        steps = np.diff(values)
+        if np.all(steps >= 0) or np.all(steps <= 0):
+            return axis
+    return None
+
+
+def _transform(values: np.ndarray, scale: str) -> np.ndarray:
+    if scale != 'log':
+        return values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.log10(values)
+    # неположительные значения на логарифмической оси не отображаются, они относятся к первому столбцу
+    finite = np.isfinite(result)
+    return np.where(finite, result, result[finite].min() if finite.any() else 0.)
+
+
+def get_m4_indexes(t: np.ndarray, v: np.ndarray, bucket_width: float, origin=0.) -> np.ndarray:
+    """
+    :param t: монотонная координата вдоль оси, по которой точки группируются
+    :param v: координата вдоль другой оси
+    :param bucket_width: ширина столбца в единицах t
+    :param origin: значение t на границе столбцов, например, на границе видимого интервала
+    :return: возрастающие индексы сохраняемых точек
+    """
+    n = len(t)
+    buckets = np.floor((t - origin) / bucket_width).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    lengths = np.diff(np.r_[starts, n])
+    # первые точки каждого столбца, в которых достигаются наименьшее и наибольшее значения
+    minimums = np.flatnonzero(v == np.repeat(np.minimum.reduceat(v, starts), lengths))
+    maximums = np.flatnonzero(v == np.repeat(np.maximum.reduceat(v, starts), lengths))
+    minimums = minimums[np.searchsorted(minimums, starts)]
+    maximums = maximums[np.searchsorted(maximums, starts)]
+    return np.unique(np.concatenate((starts, ends, minimums, maximums)))
+
+
+def decimate_curve(x: np.ndarray, y: np.ndarray, pixels: typing.Tuple[int, int], xlim=None, ylim=None,
+                   xscale='linear', yscale='linear') -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    Прореживает кривую, если одна из ее координат монотонна; кривые без монотонной координаты, с
+    пропущенными значениями или с небольшим числом точек возвращаются без изменений.
+
+    :param pixels: ширина и высота области графика в пикселях (оценка сверху, например, размер рисунка)
+    :param xlim: видимый интервал по горизонтальной оси, по умолчанию - интервал значений x
+    :param ylim: видимый интервал по вертикальной оси, по умолчанию - интервал значений y
+    :param xscale: масштаб горизонтальной оси, 'linear' или 'log'
+    :param yscale: масштаб вертикальной оси
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if not (np.all(np.isfinite(x)) and np.all(np.isfinite(y))):
+        return x, y
+    axis = _get_monotonic_axis(x, y)
+    if axis is None:
+        return x, y
+    values, limits, scale = ((x, xlim, xscale), (y, ylim, yscale))[axis]
+    other = (y, x)[axis]
+    t = _transform(values, scale)
+    if limits is not None:
+        lower, upper = _transform(np.array(limits, dtype=np.float64), scale)
+    else:
+        lower, upper = t.min(), t.max()
+    span = abs(upper - lower)
+    if span == 0 or len(t) <= min_points_per_pixel * pixels[axis]:
+        return x, y
+    indexes = get_m4_indexes(t, other, span / pixels[axis], min(lower, upper))
+    return x[indexes], y[indexes]
@@ -0,0 +1,85 @@
+"""
+Заменитель Tecplot для проверки TecplotBatchScheduler без Tecplot (например, в Linux). Вызывается так же,
+как Tecplot в пакетном режиме: python fake_tecplot.py -b -p macro.mcr. Из макроса выполняются только
+команды $!READDATASET, $!EXTRACTFROMPOLYLINE и $!EXPORT: данные по полилинии интерполируются по файлу
+с решением, если его удается прочитать (см. polyline_extraction), иначе записываются только координаты
+точек; при экспорте записывается пустой рисунок.
+
+Переменные окружения: FAKE_TECPLOT_DELAY - задержка выполнения макроса в секундах, FAKE_TECPLOT_FAILURES -
+число первых запусков каждого макроса, завершающихся с ошибкой.
+"""
+from tecplot_lib import Point, PolyLine
+from polyline_extraction import get_polyline_points, read_solution_file, CellLocator, write_line_data_file
+import os
+import re
+import struct
+import sys
+import time
+import typing
+import zlib
+
+
+def get_command_value(text: str, key: str) -> typing.Optional[str]:
+    match = re.search(r'%s\s*=\s*(\'[^\']*\'|\S+)' % key, text)
+    return match.group(1).strip("'") if match else None
+
+
+def extract_from_polyline(data_filename, polyline: PolyLine, filename):
+    points = get_polyline_points(polyline)
+    try:
+        locator = CellLocator(read_solution_file(data_filename))
+    except (OSError, KeyError, NotImplementedError, ValueError):
+        write_line_data_file(filename, ['X', 'Y', 'Z'], points.T)
+        return
+    _, values = locator.interpolate(points)
+    write_line_data_file(filename, locator.variables, values)
+
+
+def write_blank_png(filename, width=16, height=16):
+    def chunk(name: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + name + data + struct.pack('>I', zlib.crc32(name + data) & 0xffffffff)
+    rows = b''.join(b'\x00' + b'\xff' * 3 * width for _ in range(height))
+    with open(filename, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) +
+                   chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
+
+
+def run_macro(macro: str):
+    data_filename = None
+    export_filename = None
+    commands = re.split(r'^\$!', macro, flags=re.MULTILINE)
+    for command in commands:
+        if command.startswith('READDATASET'):
+            data_filename = command.split("'")[1]
+        elif command.startswith('EXTRACTFROMPOLYLINE'):
+            lines = command.split('RAWDATA', 1)[1].split('\n')[1:]
+            num_nodes = int(lines[0])
+            nodes = [Point(*map(float, line.split())) for line in lines[1: num_nodes + 1]]
+            polyline = PolyLine(nodes, int(get_command_value(command, 'NUMPTS')))
+            extract_from_polyline(data_filename, polyline, get_command_value(command, 'FNAME'))
+        elif command.startswith('EXPORTSETUP') and 'EXPORTFNAME' in command:
+            export_filename = get_command_value(command, 'EXPORTFNAME')
+        elif command.startswith('EXPORT') and not command.startswith('EXPORTSETUP'):
+            write_blank_png(export_filename)
+
+
+def fail_if_required(macro_filename) -> bool:
+    failures = int(os.environ.get('FAKE_TECPLOT_FAILURES', 0))
+    if not failures:
+        return False
+    counter_filename = macro_filename + '.failures'
+    count = int(open(counter_filename).read()) if os.path.exists(counter_filename) else 0
+    if count >= failures:
+        return False
+    with open(counter_filename, 'w') as file:
+        file.write(str(count + 1))
+    return True
+
+
+if __name__ == '__main__':
+    macro_filename = [arg for arg in sys.argv[1:] if not arg.startswith('-')][-1]
+    time.sleep(float(os.environ.get('FAKE_TECPLOT_DELAY', 0)))
+    if fail_if_required(macro_filename):
+        sys.exit('emulated failure')
+    with open(macro_filename, 'r') as file:
+        run_macro(file.read())
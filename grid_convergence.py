@@ -0,0 +1,244 @@
+"""
+Оценка сеточной сходимости по семействам расчетов на сетках различной густоты (Richardson extrapolation,
+Grid Convergence Index по Roache и Celik et al., 2008). Поля каждой линии всех сеток семейства
+интерполируются на общую координату, после чего порядок сходимости, экстраполированные значения и GCI
+вычисляются сразу во всех точках для всех троек соседних сеток.
+"""
+from boundary_layer import stack_profiles
+from case_index import get_case_metadata
+import numpy as np
+import collections
+import os
+import typing
+import warnings
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+    from case_registry import CaseRegistry
+
+# семейства расчетов, отличающихся только густотой сетки, от самой подробной сетки к самой грубой
+grid_families = {
+    'sp_al': [('ace', 'very_high_density_sp_al'), ('ace', 'high_grid_density_sp_al'),
+              ('ace', 'average_grid_density_sp_al')],
+    'k_eps': [('ace', 'very_high_density_k_eps'), ('ace', 'high_grid_density_k_eps')],
+}
+
+# координата, вдоль которой направлена линия, и величины, для которых оценивается сходимость
+line_coordinates = {0: 'Z', 1: 'Z', 2: 'X'}
+line_variables = {0: ['U'], 1: ['U'], 2: ['SkinFrictionCoefficient']}
+
+# коэффициенты запаса GCI для трех и более сеток и для двух сеток (при заданном порядке сходимости)
+safety_factor = 1.25
+two_grid_safety_factor = 3.
+
+# наименьший коэффициент измельчения, при котором оценка достоверна (Celik et al., 2008)
+min_refinement_ratio = 1.3
+
+# допустимый наблюдаемый порядок сходимости; вне этого интервала оценка в точке считается недостоверной
+observed_order_range = (0.5, 4.)
+
+GridConvergence = collections.namedtuple('GridConvergence', [
+    'coordinate', 'values', 'order', 'extrapolated', 'gci', 'oscillatory'
+])
+
+
+def interpolate_rows(x_new: np.ndarray, x: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Линейная интерполяция каждой строки values, заданной в точках соответствующей строки x, на общую
+    координату x_new. Строки x возрастают и могут быть дополнены в конце значениями NaN (см.
+    boundary_layer.stack_profiles). Интерполяция выполняется одним вызовом searchsorted по всем строкам:
+    строки сдвигаются на непересекающиеся интервалы.
+
+    :return: массив (число строк, len(x_new)); вне диапазона строки - NaN
+    """
+    x_new = np.asarray(x_new, dtype=np.float64)
+    n, m = x.shape
+    valid = ~np.isnan(x)
+    lengths = valid.sum(axis=1)
+    last = np.maximum(lengths - 1, 0)
+    rows = np.arange(n)
+    x = np.where(valid, x, x[rows, last][:, np.newaxis])
+    values = np.where(valid, values, values[rows, last][:, np.newaxis])
+    lower, upper = min(x.min(), x_new.min()), max(x.max(), x_new.max())
+    shift = (rows * (upper - lower + 1.))[:, np.newaxis]
+    keys = (x - lower + shift).ravel()
+    index = np.searchsorted(keys, (x_new[np.newaxis, :] - lower + shift).ravel(), side='right').reshape(n, -1) - 1
+    index = np.clip(index, (rows * m)[:, np.newaxis], (rows * m + np.maximum(last - 1, 0))[:, np.newaxis])
+    x1, x2 = x.ravel()[index], x.ravel()[index + 1]
+    y1, y2 = values.ravel()[index], values.ravel()[index + 1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = np.where(x2 != x1, (x_new - x1) / (x2 - x1), 0.)
+    inside = (x_new >= x[:, :1]) & (x_new <= x[rows, last][:, np.newaxis]) & (lengths >= 2)[:, np.newaxis]
+    return np.where(inside, y1 + t * (y2 - y1), np.nan)
+
+
+def get_refinement_ratios(cell_counts: typing.Sequence[float], dimension=3) -> np.ndarray:
+    """
+    :param cell_counts: числа ячеек сеток от самой подробной к самой грубой
+    :return: коэффициенты измельчения соседних сеток h_{i+1} / h_i, где h = (1 / N) ** (1 / dimension)
+    """
+    cell_counts = np.asarray(cell_counts, dtype=np.float64)
+    return (cell_counts[:-1] / cell_counts[1:]) ** (1 / dimension)
+
+
+def get_observed_order(phi1: np.ndarray, phi2: np.ndarray, phi3: np.ndarray, r21, r32, iterations=50,
+                       tolerance=1e-8) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    Наблюдаемый порядок сходимости по решениям на трех сетках (phi1 - самая подробная) при произвольных
+    коэффициентах измельчения; уравнение для порядка решается методом простой итерации сразу для всех точек.
+    В точках, где итерации не сошлись или порядок вне observed_order_range, порядок равен NaN.
+
+    :return: порядок сходимости и признак осцилляционной сходимости
+    """
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        ratio = (phi3 - phi2) / (phi2 - phi1)
+        s = np.sign(ratio)
+        log_ratio = np.log(np.abs(ratio))
+        order = np.abs(log_ratio) / np.log(r21)
+        step = np.full(np.broadcast(order, r21).shape, np.inf)
+        for _ in range(iterations):
+            q = np.log((r21 ** order - s) / (r32 ** order - s))
+            previous, order = order, np.abs(log_ratio + q) / np.log(r21)
+            step = np.abs(order - previous)
+            if np.all(~(step > tolerance * np.maximum(order, 1.))):
+                break
+        valid = (step <= tolerance * np.maximum(order, 1.)) & \
+            (order >= observed_order_range[0]) & (order <= observed_order_range[1])
+    return np.where(valid, order, np.nan), s < 0
+
+
+def get_grid_convergence(coordinate: np.ndarray, values: np.ndarray, cell_counts: typing.Sequence[float],
+                         assumed_order=2., dimension=3) -> GridConvergence:
+    """
+    Порядок сходимости, экстраполированные значения и GCI подробной сетки для каждой тройки соседних сеток
+    (для семейства из двух сеток - для единственной пары при порядке assumed_order).
+
+    :param coordinate: общая координата, (число точек,)
+    :param values: значения величины на сетках от самой подробной к самой грубой, (число сеток, число точек)
+    :param cell_counts: числа ячеек сеток
+    :param assumed_order: порядок сходимости, принимаемый для семейства из двух сеток
+    :param dimension: размерность задачи, используемая для определения коэффициентов измельчения
+    :return: order, extrapolated, gci и oscillatory размером (число троек, число точек); gci - относительная
+        погрешность решения на более подробной сетке тройки; в точках, где наблюдаемый порядок не определен
+        (см. get_observed_order), - NaN
+    """
+    values = np.asarray(values, dtype=np.float64)
+    ratios = get_refinement_ratios(cell_counts, dimension)
+    if np.any(ratios < min_refinement_ratio):
+        warnings.warn('Refinement ratios %s are below %s, grid convergence estimates are not reliable' %
+                      (', '.join('%.3f' % ratio for ratio in ratios), min_refinement_ratio))
+    if len(values) < 2:
+        raise ValueError('At least two grids are required')
+    if len(values) == 2:
+        order = np.full((1, values.shape[1]), float(assumed_order))
+        oscillatory = np.zeros(order.shape, dtype=bool)
+        factor = two_grid_safety_factor
+    else:
+        order, oscillatory = get_observed_order(values[:-2], values[1:-1], values[2:], ratios[:-1, np.newaxis],
+                                                ratios[1:, np.newaxis])
+        factor = safety_factor
+    phi1, phi2 = values[:len(order)], values[1: len(order) + 1]
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        r_p = ratios[:len(order), np.newaxis] ** order
+        extrapolated = (r_p * phi1 - phi2) / (r_p - 1)
+        gci = factor * np.abs((phi1 - phi2) / phi1) / (r_p - 1)
+    return GridConvergence(coordinate=coordinate, values=values, order=order, extrapolated=extrapolated, gci=gci,
+                           oscillatory=oscillatory)
+
+
+def get_error_band(convergence: GridConvergence) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    :return: нижняя и верхняя границы погрешности решения на самой подробной сетке
+    """
+    error = convergence.gci[0] * np.abs(convergence.values[0])
+    return convergence.values[0] - error, convergence.values[0] + error
+
+
+def get_frames_convergence(frames: typing.List['pd.DataFrame'], cell_counts: typing.Sequence[float],
+                           coordinate_name: str, variables: typing.List[str], coordinate: np.ndarray=None,
+                           **kwargs) -> typing.Dict[str, GridConvergence]:
+    """
+    :param frames: данные одной линии на сетках от самой подробной к самой грубой
+    :param coordinate_name: имя координаты, вдоль которой направлена линия
+    :param coordinate: общая координата, по умолчанию - точки линии на самой подробной сетке
+    :param kwargs: параметры get_grid_convergence
+    :return: словарь, ставящий в соответствие имени величины результаты оценки
+    """
+    x = stack_profiles(frames, coordinate_name)
+    if coordinate is None:
+        coordinate = x[0][~np.isnan(x[0])]
+    return {name: get_grid_convergence(coordinate, interpolate_rows(coordinate, x, stack_profiles(frames, name)),
+                                       cell_counts, **kwargs)
+            for name in variables}
+
+
+def get_family_convergence(registry: 'CaseRegistry', family: typing.List[typing.Tuple[str, str]], line: int,
+                           variables: typing.List[str]=None, **kwargs) -> typing.Dict[str, GridConvergence]:
+    """
+    :param family: расчетные случаи (solver, case) от самой подробной сетки к самой грубой, например,
+        grid_families['sp_al']; числа ячеек определяются по именам случаев (case_index.get_case_metadata)
+    :param variables: величины, по умолчанию line_variables[line]
+    """
+    frames = registry.load_many([(solver, case, line) for solver, case in family])
+    cell_counts = [get_case_metadata(solver, case)['cell_count'] for solver, case in family]
+    return get_frames_convergence(frames, cell_counts, line_coordinates[line],
+                                  variables if variables is not None else line_variables[line], **kwargs)
+
+
+def plot_error_band(convergence: GridConvergence, filename, variable_label: str, coordinate_label: str,
+                    labels: typing.List[str]=None, wall_normal=False):
+    """
+    Сохраняет график решений на сетках семейства, экстраполированного решения и полосы погрешности решения
+    на самой подробной сетке. Для линий, направленных по нормали к стенке (wall_normal=True), координата
+    откладывается по вертикальной оси, как на графиках профилей скорости.
+    """
+    import matplotlib.pyplot as plt
+    lower, upper = get_error_band(convergence)
+    x = convergence.coordinate
+    fig = plt.figure(figsize=(8, 6))
+
+    def plot(values, **style):
+        if wall_normal:
+            plt.plot(values, x, **style)
+        else:
+            plt.plot(x, values, **style)
+
+    if wall_normal:
+        plt.fill_betweenx(x, lower, upper, color='grey', alpha=0.4, label=r'$GCI$')
+    else:
+        plt.fill_between(x, lower, upper, color='grey', alpha=0.4, label=r'$GCI$')
+    colors = ['green', 'blue', 'red', 'orange', 'magenta']
+    for n, values in enumerate(convergence.values):
+        label = labels[n] if labels is not None else r'$Сетка\ %s$' % (n + 1)
+        plot(values, lw=1, color=colors[n % len(colors)], label=label)
+    plot(convergence.extrapolated[0], lw=1.5, color='black', linestyle='--', label=r'$Экстраполяция$')
+    plt.xlabel(variable_label if wall_normal else coordinate_label, fontsize=14)
+    plt.ylabel(coordinate_label if wall_normal else variable_label, fontsize=14)
+    plt.grid()
+    plt.legend(fontsize=10)
+    plt.savefig(filename)
+    plt.close(fig)
+
+
+if __name__ == '__main__':
+    import matplotlib
+    matplotlib.use('Agg')
+    from plot_creation import registry, plots_dir
+    labels = {'U': r'$U,\ м/с$', 'SkinFrictionCoefficient': r'$C_f$', 'X': r'$X,\ м$', 'Z': r'$Z,\ м$'}
+    dirname = os.path.join(plots_dir, 'grid_convergence')
+    os.makedirs(dirname, exist_ok=True)
+    for family_name, family in sorted(grid_families.items()):
+        cell_labels = [r'$%.1f \cdot 10^6\ ячеек$' % (get_case_metadata(*case)['cell_count'] / 1e6)
+                       for case in family]
+        for line in sorted(line_coordinates):
+            for variable, convergence in get_family_convergence(registry, family, line).items():
+                with np.errstate(invalid='ignore'):
+                    print('%s line %s %s: valid points = %.0f%%, median order = %.2f, median GCI = %.2e, '
+                          'max GCI = %.2e, oscillatory = %.0f%%' %
+                          (family_name, line, variable, 100 * np.isfinite(convergence.order[0]).mean(),
+                           np.nanmedian(convergence.order[0]), np.nanmedian(convergence.gci[0]),
+                           np.nanmax(convergence.gci[0]), 100 * convergence.oscillatory[0].mean()))
+                plot_error_band(convergence,
+                                os.path.join(dirname, '%s_%s_line_%s.png' % (family_name, variable, line)),
+                                labels[variable], labels[line_coordinates[line]], cell_labels,
+                                wall_normal=line in (0, 1))
@@ -0,0 +1,241 @@
+"""
+Трассировка этапов обработки: именованные интервалы времени с приростом прочитанных байт и пиковым объемом
+памяти процесса, периодические замеры объема памяти и, по желанию, профилирование cProfile отдельных
+этапов. Трасса записывается в JSON в формате Trace Event (chrome://tracing, https://ui.perfetto.dev,
+https://www.speedscope.app), где отображается как временная диаграмма или flame chart.
+
+Трассировка включается вызовом start_trace или переменными окружения PLATE_TRACE (имя файла трассы)
+и PLATE_TRACE_PROFILE (имена профилируемых этапов через запятую), см. start_trace_from_env. При выключенной
+трассировке span не выполняет никаких замеров.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import typing
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+trace_env_name = 'PLATE_TRACE'
+profile_env_name = 'PLATE_TRACE_PROFILE'
+
+
+def get_rss() -> typing.Optional[int]:
+    """
+    :return: текущий объем памяти процесса в байтах
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def get_peak_rss() -> typing.Optional[int]:
+    """
+    :return: наибольший с момента запуска объем памяти процесса в байтах
+    """
+    if psutil is not None and hasattr(psutil.Process().memory_info(), 'peak_wset'):
+        return psutil.Process().memory_info().peak_wset
+    if resource is not None:
+        # в Linux ru_maxrss в килобайтах, в macOS - в байтах
+        scale = 1 if os.uname().sysname == 'Darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    return None
+
+
+def get_read_bytes() -> typing.Optional[int]:
+    """
+    :return: число байт, прочитанных процессом (включая чтение из файлового кэша)
+    """
+    if psutil is not None:
+        counters = psutil.Process().io_counters()
+        return getattr(counters, 'read_chars', counters.read_bytes)
+    try:
+        with open('/proc/self/io', 'r') as file:
+            for line in file:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _get_delta(start: typing.Optional[int], end: typing.Optional[int]) -> typing.Optional[int]:
+    return end - start if start is not None and end is not None else None
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+class _Span:
+    def __init__(self, tracer: 'Tracer', name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.profiler = None
+        self.read_bytes = None
+        self.start = None
+
+    def __enter__(self):
+        if self.name in self.tracer.profile:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.read_bytes = get_read_bytes()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.args['profile'] = self.tracer.dump_profile(self.name, self.profiler)
+        self.args['bytes_read'] = _get_delta(self.read_bytes, get_read_bytes())
+        self.args['peak_rss'] = get_peak_rss()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer.add_event({'name': self.name, 'cat': 'stage', 'ph': 'X',
+                               'ts': (self.start - self.tracer.origin) * 1e6, 'dur': (end - self.start) * 1e6,
+                               'pid': os.getpid(), 'tid': threading.get_ident(), 'args': self.args})
+        return False
+
+
+class Tracer:
+    """
+    Собирает события трассы. События дочерних процессов (например, процессов пула, отрисовывающих графики)
+    дописываются в отдельные файлы <filename>.<pid>.part, которые объединяются с трассой при ее сохранении.
+    """
+    def __init__(self):
+        self.filename = None
+        self.profile = frozenset()
+        self.events = []
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self._profile_count = 0
+        self._sampler = None
+        self._stop_sampling = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.filename is not None
+
+    def start(self, filename, profile: typing.Iterable[str]=(), sample_interval=0.05):
+        """
+        :param filename: имя файла трассы
+        :param profile: имена этапов, выполнение которых профилируется cProfile; результаты записываются
+            в файлы <filename>.<этап>.<pid>.<n>.prof
+        :param sample_interval: интервал замеров объема памяти в секундах, None - без замеров
+        """
+        self.filename = os.path.abspath(filename)
+        self.profile = frozenset(profile)
+        self.events = []
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        for part_filename in glob.glob(glob.escape(self.filename) + '.*.part'):
+            os.remove(part_filename)
+        self.add_event({'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'args': {'name': 'main'}})
+        if sample_interval is not None:
+            self._stop_sampling.clear()
+            self._sampler = threading.Thread(target=self._sample_memory, args=(sample_interval,), daemon=True)
+            self._sampler.start()
+
+    def _sample_memory(self, interval: float):
+        while not self._stop_sampling.wait(interval):
+            rss = get_rss()
+            if rss is None:
+                return
+            self.add_event({'name': 'rss', 'ph': 'C', 'ts': (time.perf_counter() - self.origin) * 1e6,
+                            'pid': self.pid, 'args': {'MB': rss / 2 ** 20}})
+
+    def span(self, name: str, **args):
+        """
+        :return: контекстный менеджер, отмечающий интервал выполнения этапа name; args записываются в трассу
+        """
+        if not self.enabled:
+            return _null_span
+        return _Span(self, name, args)
+
+    def add_event(self, event: dict):
+        if os.getpid() == self.pid:
+            self.events.append(event)
+            return
+        with open('%s.%s.part' % (self.filename, os.getpid()), 'a') as file:
+            file.write(json.dumps(event, default=str) + '\n')
+
+    def dump_profile(self, name: str, profiler) -> str:
+        self._profile_count += 1
+        filename = '%s.%s.%s.%s.prof' % (self.filename, name.replace(' ', '_').replace(':', ''), os.getpid(),
+                                         self._profile_count)
+        profiler.dump_stats(filename)
+        return filename
+
+    def save(self):
+        """
+        Записывает трассу, включая события дочерних процессов.
+        """
+        if not self.enabled or os.getpid() != self.pid:
+            return
+        if self._sampler is not None:
+            self._stop_sampling.set()
+            self._sampler.join()
+            self._sampler = None
+        events = list(self.events)
+        for part_filename in sorted(glob.glob(glob.escape(self.filename) + '.*.part')):
+            with open(part_filename, 'r') as file:
+                events.extend(json.loads(line) for line in file if line.strip())
+            os.remove(part_filename)
+        with open(self.filename, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file, default=str)
+
+
+tracer = Tracer()
+
+
+def span(name: str, **args):
+    """
+    Интервал выполнения этапа в трассе по умолчанию, например:
+
+        with span('load', dirname=dirname):
+            ...
+    """
+    return tracer.span(name, **args)
+
+
+def start_trace(filename, profile: typing.Iterable[str]=(), sample_interval=0.05):
+    """
+    Включает трассировку; трасса записывается при вызове tracer.save() или при завершении процесса.
+    """
+    tracer.start(filename, profile, sample_interval)
+    atexit.register(tracer.save)
+
+
+def start_trace_from_env():
+    """
+    Включает трассировку, если задана переменная окружения PLATE_TRACE.
+    """
+    filename = os.environ.get(trace_env_name)
+    if not filename:
+        return
+    profile = [name.strip() for name in os.environ.get(profile_env_name, '').split(',') if name.strip()]
+    start_trace(filename, profile)
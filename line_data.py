@@ -0,0 +1,420 @@
+from tecplot_lib import LineDataLoader, LineDataExtractor
+from instrumentation import span
+import numpy as np
+import pandas as pd
+import hashlib
+import itertools
+import json
+import os
+import re
+import time
+import typing
+
+# имя директории с кэшем, располагается рядом с директориями извлеченных данных
+cache_dirname = '.cache'
+
+
+def get_cache_dir(data_dirname) -> str:
+    """
+    :param data_dirname: имя папки с извлеченными данными, например, extracted_data/ace
+    :return: имя папки с бинарным кэшем для этих данных, например, extracted_data/.cache/ace
+
+    Кэш не может храниться в самой папке с .dat файлами, так как LineDataLoader считывает все
+    содержащиеся в ней файлы.
+    """
+    data_dirname = os.path.normpath(data_dirname)
+    return os.path.join(os.path.dirname(data_dirname), cache_dirname, os.path.basename(data_dirname))
+
+
+def get_data_filenames(data_dirname) -> typing.List[str]:
+    """
+    :return: отсортированный по имени список .dat файлов в папке data_dirname
+    """
+    return sorted(filename for filename in os.listdir(data_dirname) if filename.endswith('.dat'))
+
+
+def get_file_hash(filename) -> str:
+    sha1 = hashlib.sha1()
+    with open(filename, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def _get_variable_names(string: str) -> typing.List[str]:
+    names = re.findall(r'"([^"]*)"', string)
+    return names if names else [string.strip()]
+
+
+def get_frame(variables: typing.List[str], data: np.ndarray) -> pd.DataFrame:
+    return pd.DataFrame(data.T, columns=variables, copy=False)
+
+
+class LineBlock:
+    """
+    Данные всех линий одного набора данных в одном непрерывном массиве размером (число переменных,
+    суммарное число точек); точки линии n занимают столбцы offsets[n]:offsets[n + 1].
+    """
+    def __init__(self, variables: typing.List[str], data: np.ndarray, offsets: typing.List[int],
+                 zone_names: typing.List[str]=None):
+        """
+        :param variables: имена переменных
+        :param data: значения переменных
+        :param offsets: индексы первых точек линий
+        :param zone_names: имена зон, по умолчанию line_<n>
+        """
+        self.variables = variables
+        self.data = data
+        self.offsets = list(offsets)
+        self.zone_names = zone_names if zone_names is not None else ['line_%s' % n for n in range(len(offsets))]
+
+    @property
+    def lengths(self) -> typing.List[int]:
+        return [int(length) for length in np.diff(self.offsets + [self.data.shape[1]])]
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def line(self, n: int) -> np.ndarray:
+        """
+        :return: значения переменных на линии n без копирования, массив (число переменных, число точек)
+        """
+        return self.data[:, self.offsets[n]: self.offsets[n] + self.lengths[n]]
+
+    def frame(self, n: int) -> pd.DataFrame:
+        return get_frame(self.variables, self.line(n))
+
+    def to_array(self) -> np.ndarray:
+        """
+        :return: массив (число линий, число точек, число переменных); линии с меньшим числом точек
+            дополняются значениями NaN
+        """
+        result = np.full((len(self), max(self.lengths), len(self.variables)), np.nan, dtype=self.data.dtype)
+        for n, length in enumerate(self.lengths):
+            result[n, :length] = self.line(n).T
+        return result
+
+
+def _get_zone_name(line: str, default: str) -> str:
+    if 'T=' not in line:
+        return default
+    return line.split('T=', 1)[1].split('"')[1]
+
+
+# число строк, разбираемых за один раз
+chunk_size = 16384
+
+
+class LineDataHeader:
+    """
+    Заголовок файла с извлеченными данными: имена переменных, имена зон, число точек в каждой зоне и
+    смещение (в байтах) начала данных первой зоны.
+    """
+    def __init__(self, variables: typing.List[str], zone_names: typing.List[str], lengths: typing.List[int],
+                 data_position: int):
+        self.variables = variables
+        self.zone_names = zone_names
+        self.lengths = lengths
+        self.data_position = data_position
+
+    @property
+    def offsets(self) -> typing.List[int]:
+        return [int(offset) for offset in np.cumsum([0] + self.lengths[:-1])]
+
+
+def _is_data_line(line: bytes) -> bool:
+    return not line.startswith((b'ZONE', b'DT')) and bool(line.strip())
+
+
+def read_line_data_header(filename) -> LineDataHeader:
+    """
+    Разбирает строки VARIABLES, ZONE и DT и подсчитывает число строк с данными в каждой зоне, не сохраняя
+    сами строки.
+    """
+    header = ''
+    zone_names = []
+    lengths = []
+    data_position = None
+    with open(filename, 'rb') as file:
+        for line in iter(file.readline, b''):
+            if line.startswith(b'ZONE'):
+                zone_names.append(_get_zone_name(line.decode(), 'line_%s' % len(zone_names)))
+                lengths.append(0)
+            elif line.startswith(b'DT'):
+                if data_position is None:
+                    data_position = file.tell()
+            elif zone_names:
+                if line.strip():
+                    lengths[-1] += 1
+            else:
+                header += line.decode()
+    variables = _get_variable_names(header.split('=', 1)[1])
+    return LineDataHeader(variables, zone_names, lengths, data_position)
+
+
+def read_line_block_file(filename, columns: typing.List[str]=None, dtype=np.float64, out_filename=None) -> \
+        LineBlock:
+    """
+    Считывает файл с данными, извлеченными по одной (формат Tecplot) или нескольким полилиниям (несколько
+    зон в одном файле, каждая начинается со строки ZONE). Данные разбираются порциями по chunk_size строк
+    сразу в заранее выделенный массив, поэтому занимаемая память определяется только выбранными столбцами.
+
+    :param filename: имя .dat файла
+    :param columns: имена считываемых переменных, по умолчанию все
+    :param dtype: тип значений, например, np.float32
+    :param out_filename: имя .npy файла; если задано, значения записываются не в память, а в этот файл,
+        отображенный в память
+    """
+    header = read_line_data_header(filename)
+    columns = list(columns) if columns is not None else header.variables
+    column_indexes = [header.variables.index(name) for name in columns]
+    shape = (len(columns), sum(header.lengths))
+    if out_filename is None:
+        data = np.empty(shape, dtype=dtype)
+    else:
+        data = np.lib.format.open_memmap(out_filename, mode='w+', dtype=dtype, shape=shape)
+    with open(filename, 'rb') as file:
+        file.seek(header.data_position)
+        lines = filter(_is_data_line, file)
+        position = 0
+        while position < data.shape[1]:
+            chunk = list(itertools.islice(lines, chunk_size))
+            values = np.loadtxt(chunk, dtype=dtype, usecols=column_indexes, ndmin=2)
+            data[:, position: position + len(chunk)] = values.T
+            position += len(chunk)
+    if out_filename is not None:
+        data.flush()
+    return LineBlock(columns, data, header.offsets, header.zone_names)
+
+
+def read_line_data_file(filename, columns: typing.List[str]=None, dtype=np.float64) -> \
+        typing.Tuple[typing.List[str], np.ndarray]:
+    """
+    Считывает файл, извлеченный из Tecplot по полилинии (формат POINT).
+
+    :param filename: имя .dat файла
+    :param columns: имена считываемых переменных, по умолчанию все
+    :param dtype: тип значений
+    :return: список имен переменных и массив значений размером (число переменных, число точек)
+    """
+    block = read_line_block_file(filename, columns, dtype)
+    return block.variables, block.data
+
+
+def get_block_projection(block: LineBlock, columns: typing.List[str]=None, dtype=np.float64) -> LineBlock:
+    """
+    :return: блок, содержащий только заданные столбцы; если столбцы не заданы и тип совпадает, возвращается
+        исходный блок без копирования
+    """
+    if columns is None:
+        if block.data.dtype == dtype:
+            return block
+        return LineBlock(block.variables, block.data.astype(dtype), block.offsets, block.zone_names)
+    columns = list(columns)
+    data = np.array(block.data[[block.variables.index(name) for name in columns]], dtype=dtype)
+    return LineBlock(columns, data, block.offsets, block.zone_names)
+
+
+class LineDataCache:
+    """
+    Бинарный кэш извлеченных данных. Для каждого .dat файла хранится массив .npy, записанный по столбцам
+    (размер (число переменных, число точек)), и .json файл с именами переменных, границами зон и ключом
+    исходного файла (размер, время изменения и хэш). Кэш считается актуальным, если совпадают размер и время изменения
+    исходного файла, либо, при несовпадении времени изменения, его хэш.
+    """
+    def __init__(self, data_dirname, cache_dir=None):
+        """
+        :param data_dirname: имя папки с извлеченными данными
+        :param cache_dir: имя папки с кэшем, по умолчанию определяется функцией get_cache_dir
+        """
+        self.data_dirname = data_dirname
+        self.cache_dir = cache_dir if cache_dir is not None else get_cache_dir(data_dirname)
+
+    def _get_cache_filenames(self, filename) -> typing.Tuple[str, str]:
+        name = os.path.splitext(os.path.basename(filename))[0]
+        return os.path.join(self.cache_dir, name + '.npy'), os.path.join(self.cache_dir, name + '.json')
+
+    def _read_meta(self, filename) -> typing.Optional[dict]:
+        array_filename, meta_filename = self._get_cache_filenames(filename)
+        if not os.path.exists(array_filename) or not os.path.exists(meta_filename):
+            return None
+        with open(meta_filename, 'r') as file:
+            try:
+                return json.load(file)
+            except ValueError:
+                return None
+
+    def _write_meta(self, filename, meta: dict):
+        meta_filename = self._get_cache_filenames(filename)[1]
+        with open(meta_filename + '.tmp', 'w') as file:
+            json.dump(meta, file, indent=1)
+        os.replace(meta_filename + '.tmp', meta_filename)
+
+    def is_valid(self, filename) -> bool:
+        """
+        :param filename: полное имя исходного .dat файла
+        """
+        meta = self._read_meta(filename)
+        if meta is None:
+            return False
+        stat = os.stat(filename)
+        if stat.st_size != meta['size']:
+            return False
+        if stat.st_mtime_ns == meta['mtime_ns']:
+            return True
+        if get_file_hash(filename) != meta['sha1']:
+            return False
+        # файл был перезаписан без изменений, обновляем время изменения в ключе
+        meta['mtime_ns'] = stat.st_mtime_ns
+        self._write_meta(filename, meta)
+        return True
+
+    def update(self, filename) -> LineBlock:
+        """
+        Разбирает исходный файл и записывает его бинарную копию в кэш. Значения разбираются порциями сразу
+        в файл кэша, поэтому файл целиком в памяти не размещается.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        stat = os.stat(filename)
+        sha1 = get_file_hash(filename)
+        array_filename = self._get_cache_filenames(filename)[0]
+        block = read_line_block_file(filename, out_filename=array_filename + '.tmp')
+        # отображение временного файла должно быть закрыто до его переименования (иначе в Windows ошибка)
+        meta = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': sha1, 'variables': block.variables,
+                'shape': list(block.data.shape), 'offsets': block.offsets, 'zone_names': block.zone_names}
+        del block
+        os.replace(array_filename + '.tmp', array_filename)
+        self._write_meta(filename, meta)
+        data = np.load(array_filename, mmap_mode='r')
+        return LineBlock(meta['variables'], data, meta['offsets'], meta['zone_names'])
+
+    def read_block(self, filename, mmap=True, columns: typing.List[str]=None, dtype=np.float64) -> LineBlock:
+        """
+        Возвращает данные файла из кэша, при отсутствии актуального кэша предварительно обновляет его.
+        Если заданы столбцы, из кэша копируются только они.
+
+        :param filename: полное имя исходного .dat файла
+        :param mmap: если True, массив отображается в память, а не считывается целиком
+        :param columns: имена считываемых переменных, по умолчанию все
+        :param dtype: тип значений
+        """
+        if not self.is_valid(filename):
+            block = self.update(filename)
+        else:
+            meta = self._read_meta(filename)
+            data = np.load(self._get_cache_filenames(filename)[0], mmap_mode='r' if mmap else None)
+            block = LineBlock(meta['variables'], data, meta.get('offsets', [0]), meta.get('zone_names'))
+        return get_block_projection(block, columns, dtype)
+
+    def read(self, filename, mmap=True) -> typing.Tuple[typing.List[str], np.ndarray]:
+        """
+        :return: список имен переменных и массив значений всех зон файла
+        """
+        block = self.read_block(filename, mmap)
+        return block.variables, block.data
+
+    def update_all(self):
+        """
+        Обновляет кэш для всех устаревших файлов папки.
+        """
+        for filename in get_data_filenames(self.data_dirname):
+            filename = os.path.join(self.data_dirname, filename)
+            if not self.is_valid(filename):
+                self.update(filename)
+
+    def clear(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for filename in os.listdir(self.cache_dir):
+            os.remove(os.path.join(self.cache_dir, filename))
+
+
+class CachedLineDataLoader(LineDataLoader):
+    """
+    Аналог LineDataLoader, считывающий данные через бинарный кэш. Файлы загружаются в порядке сортировки
+    имен, список их имен хранится в поле filenames. Файлы с несколькими зонами считываются одним блоком
+    (поле blocks), в список frames добавляется по одному frame на каждую зону.
+    """
+    def __init__(self, data_dirname: str, use_cache=True, mmap=True, columns: typing.List[str]=None,
+                 dtype=np.float64):
+        """
+        :param data_dirname: имя папки, содержащей файлы с извлеченными данными
+        :param use_cache: если False, файлы разбираются без использования кэша
+        :param mmap: если True, данные из кэша отображаются в память
+        :param columns: имена считываемых переменных, по умолчанию все
+        :param dtype: тип значений, например, np.float32
+        """
+        LineDataLoader.__init__(self, data_dirname)
+        self.data_dirname = data_dirname
+        self.use_cache = use_cache
+        self.mmap = mmap
+        self.columns = columns
+        self.dtype = dtype
+        self.cache = LineDataCache(data_dirname)
+        self.filenames = []
+        self.blocks = []
+        self.frames = []
+
+    def load_block(self, filename) -> LineBlock:
+        """
+        :param filename: имя .dat файла в папке data_dirname
+        :return: данные всех зон файла одним непрерывным блоком
+        """
+        filename = os.path.join(self.data_dirname, filename)
+        with span('load_file', filename=filename, use_cache=self.use_cache):
+            if self.use_cache:
+                return self.cache.read_block(filename, self.mmap, self.columns, self.dtype)
+            return read_line_block_file(filename, self.columns, self.dtype)
+
+    def load_file(self, filename) -> pd.DataFrame:
+        """
+        :param filename: имя .dat файла в папке data_dirname
+        :return: данные файла, для файлов с несколькими зонами - данные всех зон подряд
+        """
+        block = self.load_block(filename)
+        return get_frame(block.variables, block.data)
+
+    def load(self):
+        with span('load', dirname=self.data_dirname):
+            self.filenames = get_data_filenames(self.data_dirname)
+            self.blocks = [self.load_block(filename) for filename in self.filenames]
+            self.frames = [block.frame(n) for block in self.blocks for n in range(len(block))]
+
+
+class CachedLineDataExtractor(LineDataExtractor):
+    """
+    Аналог LineDataExtractor, обновляющий бинарный кэш извлеченных данных после выполнения макроса.
+    """
+    def run_extraction(self):
+        with span('run_extraction', macro=self.macro_name, datafiles_dir=self.datafiles_dir):
+            LineDataExtractor.run_extraction(self)
+        with span('cache_update', dirname=self.output_dir):
+            LineDataCache(self.output_dir).update_all()
+
+
+def get_load_timing_report(data_dirname) -> str:
+    """
+    Сравнивает время загрузки данных папки загрузчиком LineDataLoader, без кэша (разбор текста), с построением
+    кэша и с готовым кэшем.
+    """
+    cache = LineDataCache(data_dirname)
+    cache.clear()
+    timings = []
+    start = time.perf_counter()
+    LineDataLoader(data_dirname).load()
+    timings.append(('LineDataLoader', time.perf_counter() - start))
+    for name, use_cache in (('text parsing', False), ('cold (cache build)', True), ('warm (cache hit)', True)):
+        loader = CachedLineDataLoader(data_dirname, use_cache=use_cache)
+        start = time.perf_counter()
+        loader.load()
+        timings.append((name, time.perf_counter() - start))
+    size = sum(os.path.getsize(os.path.join(data_dirname, filename)) for filename in loader.filenames)
+    result = '%s: %s files, %.1f MB\n' % (data_dirname, len(loader.filenames), size / 2**20)
+    for name, timing in timings:
+        result += '    %-20s %8.3f s  (x%.1f)\n' % (name, timing, timings[0][1] / timing)
+    return result
+
+
+if __name__ == '__main__':
+    for dirname in (os.path.join('extracted_data', 'ace'), os.path.join('extracted_data', 'cfx')):
+        print(get_load_timing_report(dirname))
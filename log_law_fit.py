@@ -0,0 +1,202 @@
+"""
+Определение параметров логарифмического закона стенки U+ = ln(Y+) / kappa + B и динамической скорости по самим
+профилям скорости, без столбцов касательного напряжения на стенке, записываемых решателем. Профили передаются,
+как в boundary_layer, двумерными массивами (число профилей, число точек) с первой точкой на стенке; параметры
+всех профилей определяются методом наименьших квадратов за один проход по массивам.
+"""
+from boundary_layer import get_last_values, get_delta99
+import numpy as np
+import collections
+
+LogLawFit = collections.namedtuple('LogLawFit', ['u_tau', 'kappa', 'B', 'residual', 'points', 'y0',
+                                                 'first_cell_y_plus', 'valid'])
+
+# границы логарифмической области по Y+ и по доле толщины пограничного слоя
+log_region_y_plus = (30., 300.)
+log_region_outer_fraction = 0.2
+
+# граница вязкого подслоя по Y+
+viscous_sublayer_y_plus = 5.
+
+# значения kappa и B, при которых подобранный закон считается правдоподобным
+plausible_kappa_range = (0.3, 0.5)
+plausible_b_range = (2., 8.)
+
+# наибольшее среднеквадратичное отклонение точек логарифмической области от закона в единицах U+
+max_residual = 0.1
+
+# относительное изменение наклона профиля, считающееся изломом на границе ячейки
+kink_tolerance = 1e-6
+
+
+def get_crossover(kappa, b, iterations=50, tolerance=1e-12) -> np.ndarray:
+    """
+    Находит методом Ньютона большее из значений Y+, при которых линейный закон U+ = Y+ совпадает
+    с логарифмическим U+ = ln(Y+) / kappa + B. Вычисление выполняется сразу для массивов kappa и B.
+
+    :return: значения Y+; NaN, если законы не пересекаются
+    """
+    kappa, b = np.broadcast_arrays(np.asarray(kappa, dtype=np.float64), np.asarray(b, dtype=np.float64))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # функция y - ln(y) / kappa - B выпукла, ее минимум находится в точке y = 1 / kappa, поэтому итерации
+        # из начального приближения правее большего корня сходятся к нему монотонно
+        y = 10 / kappa + np.abs(b)
+        for _ in range(iterations):
+            step = (y - np.log(y) / kappa - b) / (1 - 1 / (kappa * y))
+            y = y - step
+            if np.all(~(np.abs(step) > tolerance * y)):
+                break
+        crosses = 1 / kappa * (1 + np.log(kappa)) - b <= 0
+        return np.where(crosses & (kappa > 0), y, np.nan)
+
+
+def _fit_lines(x: np.ndarray, y: np.ndarray, mask: np.ndarray) -> tuple:
+    """
+    Метод наименьших квадратов y = a * x + b для каждой строки по точкам, отмеченным mask.
+
+    :return: a, b, число точек
+    """
+    weight = mask.astype(np.float64)
+    x = np.where(mask, x, 0.)
+    y = np.where(mask, y, 0.)
+    n = weight.sum(axis=1)
+    sx, sy = x.sum(axis=1), y.sum(axis=1)
+    sxx, sxy = (x * x).sum(axis=1), (x * y).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        a = (n * sxy - sx * sy) / (n * sxx - sx ** 2)
+        b = (sy - a * sx) / n
+    return np.where(n >= 3, a, np.nan), np.where(n >= 3, b, np.nan), n
+
+
+def get_first_cell_height(z: np.ndarray, u: np.ndarray) -> np.ndarray:
+    """
+    Расстояние от стенки до первого узла сетки. Данные извлекаются по линии линейной интерполяцией внутри
+    ячеек, поэтому профиль кусочно-линеен, и первый узел - первая точка, в которой меняется наклон профиля.
+
+    :return: расстояния по числу профилей; NaN, если излом не найден
+    """
+    du = np.diff(u, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = du / np.diff(z, axis=1)
+        change = np.abs(np.diff(slope, axis=1)) > kink_tolerance * np.nanmax(np.abs(slope), axis=1)[:, np.newaxis]
+    index = np.argmax(change, axis=1) + 1
+    rows = np.arange(len(z))
+    return np.where(change[rows, index - 1], z[rows, index] - z[:, 0], np.nan)
+
+
+def get_sublayer_u_tau(z: np.ndarray, u: np.ndarray, nu: np.ndarray, iterations=5) -> np.ndarray:
+    """
+    Динамическая скорость по наклону профиля в вязком подслое, где U = u_tau ** 2 * Z / nu. Начальное
+    приближение определяется по первой точке профиля, затем наклон уточняется по всем точкам с
+    Y+ < viscous_sublayer_y_plus.
+
+    :param nu: кинематическая вязкость на стенке по числу профилей
+    """
+    du, dz = u - u[:, :1], z - z[:, :1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        u_tau = np.sqrt(nu * du[:, 1] / dz[:, 1])
+        for _ in range(iterations):
+            mask = (dz * u_tau[:, np.newaxis] / nu[:, np.newaxis] < viscous_sublayer_y_plus)
+            mask[:, 1] |= ~np.isnan(dz[:, 1])
+            mask[:, 0] = False
+            slope = np.where(mask, du * dz, 0.).sum(axis=1) / np.where(mask, dz * dz, 0.).sum(axis=1)
+            u_tau = np.sqrt(nu * slope)
+    return u_tau
+
+
+def fit_log_law(z: np.ndarray, u: np.ndarray, viscosity: np.ndarray, density: np.ndarray=None, kappa=None,
+                y_plus_range=log_region_y_plus, outer_fraction=log_region_outer_fraction,
+                iterations=5) -> LogLawFit:
+    """
+    Определяет для каждого профиля динамическую скорость, постоянные логарифмического закона kappa и B,
+    среднеквадратичное отклонение точек логарифмической области от найденного закона в единицах U+ и
+    значение Y+ пересечения линейного и логарифмического законов.
+
+    Если kappa не задана, динамическая скорость определяется по вязкому подслою (get_sublayer_u_tau),
+    а kappa и B - по наклону и сдвигу профиля в логарифмической области; такая оценка требует, чтобы
+    вязкий подслой был разрешен сеткой. Если kappa задана (число или массив по числу профилей), по
+    логарифмической области определяются динамическая скорость и B.
+
+    Подбор отмечается как недостоверный (valid=False), если в логарифмической области меньше трех точек,
+    kappa или B вне plausible_kappa_range и plausible_b_range, отклонение больше max_residual или Y+ первого
+    узла сетки больше viscous_sublayer_y_plus. Последнее условие проверяется и при заданной kappa: начальное
+    приближение динамической скорости определяется по вязкому подслою, а точки внутри первой ячейки получены
+    линейной интерполяцией и выглядят как вязкий подслой, даже если он не разрешен; итерации из такого
+    приближения сходятся к динамической скорости, отличающейся от истинной в разы.
+
+    :param z: расстояния от стенки, массив (число профилей, число точек)
+    :param u: продольная скорость
+    :param viscosity: динамическая вязкость
+    :param density: плотность; если не задана, viscosity считается кинематической вязкостью
+    :param y_plus_range: границы логарифмической области по Y+
+    :param outer_fraction: внешняя граница логарифмической области в долях толщины пограничного слоя
+    :param iterations: число уточнений границ логарифмической области при заданной kappa
+    """
+    z = np.asarray(z, dtype=np.float64)
+    u = np.asarray(u, dtype=np.float64)
+    nu = viscosity[:, 0] / density[:, 0] if density is not None else viscosity[:, 0]
+    dz = z - z[:, :1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        log_z = np.log(dz)
+    outer = outer_fraction * get_delta99(dz, u, get_last_values(u))
+
+    def get_mask(u_tau):
+        y_plus = dz * (u_tau / nu)[:, np.newaxis]
+        with np.errstate(invalid='ignore'):
+            return (y_plus >= y_plus_range[0]) & (y_plus <= y_plus_range[1]) & \
+                   ((dz <= outer[:, np.newaxis]) | np.isnan(outer)[:, np.newaxis])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if kappa is None:
+            # U = u_tau / kappa * ln(Z) + u_tau * (ln(u_tau / nu) / kappa + B)
+            u_tau = get_sublayer_u_tau(z, u, nu)
+            mask = get_mask(u_tau)
+            slope, intercept, points = _fit_lines(log_z, u, mask)
+            kappa = u_tau / slope
+        else:
+            kappa = np.broadcast_to(np.asarray(kappa, dtype=np.float64), (len(u),))
+            u_tau = get_sublayer_u_tau(z, u, nu)
+            for _ in range(iterations):
+                mask = get_mask(u_tau)
+                slope, intercept, points = _fit_lines(log_z, u, mask)
+                u_tau = np.where(np.isnan(slope), u_tau, kappa * slope)
+            u_tau = kappa * slope
+        b = intercept / u_tau - np.log(u_tau / nu) / kappa
+        deviation = np.where(mask, u - slope[:, np.newaxis] * log_z - intercept[:, np.newaxis], 0.)
+        residual = np.sqrt((deviation ** 2).sum(axis=1) / points) / u_tau
+        first_cell_y_plus = get_first_cell_height(z, u) * u_tau / nu
+        valid = (points >= 3) & (kappa >= plausible_kappa_range[0]) & (kappa <= plausible_kappa_range[1]) & \
+            (b >= plausible_b_range[0]) & (b <= plausible_b_range[1]) & (residual <= max_residual) & \
+            (first_cell_y_plus <= viscous_sublayer_y_plus)
+    return LogLawFit(u_tau=u_tau, kappa=kappa, B=b, residual=residual, points=points.astype(np.int64),
+                     y0=get_crossover(kappa, b), first_cell_y_plus=first_cell_y_plus, valid=valid)
+
+
+if __name__ == '__main__':
+    import plot_creation
+    from boundary_layer import stack_profiles
+    from wall_units import ace_schema, cfx_schema
+    schemas = {'ace': ace_schema, 'cfx': cfx_schema}
+    u_refs = {'ace': plot_creation.u_ref_ace, 'cfx': plot_creation.u_ref_cfx}
+    registry = plot_creation.registry
+    for solver in sorted(registry.data_dirs):
+        keys = [key for key in registry.keys() if key.solver == solver and key.line == 1]
+        frames = registry.load_many(keys)
+        schema = schemas[solver]
+        z, u = stack_profiles(frames, 'Z'), stack_profiles(frames, 'U')
+        viscosity, density = stack_profiles(frames, schema.viscosity), stack_profiles(frames, schema.density)
+        free = fit_log_law(z, u, viscosity, density)
+        fixed = fit_log_law(z, u, viscosity, density, kappa=0.4)
+        solver_u_tau = u_refs[solver] * np.sqrt(stack_profiles(frames, 'SkinFrictionCoefficient')[:, 0] / 2)
+        for n, key in enumerate(keys):
+            if free.valid[n]:
+                free_result = 'u_tau = %.3f, kappa = %.3f, B = %.2f, residual = %.3f' % \
+                              (free.u_tau[n], free.kappa[n], free.B[n], free.residual[n])
+            else:
+                free_result = 'free kappa fit is not valid (first cell Y+ = %.1f, kappa = %.3f, B = %.2f, ' \
+                              'residual = %.3f)' % (free.first_cell_y_plus[n], free.kappa[n], free.B[n],
+                                                    free.residual[n])
+            print('%s %-50s solver u_tau = %.3f; %s; kappa = 0.4: u_tau = %.3f, B = %.2f, residual = %.3f, '
+                  'y0 = %.2f%s' %
+                  (solver, key.case, solver_u_tau[n], free_result, fixed.u_tau[n], fixed.B[n], fixed.residual[n],
+                   fixed.y0[n], '' if fixed.valid[n] else ' (not valid)'))
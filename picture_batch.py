@@ -0,0 +1,181 @@
+"""
+Пакетное создание рисунков: задания (срез, уровни, оси, имя файла) группируются по файлам раскладки (.lay),
+для каждой группы формируется один макрос сеанса Tecplot, который загружает раскладку один раз и
+последовательно экспортирует все рисунки группы. Общие для всех рисунков настройки легенды, цветовой схемы
+и шрифтов задаются один раз на весь пакет, а повторяющиеся в макросе сеанса команды этих настроек
+пропускаются. Сеансы для разных раскладок выполняются параллельно планировщиком TecplotBatchScheduler.
+"""
+import tecplot_lib
+from tecplot_batch import MacroJob, JobResult, TecplotBatchScheduler, get_picture_macro
+from instrumentation import span, start_trace_from_env
+import collections
+import os
+import re
+import typing
+
+PictureJob = collections.namedtuple('PictureJob', ['source_file', 'slice_settings', 'level_settings',
+                                                   'axis_settings', 'exportfname'])
+
+# команды загрузки данных, с которых начинается макрос PictureCreator
+load_commands = ('$!OPENLAYOUT', '$!READDATASET')
+
+# команды, задающие глобальное состояние сеанса (легенда, цветовая схема, шрифты легенды); повторная команда
+# с теми же значениями не добавляется в макрос сеанса
+session_state_commands = ('$!GLOBALCONTOUR',)
+
+
+def split_commands(macro_body: str) -> typing.List[str]:
+    """
+    :return: команды макроса, каждая вместе со своими строками параметров
+    """
+    return [command for command in re.split(r'(?m)^(?=\$!)', macro_body) if command]
+
+
+def unwrap_macro(macro: str) -> str:
+    """
+    :return: тело макроса, сформированного функцией tecplot_lib.wrap_macro
+    """
+    prefix, suffix = tecplot_lib.wrap_macro('\0').split('\0')
+    assert macro.startswith(prefix) and macro.endswith(suffix), 'Macro is not created by wrap_macro'
+    return macro[len(prefix): len(macro) - len(suffix)]
+
+
+def _get_setting_key(command: str) -> str:
+    # команда без значений параметров: команды с одинаковым ключом задают одни и те же параметры
+    return re.sub(r"=\s*('[^']*'|[^\s{}]+)", '=', command)
+
+
+def get_session_macro(picture_macros: typing.List[str]) -> str:
+    """
+    Объединяет макросы нескольких рисунков одной раскладки в один макрос: команда загрузки раскладки
+    остается только в начале, команды глобальных настроек, не изменившие значений, пропускаются. Макрос
+    PictureCreator после экспорта удаляет зону среза и возвращается в 3D, поэтому рисунки можно создавать
+    последовательно в одном сеансе.
+    """
+    load_command = None
+    state = {}
+    body = ''
+    for macro in picture_macros:
+        commands = split_commands(unwrap_macro(macro))
+        if commands and commands[0].startswith(load_commands):
+            if load_command is None:
+                load_command = commands[0]
+            assert commands[0] == load_command, 'All pictures of a session must use the same layout'
+            commands = commands[1:]
+        for command in commands:
+            if command.startswith(session_state_commands):
+                key = _get_setting_key(command)
+                if state.get(key) == command:
+                    continue
+                state[key] = command
+            body += command
+    return tecplot_lib.wrap_macro((load_command or '') + body)
+
+
+class BatchPictureCreator:
+    """
+    Создает рисунки по списку заданий PictureJob. Задания одной раскладки выполняются в одном сеансе Tecplot
+    (или в sessions_per_layout сеансах, если рисунков много), сеансы выполняются параллельно.
+    """
+    def __init__(self, jobs: typing.List[PictureJob], macro_dir, legend_settings, colormap_settings, frame_settings,
+                 ticks_settings, zone_number: int, imagewidth=1500, sessions_per_layout=1,
+                 scheduler: TecplotBatchScheduler=None):
+        """
+        :param jobs: задания
+        :param macro_dir: папка, в которую записываются макросы сеансов
+        :param legend_settings: настройки легенды (со шрифтами), общие для всех рисунков
+        :param colormap_settings: настройки цветовой схемы, общие для всех рисунков
+        :param frame_settings: настройки frame, общие для всех рисунков
+        :param ticks_settings: настройки делений осей, общие для всех рисунков
+        :param zone_number: номер зоны, в которую извлекаются данные среза
+        :param imagewidth: ширина рисунков
+        :param sessions_per_layout: число сеансов, между которыми распределяются рисунки одной раскладки
+        :param scheduler: планировщик, по умолчанию TecplotBatchScheduler()
+        """
+        self.jobs = jobs
+        self.macro_dir = macro_dir
+        self.legend_settings = legend_settings
+        self.colormap_settings = colormap_settings
+        self.frame_settings = frame_settings
+        self.ticks_settings = ticks_settings
+        self.zone_number = zone_number
+        self.imagewidth = imagewidth
+        self.sessions_per_layout = sessions_per_layout
+        self.scheduler = scheduler if scheduler is not None else TecplotBatchScheduler()
+        self.results = []
+
+    def get_picture_macro(self, job: PictureJob) -> str:
+        export_settings = tecplot_lib.ExportSettings(zone_number=self.zone_number, exportfname=job.exportfname,
+                                                     imagewidth=self.imagewidth)
+        creator = tecplot_lib.PictureCreator(source_file=job.source_file,
+                                             macro_filename=os.path.join(self.macro_dir, 'picture.mcr.tmp'),
+                                             slice_settings=job.slice_settings, level_settings=job.level_settings,
+                                             legend_settings=self.legend_settings,
+                                             colormap_settings=self.colormap_settings,
+                                             axis_settings=job.axis_settings, export_settings=export_settings,
+                                             frame_settings=self.frame_settings, ticks_settings=self.ticks_settings)
+        return get_picture_macro(creator)
+
+    def get_session_jobs(self) -> typing.List[MacroJob]:
+        """
+        :return: по одному заданию планировщика на каждый сеанс
+        """
+        os.makedirs(self.macro_dir, exist_ok=True)
+        layouts = collections.OrderedDict()
+        for job in self.jobs:
+            layouts.setdefault(job.source_file, []).append(job)
+        result = []
+        for source_file, jobs in layouts.items():
+            name = os.path.splitext(os.path.basename(source_file))[0]
+            sessions = max(1, min(self.sessions_per_layout, len(jobs)))
+            for n in range(sessions):
+                session_jobs = jobs[n::sessions]
+                session_name = name if sessions == 1 else '%s_%s' % (name, n)
+                result.append(MacroJob(session_name,
+                                       get_session_macro([self.get_picture_macro(job) for job in session_jobs]),
+                                       os.path.join(self.macro_dir, 'pictures_%s.mcr' % session_name),
+                                       [job.exportfname for job in session_jobs], [source_file]))
+        return result
+
+    def run_creation(self) -> typing.List[JobResult]:
+        for dirname in {os.path.dirname(job.exportfname) for job in self.jobs}:
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+        with span('run_creation', pictures=len(self.jobs), processes=self.scheduler.processes):
+            self.results = self.scheduler.run(self.get_session_jobs())
+        failed = [result for result in self.results if result.status == 'failed']
+        if failed:
+            raise RuntimeError('Picture creation failed for %s' % ', '.join('%s (%s)' % (result.name, result.error)
+                                                                           for result in failed))
+        return self.results
+
+
+def get_slice_sweep_jobs(source_file, positions: typing.List[tuple], normal: tuple, level_settings, axis_settings,
+                         picture_dir, name: str) -> typing.List[PictureJob]:
+    """
+    :return: задания для серии произвольных срезов с нормалью normal, проходящих через точки positions
+    """
+    return [PictureJob(source_file,
+                       tecplot_lib.SliceSettings(tecplot_lib.SliceType.ARBITRARY, position=position, normal=normal),
+                       level_settings, axis_settings, os.path.join(picture_dir, '%s_%03d.png' % (name, n)))
+            for n, position in enumerate(positions)]
+
+
+if __name__ == '__main__':
+    import picture_creation
+    import numpy as np
+    start_trace_from_env()
+    jobs = []
+    for case in ('average_grid_density_sp_al', 'very_high_density_sp_al'):
+        jobs += get_slice_sweep_jobs(os.path.join(picture_creation.data_files_dir, case + '.lay'),
+                                     [(0, y, 0) for y in np.linspace(0, 0.3, 100)],
+                                     (0, picture_creation.ny, picture_creation.nz),
+                                     picture_creation.level_settings, picture_creation.axis_settings,
+                                     os.path.join(picture_creation.picture_dir, 'slice_sweep'), case)
+    creator = BatchPictureCreator(jobs, os.path.join(picture_creation.cwd, 'macros'),
+                                  picture_creation.legend_settings, picture_creation.colormap_settings,
+                                  picture_creation.frame_settings, picture_creation.ticks_settings,
+                                  picture_creation.export_settings.zone_number,
+                                  picture_creation.export_settings.imagewidth)
+    for result in creator.run_creation():
+        print('%s: %s in %.1f s' % (result.name, result.status, result.duration))
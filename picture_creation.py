@@ -1,4 +1,5 @@
 import tecplot_lib
+from instrumentation import span, start_trace_from_env
 import numpy as np
 import os
 
@@ -33,6 +34,7 @@ frame_settings = tecplot_lib.FrameSettings()
 ticks_settings = tecplot_lib.TicksSettings()
 
 if __name__ == '__main__':
+    start_trace_from_env()
     file_for_picture = os.path.join(data_files_dir, 'average_grid_density_sp_al.lay')
     macro_name = os.path.join(cwd, 'macros', 'picture_creation2.mcr')
     picture_creator = tecplot_lib.PictureCreator(source_file=file_for_picture,
@@ -41,4 +43,5 @@ if __name__ == '__main__':
                                                  legend_settings=legend_settings, colormap_settings=colormap_settings,
                                                  axis_settings=axis_settings, export_settings=export_settings,
                                                  frame_settings=frame_settings, ticks_settings=ticks_settings)
-    picture_creator.run_creation()
\ No newline at end of file
+    with span('run_creation', source_file=file_for_picture):
+        picture_creator.run_creation()
\ No newline at end of file
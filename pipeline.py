@@ -0,0 +1,202 @@
+from instrumentation import span
+import collections
+import concurrent.futures
+import hashlib
+import json
+import os
+import typing
+
+# файл, в котором между запусками хранятся хэши файлов и подписи выполненных задач
+state_filename = os.path.join('.cache', 'pipeline.json')
+
+
+class Task:
+    """
+    Узел графа сборки: действие, которое по входным файлам и параметрам создает выходные файлы. Задача
+    выполняется повторно, только если изменилось содержимое входных файлов или параметры, либо если выходные
+    файлы отсутствуют или были изменены.
+    """
+    def __init__(self, name: str, action: typing.Callable[[], None], inputs: typing.Iterable[str]=(),
+                 outputs: typing.Iterable[str]=(), params=None):
+        """
+        :param name: уникальное имя задачи
+        :param action: функция без аргументов, выполняющая задачу; при параллельном выполнении передается
+            в другой процесс, поэтому должна сериализоваться pickle (например, functools.partial от функции
+            уровня модуля)
+        :param inputs: имена входных файлов, в том числе выходных файлов других задач
+        :param outputs: имена создаваемых задачей файлов
+        :param params: параметры задачи, влияющие на результат; должны сериализоваться в JSON (объекты
+            приводятся к строке функцией repr)
+        """
+        self.name = name
+        self.action = action
+        self.inputs = sorted(set(inputs))
+        self.outputs = sorted(set(outputs))
+        self.params = params
+
+
+class FileHashes:
+    """
+    Хэши содержимого файлов. Хэш пересчитывается, только если у файла изменились размер или время
+    модификации, поэтому проверка неизменившихся файлов требует только вызова os.stat.
+    """
+    def __init__(self, records: dict=None):
+        self.records = records if records is not None else {}
+
+    def get(self, filename) -> typing.Optional[str]:
+        """
+        :return: sha1 содержимого файла или None, если файл отсутствует
+        """
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            self.records.pop(filename, None)
+            return None
+        record = self.records.get(filename)
+        if record is not None and record['size'] == stat.st_size and record['mtime_ns'] == stat.st_mtime_ns:
+            return record['sha1']
+        from line_data import get_file_hash
+        record = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': get_file_hash(filename)}
+        self.records[filename] = record
+        return record['sha1']
+
+    def forget(self, filenames: typing.Iterable[str]):
+        for filename in filenames:
+            self.records.pop(filename, None)
+
+
+def _run_action(name: str, action: typing.Callable[[], None]):
+    with span('task', task=name):
+        action()
+
+
+def _make_output_dirs(task: Task):
+    for dirname in {os.path.dirname(filename) for filename in task.outputs}:
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+
+class Pipeline:
+    """
+    Граф задач, связанных через файлы: задача зависит от задач, создающих ее входные файлы. При запуске
+    задачи обходятся в порядке зависимостей, устаревшие задачи выполняются, причем независимые друг от друга
+    задачи выполняются одновременно в пуле процессов. Если выполненная повторно задача создала файлы с тем же
+    содержимым, что и раньше, зависящие от нее задачи не выполняются.
+    """
+    def __init__(self, tasks: typing.List[Task], state_filename=state_filename):
+        """
+        :param tasks: список задач
+        :param state_filename: имя файла, в котором хранится состояние графа между запусками
+        """
+        self.tasks = collections.OrderedDict()
+        for task in tasks:
+            assert task.name not in self.tasks, 'Duplicate task name %s' % task.name
+            self.tasks[task.name] = task
+        self.state_filename = state_filename
+        self.producers = {}
+        for task in tasks:
+            for filename in task.outputs:
+                assert filename not in self.producers, 'File %s is created by several tasks' % filename
+                self.producers[filename] = task.name
+        self.deps = {task.name: sorted({self.producers[filename] for filename in task.inputs
+                                        if filename in self.producers}) for task in tasks}
+        state = self._read_state()
+        self.hashes = FileHashes(state.get('files'))
+        self.signatures = state.get('tasks', {})
+
+    def _read_state(self) -> dict:
+        if not os.path.exists(self.state_filename):
+            return {}
+        with open(self.state_filename, 'r') as file:
+            return json.load(file)
+
+    def _write_state(self):
+        dirname = os.path.dirname(self.state_filename)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        with open(self.state_filename + '.tmp', 'w') as file:
+            json.dump({'files': self.hashes.records, 'tasks': self.signatures}, file, indent=1, sort_keys=True)
+        os.replace(self.state_filename + '.tmp', self.state_filename)
+
+    def get_signature(self, task: Task) -> str:
+        """
+        :return: хэш параметров задачи и содержимого ее входных файлов
+        """
+        inputs = {filename: self.hashes.get(filename) for filename in task.inputs}
+        content = json.dumps({'name': task.name, 'params': task.params, 'inputs': inputs}, sort_keys=True,
+                             default=repr)
+        return hashlib.sha1(content.encode()).hexdigest()
+
+    def is_stale(self, task: Task, signature: str) -> bool:
+        record = self.signatures.get(task.name)
+        if record is None or record['signature'] != signature:
+            return True
+        return any(self.hashes.get(filename) != sha1 for filename, sha1 in record['outputs'].items())
+
+    def get_required(self, targets: typing.Iterable[str]=None) -> typing.List[str]:
+        """
+        :param targets: имена задач, которые необходимо выполнить, по умолчанию все задачи
+        :return: имена целевых задач и всех задач, от которых они зависят
+        """
+        result = set()
+        stack = list(targets) if targets is not None else list(self.tasks)
+        while stack:
+            name = stack.pop()
+            if name not in result:
+                result.add(name)
+                stack.extend(self.deps[name])
+        return [name for name in self.tasks if name in result]
+
+    def _complete(self, task: Task, signature: str):
+        self.hashes.forget(task.outputs)
+        self.signatures[task.name] = {'signature': signature,
+                                      'outputs': {filename: self.hashes.get(filename) for filename in task.outputs}}
+
+    def run(self, targets: typing.Iterable[str]=None, processes=None) -> typing.List[str]:
+        """
+        Выполняет устаревшие задачи.
+
+        :param targets: имена задач, которые необходимо выполнить, по умолчанию все задачи
+        :param processes: число процессов, по умолчанию равно числу ядер; при processes=1 задачи выполняются
+            последовательно в текущем процессе
+        :return: имена выполненных задач
+        """
+        pending = self.get_required(targets)
+        done = set()
+        executed = []
+        running = {}
+        executor = concurrent.futures.ProcessPoolExecutor(processes) if processes != 1 else None
+        try:
+            while pending or running:
+                ready = [name for name in pending if all(dep in done for dep in self.deps[name])]
+                for name in ready:
+                    pending.remove(name)
+                    task = self.tasks[name]
+                    signature = self.get_signature(task)
+                    if not self.is_stale(task, signature):
+                        done.add(name)
+                        continue
+                    _make_output_dirs(task)
+                    if executor is None:
+                        _run_action(name, task.action)
+                        self._complete(task, signature)
+                        executed.append(name)
+                        done.add(name)
+                    else:
+                        running[executor.submit(_run_action, name, task.action)] = (task, signature)
+                if ready:
+                    # пропущенные задачи могли сделать готовыми зависящие от них задачи
+                    continue
+                assert running, 'Tasks %s have cyclic dependencies' % pending
+                finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    task, signature = running.pop(future)
+                    future.result()
+                    self._complete(task, signature)
+                    executed.append(task.name)
+                    done.add(task.name)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            self._write_state()
+        return executed
@@ -1,42 +1,89 @@
-from tecplot_lib import LineDataLoader
-import matplotlib.pyplot as plt
+from case_registry import CaseRegistry
+from plot_rendering import CurveSpec, PlotSpec, render_plots
+from wall_units import apply_wall_units, ace_schema, cfx_schema
+from instrumentation import start_trace_from_env
 import numpy as np
+import collections
+import functools
 import os
-from scipy.optimize import fsolve
+import typing
+
+# тяжелые модули (pandas, matplotlib, scipy) импортируются только при первом использовании, а данные и
+# теоретические зависимости вычисляются при первом обращении к ним, поэтому импорт модуля не требует
+# загрузки данных
 
 report_pic_dir = 'pictures_for_report'
 
-cfx_loader = LineDataLoader(r'extracted_data\cfx')
-cfx_loader.load()
+# скорость для определения коэффициента трения
+u_ref_ace = 85
+u_ref_cfx = 88
+
+
+def add_ace_wall_units(keys, frames):
+    apply_wall_units(keys, frames, ace_schema, u_ref_ace)
+
+
+def add_cfx_wall_units(keys, frames):
+    # коэффициент трения CFX, как и прежде, определяется по скорости u_ref_ace
+    apply_wall_units(keys, frames, cfx_schema, u_ref_cfx, skin_friction_u_ref=u_ref_ace)
+
+
+# ограничение на объем памяти, занимаемый загруженными данными
+frames_memory_limit = 64 * 2 ** 20
+
+# переменные, необходимые для построения графиков и расчета производных величин; остальные столбцы
+# извлеченных данных не загружаются
+plot_columns = {
+    'ace': ['X', 'Z', 'U', 'RHO', 'Vislam', 'SkinFrictionCoefficient'],
+    'cfx': ['X', 'Z', 'U', 'Density', 'Dynamic Viscosity', 'Eddy Viscosity', 'X Wall Shear'],
+}
+
+
+def get_study_store():
+    """
+    :return: файл исследования (study_store.py), заданный переменной окружения PLATE_STUDY_STORE, из которого
+        данные загружаются вместо папок extracted_data; None, если переменная не задана
+    """
+    filename = os.environ.get('PLATE_STUDY_STORE')
+    if not filename:
+        return None
+    from study_store import StudyStore
+    return StudyStore(filename)
+
 
-ace_loader = LineDataLoader(r'extracted_data\ace')
-ace_loader.load()
+registry = CaseRegistry({'ace': os.path.join('extracted_data', 'ace'), 'cfx': os.path.join('extracted_data', 'cfx')},
+                        memory_limit=frames_memory_limit,
+                        derive={'ace': add_ace_wall_units, 'cfx': add_cfx_wall_units},
+                        columns=plot_columns, store=get_study_store())
 
-cfx_very_high_dens_k_eps_i1_outlet_frames = cfx_loader.frames[3:6]
-cfx_average_dens_k_eps_i1_outlet_frames = cfx_loader.frames[0:3]
+cfx_very_high_dens_k_eps_i1_outlet_frames = registry.case('cfx', 'very_high_density_k_eps_i1_outlet')
+cfx_average_dens_k_eps_i1_outlet_frames = registry.case('cfx', 'avareage_density_k_eps_i1')
 
-av_grid_dens_sp_al_frames = ace_loader.frames[0:3]
-high_grid_dens_k_eps_two_layer_frames = ace_loader.frames[3:6]
-high_grid_dens_k_eps_frames = ace_loader.frames[6:9]
-high_grid_dens_sp_al_frames = ace_loader.frames[9:12]
-very_high_grid_dens_k_eps_farfield_frames = ace_loader.frames[12:15]
-very_high_grid_dens_k_eps_frames = ace_loader.frames[15:18]
-very_high_grid_dens_k_eps_two_layer_farfield_frames = ace_loader.frames[18:21]
-very_high_grid_dens_sp_al_farfield_frames = ace_loader.frames[21:24]
-very_high_grid_dens_sp_al_frames = ace_loader.frames[24:27]
+av_grid_dens_sp_al_frames = registry.case('ace', 'average_grid_density_sp_al')
+high_grid_dens_k_eps_two_layer_frames = registry.case('ace', 'high_density_k_eps_two_layer_model')
+high_grid_dens_k_eps_frames = registry.case('ace', 'high_grid_density_k_eps')
+high_grid_dens_sp_al_frames = registry.case('ace', 'high_grid_density_sp_al')
+very_high_grid_dens_k_eps_farfield_frames = registry.case('ace', 'very_high_density_k_eps_farfield')
+very_high_grid_dens_k_eps_frames = registry.case('ace', 'very_high_density_k_eps')
+very_high_grid_dens_k_eps_two_layer_farfield_frames = registry.case('ace',
+                                                                    'very_high_density_k_eps_two_layer_model_farfield')
+very_high_grid_dens_sp_al_farfield_frames = registry.case('ace', 'very_high_density_sp_al_farfield')
+very_high_grid_dens_sp_al_frames = registry.case('ace', 'very_high_density_sp_al')
 
 plots_dir = 'plots'
 
-# скорость для определения коэффициента трения
-u_ref_ace = 85
-u_ref_cfx = 88
+CoreState = collections.namedtuple('CoreState', ['U0', 'RHO0', 'Vislam0'])
+
 
-# скорость в ядре потока
-U0 = ace_loader.frames[0].U[len(ace_loader.frames[0]) - 1]
-# динамическая вязкость в ядре потока
-Vislam0 = ace_loader.frames[0].Vislam[len(ace_loader.frames[0]) - 1]
-# плотность в ядре потока
-RHO0 = ace_loader.frames[0].RHO[len(ace_loader.frames[0]) - 1]
+@functools.lru_cache()
+def get_core_state() -> CoreState:
+    """
+    :return: скорость, плотность и динамическая вязкость в ядре потока, определенные по последней точке
+        нулевой линии расчета average_grid_density_sp_al
+    """
+    frame = av_grid_dens_sp_al_frames[0]
+    return CoreState(U0=frame.U[len(frame) - 1], RHO0=frame.RHO[len(frame) - 1],
+                     Vislam0=frame.Vislam[len(frame) - 1])
 
 
 def get_tau(skin_friction_coefficient, core_density, core_velocity):
@@ -58,20 +105,30 @@ def get_prandtl_friction_coefficient(reynolds_number):
 def get_hughes_friction_coefficient(reynolds_number):
     return 0.067 * (np.log10(reynolds_number) - 2) ** (-2)
 
-y0 = fsolve(lambda X: [2.5 * np.log(X[0] / 0.13) - X[0]], np.array([10]))[0]
+
+@functools.lru_cache()
+def get_y0() -> float:
+    """
+    :return: значение Y+, при котором линейный закон стенки переходит в логарифмический
+    """
+    from log_law_fit import get_crossover
+    return float(get_crossover(1 / 2.5, -2.5 * np.log(0.13)))
 
 
 def get_u_plus_theory(y_plus: np.ndarray):
+    y0 = get_y0()
     return 2.5 * np.log(y_plus / 0.13) * (y_plus > y0) + y_plus * (y_plus <= y0)
 
 
 def plot_u_plus_theory():
+    import matplotlib.pyplot as plt
     y_plus = np.array(np.logspace(0, 5, 2500))
     plt.plot(y_plus, get_u_plus_theory(y_plus),
              lw=2, color='black', label=r'$Теоретическая\ зависимость$', linestyle=':')
 
 
 def set_velocity_profile_plot():
+    import matplotlib.pyplot as plt
     plt.grid()
     plt.legend(fontsize=12)
     plt.xlabel(r'$U,\ м/с$', fontsize=14)
@@ -79,6 +136,7 @@ def set_velocity_profile_plot():
 
 
 def set_friction_coefficient_plot(ylim=(0., 0.03)):
+    import matplotlib.pyplot as plt
     plt.grid()
     plt.legend(fontsize=10)
     plt.ylim(*ylim)
@@ -88,6 +146,7 @@ def set_friction_coefficient_plot(ylim=(0., 0.03)):
 
 
 def set_u_plus_plot():
+    import matplotlib.pyplot as plt
     plt.xlabel(r'$Y^+$', fontsize=14)
     plt.ylabel(r'$U^+$', fontsize=14)
     plt.grid()
@@ -96,60 +155,93 @@ def set_u_plus_plot():
     plt.xlim(1, 10e2)
     plt.ylim(0, 25)
 
-X = np.array(np.linspace(0, 8,  1500))
-Re_x = RHO0 * X * U0 / Vislam0
-Cf_Schlichting = get_schlichting_friction_coefficient(Re_x)
-Cf_Schultz_Grunov = get_schultz_grunov_friction_coefficient(Re_x)
-Cf_Prandtl = get_prandtl_friction_coefficient(Re_x)
-Cf_Hughes = get_hughes_friction_coefficient(Re_x)
-TAU_Schlichting = get_tau(Cf_Schlichting, RHO0, U0)
-TAU_Schultz_Grunov = get_tau(Cf_Schultz_Grunov, RHO0, U0)
-TAU_Prandtl = get_tau(Cf_Prandtl, RHO0, U0)
-TAU_Hughes = get_tau(Cf_Hughes, RHO0, U0)
+
+@functools.lru_cache()
+def get_friction_coefficient_theory() -> dict:
+    """
+    :return: словарь с координатой X, числом Рейнольдса Re_x, коэффициентами трения Cf_* и касательными
+        напряжениями TAU_* по формулам Шлихтинга, Шульца-Грунова, Прандтля и Хьюза
+    """
+    from reference_curves import reference_curves
+    core_state = get_core_state()
+    curves = reference_curves.get_friction_coefficient_curves(core_state, (0, 8), 1500)
+    result = {'X': curves['Schlichting'].x, 'Re_x': curves['Schlichting'].Re}
+    for name in ('Schlichting', 'Schultz_Grunov', 'Prandtl', 'Hughes'):
+        result['Cf_' + name] = curves[name].values
+        result['TAU_' + name] = get_tau(result['Cf_' + name], core_state.RHO0, core_state.U0)
+    return result
 
 
 def plot_friction_coefficient_theory():
-    X = np.linspace(0, 8,  1500)
-    plt.plot(X, Cf_Schlichting, lw=0.7, color='red',
+    import matplotlib.pyplot as plt
+    theory = get_friction_coefficient_theory()
+    X = theory['X']
+    plt.plot(X, theory['Cf_Schlichting'], lw=0.7, color='red',
              label=r'$Формула\ Шлихтинга$', linestyle='--')
-    plt.plot(X, Cf_Schultz_Grunov, lw=0.7, color='blue',
+    plt.plot(X, theory['Cf_Schultz_Grunov'], lw=0.7, color='blue',
              label=r'$Формула\ Шульца-Грунова$', linestyle='--')
-    plt.plot(X, Cf_Prandtl, lw=0.7, color='green',
+    plt.plot(X, theory['Cf_Prandtl'], lw=0.7, color='green',
              label=r'$Формула\ Прандтля$', linestyle='--')
-    plt.plot(X, Cf_Hughes, lw=0.7, color='red',
+    plt.plot(X, theory['Cf_Hughes'], lw=0.7, color='red',
              label=r'$Формула\ Хьюза$', linestyle=':')
 
-if __name__ == '__main__':
-    for frame in ace_loader.frames:
-        if frame.ix[frame.Z == 0].__len__() == 1:
-            RHO = frame.ix[frame.Z == 0].RHO[0]
-            SkinFrictionCoefficient = frame.ix[frame.Z == 0].SkinFrictionCoefficient[0]
-            Vislam = frame.ix[frame.Z == 0].Vislam[0]
-            VIS_T = frame.ix[frame.Z == 0].VIS_T[0]
-        else:
-            RHO = frame.ix[frame.Z == 0].RHO
-            SkinFrictionCoefficient = frame.ix[frame.Z == 0].SkinFrictionCoefficient
-            Vislam = frame.ix[frame.Z == 0].Vislam
-            VIS_T = frame.ix[frame.Z == 0].VIS_T
-        frame['UPLUS'] = frame.U / u_ref_ace * np.sqrt(2 / SkinFrictionCoefficient)
-        frame['YPLUSPrime'] = RHO / Vislam * frame.Z * u_ref_ace * np.sqrt(SkinFrictionCoefficient / 2)
-        frame['TAU'] = 0.5 * RHO * u_ref_ace ** 2 * SkinFrictionCoefficient
-
-    for frame in cfx_loader.frames:
-        frame['SkinFrictionCoefficient'] = 2 * frame['X Wall Shear'] / (frame.Density * u_ref_ace ** 2)
-        if frame.ix[frame.Z == 0].__len__() == 1:
-            RHO = frame.ix[frame.Z == 0].Density[0]
-            SkinFrictionCoefficient = frame.ix[frame.Z == 0].SkinFrictionCoefficient[0]
-            Vislam = frame.ix[frame.Z == 0]['Dynamic Viscosity'][0]
-            VIS_T = frame.ix[frame.Z == 0]['Eddy Viscosity'][0]
-        else:
-            RHO = frame.ix[frame.Z == 0].Density
-            SkinFrictionCoefficient = frame.ix[frame.Z == 0].SkinFrictionCoefficient
-            Vislam = frame.ix[frame.Z == 0]['Dynamic Viscosity']
-            VIS_T = frame.ix[frame.Z == 0]['Eddy Viscosity']
-        frame['UPLUS'] = frame.U / u_ref_cfx * np.sqrt(2 / SkinFrictionCoefficient)
-        frame['YPLUSPrime'] = RHO / Vislam * frame.Z * u_ref_cfx * np.sqrt(SkinFrictionCoefficient / 2)
-        frame['TAU'] = 0.5 * RHO * u_ref_cfx ** 2 * SkinFrictionCoefficient
+
+def __getattr__(name):
+    # ленивый доступ к прежним глобальным переменным модуля (U0, RHO0, Vislam0, y0, X, Re_x, Cf_*, TAU_*)
+    if name in CoreState._fields:
+        return getattr(get_core_state(), name)
+    if name == 'y0':
+        return get_y0()
+    if name in ('X', 'Re_x') or name.startswith(('Cf_', 'TAU_')):
+        theory = get_friction_coefficient_theory()
+        if name in theory:
+            return theory[name]
+    raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
+
+
+def get_velocity_profile_spec(filename, curves: typing.List[CurveSpec], title=None, title_fontsize=None) -> PlotSpec:
+    return PlotSpec(filename, curves, line=0, x='U', y='Z', xlabel=r'$U,\ м/с$', ylabel=r'$Z,\ м$',
+                    legend_fontsize=12, title=title, title_fontsize=title_fontsize)
+
+
+def get_u_plus_spec(filename, curves: typing.List[CurveSpec], title=None, title_fontsize=None) -> PlotSpec:
+    return PlotSpec(filename, curves, line=1, x='YPLUSPrime', y='UPLUS', xlabel=r'$Y^+$', ylabel=r'$U^+$',
+                    xlim=(1, 10e2), ylim=(0, 25), xscale='log', title=title, title_fontsize=title_fontsize,
+                    theory='u_plus')
+
+
+def get_friction_coefficient_spec(filename, curves: typing.List[CurveSpec], ylim=(0., 0.03), title=None,
+                                  title_fontsize=None) -> PlotSpec:
+    return PlotSpec(filename, curves, line=2, x='X', y='SkinFrictionCoefficient', xlabel=r'$X,\ м$',
+                    ylabel=r'$C_f$', xlim=(0, 8), ylim=ylim, title=title, title_fontsize=title_fontsize,
+                    theory='friction_coefficient')
+
+
+def get_theory_curves() -> dict:
+    """
+    :return: словарь, ставящий в соответствие имени теоретической зависимости список ее кривых
+    """
+    from reference_curves import reference_curves
+    u_plus = reference_curves.get('u_plus', (0, 5), resolution=2500, scale='log')
+    theory = get_friction_coefficient_theory()
+    return {
+        'u_plus': [(u_plus.x, u_plus.values,
+                    {'lw': 2, 'color': 'black', 'label': r'$Теоретическая\ зависимость$', 'linestyle': ':'})],
+        'friction_coefficient': [
+            (theory['X'], theory['Cf_Schlichting'],
+             {'lw': 0.7, 'color': 'red', 'label': r'$Формула\ Шлихтинга$', 'linestyle': '--'}),
+            (theory['X'], theory['Cf_Schultz_Grunov'],
+             {'lw': 0.7, 'color': 'blue', 'label': r'$Формула\ Шульца-Грунова$', 'linestyle': '--'}),
+            (theory['X'], theory['Cf_Prandtl'],
+             {'lw': 0.7, 'color': 'green', 'label': r'$Формула\ Прандтля$', 'linestyle': '--'}),
+            (theory['X'], theory['Cf_Hughes'],
+             {'lw': 0.7, 'color': 'red', 'label': r'$Формула\ Хьюза$', 'linestyle': ':'})
+        ]
+    }
+
+
+def get_plot_specs() -> typing.List[PlotSpec]:
+    specs = []
 
     # --------------------------------------------------------------------------------------------
     #  графики для сеток с различными густотами
@@ -158,129 +250,60 @@ if __name__ == '__main__':
     # ////////////////
     # модель Спаларта
     # ////////////////
-
-    plt.figure(figsize=(8, 6))
-    plt.plot(av_grid_dens_sp_al_frames[0].U, av_grid_dens_sp_al_frames[0].Z, lw=2, color='red',
-             label=r'$1.0 \cdot 10^6\ ячеек$')
-    plt.plot(high_grid_dens_sp_al_frames[0].U, high_grid_dens_sp_al_frames[0].Z, lw=2, color='blue',
-             label=r'$1.2 \cdot 10^6\ ячеек$', linestyle='-')
-    plt.plot(very_high_grid_dens_sp_al_frames[0].U, very_high_grid_dens_sp_al_frames[0].Z, lw=2, color='green',
-             label=r'$1.6 \cdot 10^6\ ячеек$', linestyle='-')
-    plt.title(r'$Модель\ Спаларта$')
-    set_velocity_profile_plot()
-    plt.savefig(os.path.join(plots_dir, 'density_comparison_sp_al_U_profile_line_0.png'))
-
-    plt.figure(figsize=(8, 6))
-    plt.plot(av_grid_dens_sp_al_frames[1].YPLUSPrime, av_grid_dens_sp_al_frames[1].UPLUS, lw=2, color='red',
-             label=r'$1.0 \cdot 10^6\ ячеек$')
-    plt.plot(high_grid_dens_sp_al_frames[1].YPLUSPrime, high_grid_dens_sp_al_frames[1].UPLUS, lw=2, color='blue',
-             label=r'$1.2 \cdot 10^6\ ячеек$')
-    plt.plot(very_high_grid_dens_sp_al_frames[1].YPLUSPrime, very_high_grid_dens_sp_al_frames[1].UPLUS, lw=2,
-             color='green',
-             label=r'$1.6 \cdot 10^6\ ячеек$')
-    plot_u_plus_theory()
-    plt.title(r'$Модель\ Спаларта$')
-    set_u_plus_plot()
-    plt.savefig(os.path.join(plots_dir, 'density_comparison_sp_al_UPLUS_YPLUS_log_profile_line_1.png'))
-
-    plt.figure(figsize=(8, 6))
-    plt.plot(av_grid_dens_sp_al_frames[2].X, av_grid_dens_sp_al_frames[2].SkinFrictionCoefficient, lw=2, color='red',
-             label=r'$1 \cdot 10^6\ ячеек$')
-    plt.plot(high_grid_dens_sp_al_frames[2].X, high_grid_dens_sp_al_frames[2].SkinFrictionCoefficient, lw=2,
-             color='blue',
-             label=r'$1.2 \cdot 10^6\ ячеек$')
-    plt.plot(very_high_grid_dens_sp_al_frames[2].X, very_high_grid_dens_sp_al_frames[2].SkinFrictionCoefficient, lw=2,
-             color='green', label=r'$1.6 \cdot 10^6\ ячеек$')
-    plot_friction_coefficient_theory()
-    plt.title(r'$Модель\ Спаларта$')
-    set_friction_coefficient_plot()
-    plt.savefig(os.path.join(plots_dir, 'density_comparison_sp_al_friction_coefficient_profile.png'))
+    title = r'$Модель\ Спаларта$'
+    specs.append(get_velocity_profile_spec(
+        os.path.join(plots_dir, 'density_comparison_sp_al_U_profile_line_0.png'),
+        [CurveSpec('ace', 'average_grid_density_sp_al', r'$1.0 \cdot 10^6\ ячеек$', 'red'),
+         CurveSpec('ace', 'high_grid_density_sp_al', r'$1.2 \cdot 10^6\ ячеек$', 'blue'),
+         CurveSpec('ace', 'very_high_density_sp_al', r'$1.6 \cdot 10^6\ ячеек$', 'green')],
+        title=title))
+    specs.append(get_u_plus_spec(
+        os.path.join(plots_dir, 'density_comparison_sp_al_UPLUS_YPLUS_log_profile_line_1.png'),
+        [CurveSpec('ace', 'average_grid_density_sp_al', r'$1.0 \cdot 10^6\ ячеек$', 'red'),
+         CurveSpec('ace', 'high_grid_density_sp_al', r'$1.2 \cdot 10^6\ ячеек$', 'blue'),
+         CurveSpec('ace', 'very_high_density_sp_al', r'$1.6 \cdot 10^6\ ячеек$', 'green')],
+        title=title))
+    specs.append(get_friction_coefficient_spec(
+        os.path.join(plots_dir, 'density_comparison_sp_al_friction_coefficient_profile.png'),
+        [CurveSpec('ace', 'average_grid_density_sp_al', r'$1 \cdot 10^6\ ячеек$', 'red'),
+         CurveSpec('ace', 'high_grid_density_sp_al', r'$1.2 \cdot 10^6\ ячеек$', 'blue'),
+         CurveSpec('ace', 'very_high_density_sp_al', r'$1.6 \cdot 10^6\ ячеек$', 'green')],
+        title=title))
 
     # ////////////////
     # модель k-e
     # ////////////////
-
-    plt.figure(figsize=(8, 6))
-    plt.plot(high_grid_dens_k_eps_frames[0].U, high_grid_dens_k_eps_frames[0].Z, lw=2, color='blue',
-             label=r'$1.2 \cdot 10^6\ ячеек$', linestyle='-')
-    plt.plot(very_high_grid_dens_k_eps_frames[0].U, very_high_grid_dens_k_eps_frames[0].Z, lw=2, color='green',
-             label=r'$1.6 \cdot 10^6\ ячеек$', linestyle='-')
-    plt.title(r'$k-\varepsilon\ модель$')
-    set_velocity_profile_plot()
-    plt.savefig(os.path.join(plots_dir, 'density_comparison_k_eps_U_profile_line_0.png'))
-
-    plt.figure(figsize=(8, 6))
-    plt.plot(high_grid_dens_k_eps_frames[1].YPLUSPrime, high_grid_dens_k_eps_frames[1].UPLUS, lw=2, color='blue',
-             label=r'$1.2 \cdot 10^6\ ячеек$')
-    plt.plot(very_high_grid_dens_k_eps_frames[1].YPLUSPrime, very_high_grid_dens_k_eps_frames[1].UPLUS, lw=2,
-             color='green', label=r'$1.6 \cdot 10^6\ ячеек$')
-    plot_u_plus_theory()
-    plt.title(r'$k-\varepsilon\ модель$')
-    set_u_plus_plot()
-    plt.savefig(os.path.join(plots_dir, 'density_comparison_k_eps_UPLUS_YPLUS_log_profile_line_1.png'))
-
-    plt.figure(figsize=(8, 6))
-    plt.plot(high_grid_dens_k_eps_frames[2].X, high_grid_dens_k_eps_frames[2].SkinFrictionCoefficient, lw=2,
-             color='blue', label=r'$1.2 \cdot 10^6\ ячеек$')
-    plt.plot(very_high_grid_dens_k_eps_frames[2].X, very_high_grid_dens_k_eps_frames[2].SkinFrictionCoefficient, lw=2,
-             color='green', label=r'$1.6 \cdot 10^6\ ячеек$')
-    plot_friction_coefficient_theory()
-    plt.title(r'$k-\varepsilon\ модель$')
-    set_friction_coefficient_plot()
-    plt.savefig(os.path.join(plots_dir, 'density_comparison_k_eps_friction_coefficient_profile.png'))
+    title = r'$k-\varepsilon\ модель$'
+    curves = [CurveSpec('ace', 'high_grid_density_k_eps', r'$1.2 \cdot 10^6\ ячеек$', 'blue'),
+              CurveSpec('ace', 'very_high_density_k_eps', r'$1.6 \cdot 10^6\ ячеек$', 'green')]
+    specs.append(get_velocity_profile_spec(
+        os.path.join(plots_dir, 'density_comparison_k_eps_U_profile_line_0.png'), curves, title=title))
+    specs.append(get_u_plus_spec(
+        os.path.join(plots_dir, 'density_comparison_k_eps_UPLUS_YPLUS_log_profile_line_1.png'), curves, title=title))
+    specs.append(get_friction_coefficient_spec(
+        os.path.join(plots_dir, 'density_comparison_k_eps_friction_coefficient_profile.png'), curves, title=title))
 
     # -------------------------------------------------------------------------------------------------------
     #  графики для различных моделей турбулентности
     # --------------------------------------------------------------------------------------------------------
-
-    plt.figure(figsize=(8, 6))
-    plt.plot(very_high_grid_dens_sp_al_frames[0].U, very_high_grid_dens_sp_al_frames[0].Z, lw=2, color='red',
-             label=r'$Модель\ Спаларта$')
-    plt.plot(very_high_grid_dens_k_eps_frames[0].U, very_high_grid_dens_k_eps_frames[0].Z, lw=2, color='blue',
-             label=r'$k-\varepsilon\ модель$', linestyle='-')
-    plt.legend(fontsize=12)
-    set_velocity_profile_plot()
-    plt.savefig(os.path.join(plots_dir, 'turbulence_model_comparison_U_profile_line_0.png'))
-
-    plt.figure(figsize=(8, 6))
-    plt.plot(very_high_grid_dens_sp_al_frames[1].YPLUSPrime, very_high_grid_dens_sp_al_frames[1].UPLUS, lw=2,
-             color='red', label=r'$Модель\ Спаларта$')
-    plt.plot(very_high_grid_dens_k_eps_frames[1].YPLUSPrime, very_high_grid_dens_k_eps_frames[1].UPLUS, lw=2,
-             color='blue', label=r'$k-\varepsilon\ модель$')
-    plot_u_plus_theory()
-    set_u_plus_plot()
-    plt.savefig(os.path.join(plots_dir, 'turbulence_model_comparison_UPLUS_YPLUS_log_profile_line_1.png'))
-
-    plt.figure(figsize=(8, 6))
-    plt.plot(very_high_grid_dens_sp_al_frames[2].X, very_high_grid_dens_sp_al_frames[2].SkinFrictionCoefficient, lw=2,
-             color='red', label=r'$Модель\ Спаларта$')
-    plt.plot(very_high_grid_dens_k_eps_frames[2].X, very_high_grid_dens_k_eps_frames[2].SkinFrictionCoefficient, lw=2,
-             color='blue', label=r'$k-\varepsilon\ модель$')
-    plot_friction_coefficient_theory()
-    set_friction_coefficient_plot()
-    plt.savefig(os.path.join(plots_dir, 'turbulence_model_comparison_friction_coefficient_profile.png'))
+    curves = [CurveSpec('ace', 'very_high_density_sp_al', r'$Модель\ Спаларта$', 'red'),
+              CurveSpec('ace', 'very_high_density_k_eps', r'$k-\varepsilon\ модель$', 'blue')]
+    specs.append(get_velocity_profile_spec(
+        os.path.join(plots_dir, 'turbulence_model_comparison_U_profile_line_0.png'), curves))
+    specs.append(get_u_plus_spec(
+        os.path.join(plots_dir, 'turbulence_model_comparison_UPLUS_YPLUS_log_profile_line_1.png'), curves))
+    specs.append(get_friction_coefficient_spec(
+        os.path.join(plots_dir, 'turbulence_model_comparison_friction_coefficient_profile.png'), curves))
 
     # ---------------------------------------------------------------------------------------------------
     #  графики для различных функций стенки
     # ---------------------------------------------------------------------------------------------------
-
-    plt.figure(figsize=(8, 6))
-    plt.plot(high_grid_dens_k_eps_two_layer_frames[1].YPLUSPrime, high_grid_dens_k_eps_two_layer_frames[1].UPLUS, lw=2,
-             color='red', label=r'$Two\ layer\ model$')
-    plt.plot(high_grid_dens_k_eps_frames[1].YPLUSPrime, high_grid_dens_k_eps_frames[1].UPLUS, lw=2, color='blue',
-             label=r'$Standard\ wall$')
-    plot_u_plus_theory()
-    set_u_plus_plot()
-    plt.savefig(os.path.join(plots_dir, 'wall_function_comparison_UPLUS_YPLUS_log_profile_line_1.png'))
-
-    plt.figure(figsize=(8, 6))
-    plt.plot(high_grid_dens_k_eps_two_layer_frames[2].X, high_grid_dens_k_eps_two_layer_frames[2].SkinFrictionCoefficient,
-             lw=2, color='red', label=r'$Two\ layer\ model$')
-    plt.plot(high_grid_dens_k_eps_frames[2].X, high_grid_dens_k_eps_frames[2].SkinFrictionCoefficient, lw=2,
-             color='blue', label=r'$Standard\ wall$')
-    plot_friction_coefficient_theory()
-    set_friction_coefficient_plot()
-    plt.savefig(os.path.join(plots_dir, 'wall_function_comparison_friction_coefficient_profile.png'))
+    curves = [CurveSpec('ace', 'high_density_k_eps_two_layer_model', r'$Two\ layer\ model$', 'red'),
+              CurveSpec('ace', 'high_grid_density_k_eps', r'$Standard\ wall$', 'blue')]
+    specs.append(get_u_plus_spec(
+        os.path.join(plots_dir, 'wall_function_comparison_UPLUS_YPLUS_log_profile_line_1.png'), curves))
+    specs.append(get_friction_coefficient_spec(
+        os.path.join(plots_dir, 'wall_function_comparison_friction_coefficient_profile.png'), curves))
 
     # -----------------------------------------------------------------------------------------------------------------
     # графики для различных граничных условий
@@ -289,83 +312,43 @@ if __name__ == '__main__':
     # ///////////////////////////
     # модель Спаларта
     # ///////////////////////////
-    plt.figure(figsize=(8, 6))
-    plt.plot(very_high_grid_dens_sp_al_farfield_frames[1].YPLUSPrime,
-             very_high_grid_dens_sp_al_farfield_frames[1].UPLUS, lw=2,
-             color='red', label=r'$Farfield\ condition$')
-    plt.plot(very_high_grid_dens_sp_al_frames[1].YPLUSPrime,
-             very_high_grid_dens_sp_al_frames[1].UPLUS, lw=2, color='blue',
-             label=r'$Symmetry\ condition$')
-    plot_u_plus_theory()
-    set_u_plus_plot()
-    plt.title(r'$Spalart\ model$', fontsize=14)
-    plt.savefig(os.path.join(plots_dir, 'bc_comparison_sp_al_UPLUS_YPLUS_log_profile_line_1.png'))
-
-    plt.figure(figsize=(8, 6))
-    plt.plot(very_high_grid_dens_sp_al_farfield_frames[2].X,
-             very_high_grid_dens_sp_al_farfield_frames[2].SkinFrictionCoefficient,
-             lw=2, color='red', label=r'$Farfield\ condition$')
-    plt.plot(very_high_grid_dens_sp_al_frames[2].X,
-             very_high_grid_dens_sp_al_frames[2].SkinFrictionCoefficient, lw=2,
-             color='blue', label=r'$Symmetry\ condition$')
-    plot_friction_coefficient_theory()
-    set_friction_coefficient_plot(ylim=(0., 0.008))
-    plt.title(r'$Spalart\ model$', fontsize=14)
-    plt.savefig(os.path.join(plots_dir, 'bc_comparison_sp_al_friction_coefficient_profile.png'))
+    title = r'$Spalart\ model$'
+    curves = [CurveSpec('ace', 'very_high_density_sp_al_farfield', r'$Farfield\ condition$', 'red'),
+              CurveSpec('ace', 'very_high_density_sp_al', r'$Symmetry\ condition$', 'blue')]
+    specs.append(get_u_plus_spec(
+        os.path.join(plots_dir, 'bc_comparison_sp_al_UPLUS_YPLUS_log_profile_line_1.png'), curves,
+        title=title, title_fontsize=14))
+    specs.append(get_friction_coefficient_spec(
+        os.path.join(plots_dir, 'bc_comparison_sp_al_friction_coefficient_profile.png'), curves,
+        ylim=(0., 0.008), title=title, title_fontsize=14))
 
     # ///////////////////////////
     # модель k-e, standard_wall
     # ///////////////////////////
-    plt.figure(figsize=(8, 6))
-    plt.plot(very_high_grid_dens_k_eps_farfield_frames[1].YPLUSPrime,
-             very_high_grid_dens_k_eps_farfield_frames[1].UPLUS, lw=2,
-             color='red', label=r'$Farfield\ condition$')
-    plt.plot(very_high_grid_dens_k_eps_frames[1].YPLUSPrime,
-             very_high_grid_dens_k_eps_frames[1].UPLUS, lw=2, color='blue',
-             label=r'$Symmetry\ condition$')
-    plot_u_plus_theory()
-    set_u_plus_plot()
-    plt.title(r'$k-\varepsilon\ model,\ standard\ wall$', fontsize=14)
-    plt.savefig(os.path.join(plots_dir, 'bc_comparison_k_eps_UPLUS_YPLUS_log_profile_line_1.png'))
-
-    plt.figure(figsize=(8, 6))
-    plt.plot(very_high_grid_dens_k_eps_farfield_frames[2].X,
-             very_high_grid_dens_k_eps_farfield_frames[2].SkinFrictionCoefficient,
-             lw=2, color='red', label=r'$Farfield\ condition$')
-    plt.plot(very_high_grid_dens_k_eps_frames[2].X,
-             very_high_grid_dens_k_eps_frames[2].SkinFrictionCoefficient, lw=2,
-             color='blue', label=r'$Symmetry\ condition$')
-    plot_friction_coefficient_theory()
-    set_friction_coefficient_plot(ylim=(0., 0.025))
-    plt.title(r'$k-\varepsilon\ model,\ standard\ wall$', fontsize=14)
-    plt.savefig(os.path.join(plots_dir, 'bc_comparison_k_eps_friction_coefficient_profile.png'))
+    title = r'$k-\varepsilon\ model,\ standard\ wall$'
+    curves = [CurveSpec('ace', 'very_high_density_k_eps_farfield', r'$Farfield\ condition$', 'red'),
+              CurveSpec('ace', 'very_high_density_k_eps', r'$Symmetry\ condition$', 'blue')]
+    specs.append(get_u_plus_spec(
+        os.path.join(plots_dir, 'bc_comparison_k_eps_UPLUS_YPLUS_log_profile_line_1.png'), curves,
+        title=title, title_fontsize=14))
+    specs.append(get_friction_coefficient_spec(
+        os.path.join(plots_dir, 'bc_comparison_k_eps_friction_coefficient_profile.png'), curves,
+        ylim=(0., 0.025), title=title, title_fontsize=14))
 
     # ///////////////////////////
     # модель k-e, two layer model
     # ///////////////////////////
-    plt.figure(figsize=(8, 6))
-    plt.plot(very_high_grid_dens_k_eps_two_layer_farfield_frames[1].YPLUSPrime,
-             very_high_grid_dens_k_eps_two_layer_farfield_frames[1].UPLUS, lw=2,
-             color='red', label=r'$Farfield\ condition,\ very\ high\ density$')
-    plt.plot(high_grid_dens_k_eps_two_layer_frames[1].YPLUSPrime,
-             high_grid_dens_k_eps_two_layer_frames[1].UPLUS, lw=2, color='blue',
-             label=r'$Symmetry\ condition,\ high\ density$')
-    plot_u_plus_theory()
-    set_u_plus_plot()
-    plt.title(r'$k-\varepsilon\ model,\ two\ layer\ model$', fontsize=14)
-    plt.savefig(os.path.join(plots_dir, 'bc_comparison_k_eps_two_layer_UPLUS_YPLUS_log_profile_line_1.png'))
-
-    plt.figure(figsize=(8, 6))
-    plt.plot(very_high_grid_dens_k_eps_two_layer_farfield_frames[2].X,
-             very_high_grid_dens_k_eps_two_layer_farfield_frames[2].SkinFrictionCoefficient,
-             lw=2, color='red', label=r'$Farfield\ condition,\ very\ high\ density$')
-    plt.plot(high_grid_dens_k_eps_two_layer_frames[2].X,
-             high_grid_dens_k_eps_two_layer_frames[2].SkinFrictionCoefficient, lw=2,
-             color='blue', label=r'$Symmetry\ condition,\ high\ density$')
-    plot_friction_coefficient_theory()
-    set_friction_coefficient_plot(ylim=(0., 0.01))
-    plt.title(r'$k-\varepsilon\ model,\ two\ layer\ model$', fontsize=14)
-    plt.savefig(os.path.join(plots_dir, 'bc_comparison_k_eps_two_layer_friction_coefficient_profile.png'))
+    title = r'$k-\varepsilon\ model,\ two\ layer\ model$'
+    curves = [CurveSpec('ace', 'very_high_density_k_eps_two_layer_model_farfield',
+                        r'$Farfield\ condition,\ very\ high\ density$', 'red'),
+              CurveSpec('ace', 'high_density_k_eps_two_layer_model', r'$Symmetry\ condition,\ high\ density$',
+                        'blue')]
+    specs.append(get_u_plus_spec(
+        os.path.join(plots_dir, 'bc_comparison_k_eps_two_layer_UPLUS_YPLUS_log_profile_line_1.png'), curves,
+        title=title, title_fontsize=14))
+    specs.append(get_friction_coefficient_spec(
+        os.path.join(plots_dir, 'bc_comparison_k_eps_two_layer_friction_coefficient_profile.png'), curves,
+        ylim=(0., 0.01), title=title, title_fontsize=14))
 
     # ------------------------------------------------------------------------------------------------------
     #  сравнение ace и cfx
@@ -374,68 +357,40 @@ if __name__ == '__main__':
     # ///////////////////////////
     # модель k-e
     # ///////////////////////////
-    plt.figure(figsize=(8, 6))
-    plt.plot(very_high_grid_dens_k_eps_two_layer_farfield_frames[1].YPLUSPrime,
-             very_high_grid_dens_k_eps_two_layer_farfield_frames[1].UPLUS, lw=2,
-             color='red', label=r'$ACE-CFD,\ k-\varepsilon\ model,\ farfield\ bc$')
-    plt.plot(cfx_very_high_dens_k_eps_i1_outlet_frames[1].YPLUSPrime,
-             cfx_very_high_dens_k_eps_i1_outlet_frames[1].UPLUS, lw=2, color='blue',
-             label=r'$CFX,\ k-\varepsilon\ model,\ outlet\ bc$')
-    plot_u_plus_theory()
-    set_u_plus_plot()
-    plt.title('1.6M cells, turbulence intensity = 1%')
-    plt.savefig(os.path.join(plots_dir, 'ace_cfx_comparison_k_eps_int1_UPLUS_YPLUS_log_profile_line_1.png'))
-
-    plt.figure(figsize=(8, 6))
-    plt.plot(very_high_grid_dens_k_eps_two_layer_farfield_frames[2].X,
-             very_high_grid_dens_k_eps_two_layer_farfield_frames[2].SkinFrictionCoefficient,
-             lw=2, color='red', label=r'$ACE-CFD,\ k-\varepsilon\ model,\ farfield\ bc$')
-    plt.plot(cfx_very_high_dens_k_eps_i1_outlet_frames[2].X,
-             cfx_very_high_dens_k_eps_i1_outlet_frames[2].SkinFrictionCoefficient, lw=2,
-             color='blue', label=r'$CFX,\ k-\varepsilon\ model,\ outlet\ bc$')
-    plot_friction_coefficient_theory()
-    set_friction_coefficient_plot(ylim=(0., 0.01))
-    plt.title('1.6M cells, turbulence intensity = 1%')
-    plt.savefig(os.path.join(plots_dir, 'ace_cfx_comparison_k_eps_int1_friction_coefficient_profile.png'))
+    title = '1.6M cells, turbulence intensity = 1%'
+    curves = [CurveSpec('ace', 'very_high_density_k_eps_two_layer_model_farfield',
+                        r'$ACE-CFD,\ k-\varepsilon\ model,\ farfield\ bc$', 'red'),
+              CurveSpec('cfx', 'very_high_density_k_eps_i1_outlet', r'$CFX,\ k-\varepsilon\ model,\ outlet\ bc$',
+                        'blue')]
+    specs.append(get_u_plus_spec(
+        os.path.join(plots_dir, 'ace_cfx_comparison_k_eps_int1_UPLUS_YPLUS_log_profile_line_1.png'), curves,
+        title=title))
+    specs.append(get_friction_coefficient_spec(
+        os.path.join(plots_dir, 'ace_cfx_comparison_k_eps_int1_friction_coefficient_profile.png'), curves,
+        ylim=(0., 0.01), title=title))
 
     # /////////////////////////////////////////////
     # сетка с малым колическтвом ячеек
     # //////////////////////////////////////////////
-    plt.figure(figsize=(8, 6))
-    plt.plot(av_grid_dens_sp_al_frames[1].YPLUSPrime,
-             av_grid_dens_sp_al_frames[1].UPLUS, lw=2,
-             color='red', label=r'$ACE-CFD,\ Spalart\ model$')
-    plt.plot(cfx_average_dens_k_eps_i1_outlet_frames[1].YPLUSPrime,
-             cfx_average_dens_k_eps_i1_outlet_frames[1].UPLUS, lw=2, color='blue',
-             label=r'$CFX,\ k-\varepsilon\ model$')
-    plot_u_plus_theory()
-    set_u_plus_plot()
-    plt.title('1.0M cells, turbulence intensity = 1%')
-    plt.savefig(os.path.join(plots_dir, 'ace_cfx_comparison_av_dens_int1_UPLUS_YPLUS_log_profile_line_1.png'))
-
-    plt.figure(figsize=(8, 6))
-    plt.plot(av_grid_dens_sp_al_frames[2].X,
-             av_grid_dens_sp_al_frames[2].SkinFrictionCoefficient,
-             lw=2, color='red', label=r'$ACE-CFD,\ Spalart\ model$')
-    plt.plot(cfx_average_dens_k_eps_i1_outlet_frames[2].X,
-             cfx_average_dens_k_eps_i1_outlet_frames[2].SkinFrictionCoefficient, lw=2,
-             color='blue', label=r'$CFX,\ k-\varepsilon\ model$')
-    plot_friction_coefficient_theory()
-    set_friction_coefficient_plot(ylim=(0., 0.03))
-    plt.title('1.0M cells, turbulence intensity = 1%')
-    plt.savefig(os.path.join(plots_dir, 'ace_cfx_comparison_av_dens_int1_friction_coefficient_profile.png'))
+    title = '1.0M cells, turbulence intensity = 1%'
+    curves = [CurveSpec('ace', 'average_grid_density_sp_al', r'$ACE-CFD,\ Spalart\ model$', 'red'),
+              CurveSpec('cfx', 'avareage_density_k_eps_i1', r'$CFX,\ k-\varepsilon\ model$', 'blue')]
+    specs.append(get_u_plus_spec(
+        os.path.join(plots_dir, 'ace_cfx_comparison_av_dens_int1_UPLUS_YPLUS_log_profile_line_1.png'), curves,
+        title=title))
+    specs.append(get_friction_coefficient_spec(
+        os.path.join(plots_dir, 'ace_cfx_comparison_av_dens_int1_friction_coefficient_profile.png'), curves,
+        ylim=(0., 0.03), title=title))
 
     # --------------------------------------------------------------------------------
     #   графики для отчета
     # --------------------------------------------------------------------------------
-    plt.figure(figsize=(8, 6))
-    plot_u_plus_theory()
-    set_u_plus_plot()
-    plt.savefig(os.path.join(report_pic_dir, 'u_plus_theory_plot.png'))
+    specs.append(get_u_plus_spec(os.path.join(report_pic_dir, 'u_plus_theory_plot.png'), []))
+    specs.append(get_friction_coefficient_spec(os.path.join(report_pic_dir, 'friction_coefficient_theory.png'), [],
+                                               ylim=(0., 0.008)))
+    return specs
 
-    plt.figure(figsize=(8, 6))
-    plot_friction_coefficient_theory()
-    set_friction_coefficient_plot(ylim=(0., 0.008))
-    plt.savefig(os.path.join(report_pic_dir, 'friction_coefficient_theory'))
 
-    plt.show()
+if __name__ == '__main__':
+    start_trace_from_env()
+    render_plots(get_plot_specs(), registry.load_many, get_theory_curves())
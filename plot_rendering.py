@@ -0,0 +1,166 @@
+from instrumentation import span
+from decimation import decimate_curve
+import numpy as np
+import multiprocessing
+import os
+import typing
+
+
+class CurveSpec:
+    def __init__(self, solver: str, case: str, label: str, color: str, linestyle='-', lw=2):
+        """
+        :param solver: имя решателя, например, 'ace' или 'cfx'
+        :param case: имя расчетного случая
+        :param label: подпись кривой в легенде
+        :param color: цвет кривой
+        :param linestyle: стиль линии
+        :param lw: толщина линии
+        """
+        self.solver = solver
+        self.case = case
+        self.label = label
+        self.color = color
+        self.linestyle = linestyle
+        self.lw = lw
+
+    def get_style(self) -> dict:
+        return {'lw': self.lw, 'color': self.color, 'label': self.label, 'linestyle': self.linestyle}
+
+
+class PlotSpec:
+    """
+    Декларативное описание графика: по какой линии каких расчетов и какие величины откладываются по осям,
+    подписи, пределы, теоретическая зависимость и имя выходного файла.
+    """
+    def __init__(self, filename, curves: typing.List[CurveSpec], line: int, x: str, y: str, xlabel: str, ylabel: str,
+                 xlim=None, ylim=None, xscale='linear', legend_fontsize=10, title=None, title_fontsize=None,
+                 theory=None, figsize=(8, 6), decimate=True):
+        """
+        :param filename: имя файла, в который сохраняется график
+        :param curves: список кривых
+        :param line: номер линии, по которой извлечены данные
+        :param x: имя величины, откладываемой по горизонтальной оси
+        :param y: имя величины, откладываемой по вертикальной оси
+        :param xlabel: подпись горизонтальной оси
+        :param ylabel: подпись вертикальной оси
+        :param xlim: интервал по горизонтальной оси, tuple
+        :param ylim: интервал по вертикальной оси, tuple
+        :param xscale: масштаб горизонтальной оси, 'linear' или 'log'
+        :param legend_fontsize: размер шрифта легенды
+        :param title: заголовок графика
+        :param title_fontsize: размер шрифта заголовка
+        :param theory: имя теоретической зависимости, отображаемой на графике вместе с кривыми
+        :param figsize: размер рисунка в дюймах
+        :param decimate: прореживать ли кривые перед отрисовкой (см. decimation.decimate_curve)
+        """
+        self.filename = filename
+        self.curves = curves
+        self.line = line
+        self.x = x
+        self.y = y
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.xlim = xlim
+        self.ylim = ylim
+        self.xscale = xscale
+        self.legend_fontsize = legend_fontsize
+        self.title = title
+        self.title_fontsize = title_fontsize
+        self.theory = theory
+        self.figsize = figsize
+        self.decimate = decimate
+
+
+# кривая, подготовленная к отрисовке: массивы значений по осям и параметры plt.plot
+CurveData = typing.Tuple[np.ndarray, np.ndarray, dict]
+
+
+class RenderJob:
+    """
+    Задание на отрисовку одного графика, передаваемое в процесс: описание графика и только те массивы,
+    которые на нем отображаются.
+    """
+    def __init__(self, spec: PlotSpec, curves: typing.List[CurveData], theory: typing.List[CurveData]):
+        self.spec = spec
+        self.curves = curves
+        self.theory = theory
+
+
+def get_render_job(spec: PlotSpec, get_frames: typing.Callable, theory: typing.Dict[str, typing.List[CurveData]]) -> \
+        RenderJob:
+    """
+    :param spec: описание графика
+    :param get_frames: функция, возвращающая по списку ключей (solver, case, line) список pandas.DataFrame
+    :param theory: словарь, ставящий в соответствие имени теоретической зависимости список ее кривых
+    """
+    frames = get_frames([(curve.solver, curve.case, spec.line) for curve in spec.curves])
+    curves = []
+    for curve, frame in zip(spec.curves, frames):
+        curves.append((np.array(frame[spec.x]), np.array(frame[spec.y]), curve.get_style()))
+    return RenderJob(spec, curves, theory[spec.theory] if spec.theory is not None else [])
+
+
+def _get_traced_render_job(spec: PlotSpec, get_frames: typing.Callable,
+                           theory: typing.Dict[str, typing.List[CurveData]]) -> RenderJob:
+    with span('get_render_job', filename=spec.filename):
+        return get_render_job(spec, get_frames, theory)
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def render_job(job: RenderJob) -> str:
+    import matplotlib.pyplot as plt
+    spec = job.spec
+    with span('render', filename=spec.filename):
+        fig = plt.figure(figsize=spec.figsize)
+        pixels = (int(np.ceil(spec.figsize[0] * fig.dpi)), int(np.ceil(spec.figsize[1] * fig.dpi)))
+        for x, y, style in job.curves + job.theory:
+            if spec.decimate:
+                x, y = decimate_curve(x, y, pixels, spec.xlim, spec.ylim, spec.xscale)
+            plt.plot(x, y, **style)
+        plt.xlabel(spec.xlabel, fontsize=14)
+        plt.ylabel(spec.ylabel, fontsize=14)
+        plt.grid()
+        plt.xscale(spec.xscale)
+        plt.legend(fontsize=spec.legend_fontsize)
+        if spec.xlim is not None:
+            plt.xlim(*spec.xlim)
+        if spec.ylim is not None:
+            plt.ylim(*spec.ylim)
+        if spec.title is not None:
+            if spec.title_fontsize is not None:
+                plt.title(spec.title, fontsize=spec.title_fontsize)
+            else:
+                plt.title(spec.title)
+        with span('savefig', filename=spec.filename):
+            plt.savefig(spec.filename)
+        plt.close(fig)
+    return spec.filename
+
+
+def render_plots(specs: typing.List[PlotSpec], get_frames: typing.Callable,
+                 theory: typing.Dict[str, typing.List[CurveData]]=None, processes=None) -> typing.List[str]:
+    """
+    Отрисовывает графики в пуле процессов с неинтерактивным backend'ом Agg. Данные загружаются в текущем
+    процессе последовательно для каждого графика, в процессы пула передаются только отображаемые массивы.
+
+    :param specs: список описаний графиков
+    :param get_frames: функция, возвращающая по списку ключей (solver, case, line) список pandas.DataFrame
+    :param theory: словарь, ставящий в соответствие имени теоретической зависимости список ее кривых
+    :param processes: число процессов, по умолчанию равно числу ядер; при processes=1 графики
+        отрисовываются в текущем процессе
+    :return: список имен сохраненных файлов
+    """
+    theory = theory if theory is not None else {}
+    jobs = (_get_traced_render_job(spec, get_frames, theory) for spec in specs)
+    for dirname in {os.path.dirname(spec.filename) for spec in specs}:
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+    if processes == 1:
+        _init_worker()
+        return [render_job(job) for job in jobs]
+    with multiprocessing.Pool(processes, initializer=_init_worker) as pool:
+        return list(pool.imap(render_job, jobs))
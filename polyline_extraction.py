@@ -0,0 +1,410 @@
+from tecplot_lib import PolyLine
+from line_data import CachedLineDataExtractor, LineDataCache, LineBlock
+from instrumentation import span
+import numpy as np
+import os
+import struct
+import typing
+import warnings
+
+# порядок узлов шестигранной ячейки, как в зонах FEBRICK, и их локальные координаты
+hex_local_coordinates = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+                                  [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]], dtype=np.float64)
+
+
+class SolutionZone:
+    """
+    Зона с решением, состоящая из шестигранных ячеек: структурированная (ORDERED) или FEBRICK.
+    """
+    def __init__(self, variables: typing.List[str], data: np.ndarray, cells: np.ndarray):
+        """
+        :param variables: имена переменных
+        :param data: значения переменных в узлах, массив размером (число переменных, число узлов)
+        :param cells: номера узлов ячеек (нумерация с нуля), массив размером (число ячеек, 8)
+        """
+        self.variables = variables
+        self.data = data
+        self.cells = cells
+
+
+def get_ordered_cells(imax: int, jmax: int, kmax: int) -> np.ndarray:
+    """
+    :return: номера узлов ячеек структурированной зоны в порядке FEBRICK, индекс I меняется быстрее всех
+    """
+    assert imax > 1 and jmax > 1 and kmax > 1, 'Only 3D ordered zones are supported'
+    i, j, k = np.meshgrid(np.arange(imax - 1), np.arange(jmax - 1), np.arange(kmax - 1), indexing='ij')
+    i, j, k = i.ravel(order='F'), j.ravel(order='F'), k.ravel(order='F')
+    result = np.empty((len(i), 8), dtype=np.int64)
+    for n, (di, dj, dk) in enumerate(hex_local_coordinates.astype(np.int64)):
+        result[:, n] = (i + di) + (j + dj) * imax + (k + dk) * imax * jmax
+    return result
+
+
+def get_structured_zone(variables: typing.List[str], arrays: typing.List[np.ndarray]) -> SolutionZone:
+    """
+    Создает зону по значениям переменных на структурированной сетке, например, на синтетической.
+
+    :param variables: имена переменных, среди них должны быть X, Y и Z
+    :param arrays: массивы значений переменных размером (IMax, JMax, KMax)
+    """
+    shape = arrays[0].shape
+    data = np.array([np.asarray(array, dtype=np.float64).ravel(order='F') for array in arrays])
+    return SolutionZone(list(variables), data, get_ordered_cells(*shape))
+
+
+def read_npz(filename) -> typing.List[SolutionZone]:
+    """
+    Считывает структурированную сетку, экспортированную в .npz: массив variables с именами переменных
+    и по одному массиву (IMax, JMax, KMax) для каждой переменной.
+    """
+    with np.load(filename) as file:
+        variables = [str(name) for name in file['variables']]
+        return [get_structured_zone(variables, [file[name] for name in variables])]
+
+
+class _BinaryReader:
+    def __init__(self, file):
+        self.file = file
+
+    def read(self, fmt: str, count=1):
+        size = struct.calcsize('<' + fmt) * count
+        buffer = self.file.read(size)
+        if len(buffer) != size:
+            raise ValueError('Unexpected end of file')
+        return struct.unpack('<%s%s' % (count, fmt), buffer)
+
+    def int32(self) -> int:
+        return self.read('i')[0]
+
+    def float32(self) -> float:
+        return self.read('f')[0]
+
+    def string(self) -> str:
+        chars = []
+        while True:
+            char = self.int32()
+            if char == 0:
+                return ''.join(chars)
+            chars.append(chr(char))
+
+    def array(self, dtype, count: int) -> np.ndarray:
+        dtype = np.dtype(dtype).newbyteorder('<')
+        result = np.frombuffer(self.file.read(dtype.itemsize * count), dtype=dtype, count=count)
+        return result
+
+
+# форматы данных переменных бинарного файла Tecplot
+plt_data_formats = {1: np.float32, 2: np.float64, 3: np.int32, 4: np.int16, 5: np.uint8}
+
+plt_zone_marker = 299.0
+plt_end_of_header_marker = 357.0
+plt_ordered_zone = 0
+plt_febrick_zone = 5
+
+
+def read_plt(filename) -> typing.List[SolutionZone]:
+    """
+    Считывает бинарный файл Tecplot версии 112 (#!TDV112) с зонами ORDERED и FEBRICK, значения переменных
+    которых заданы в узлах.
+    """
+    with open(filename, 'rb') as file:
+        magic = file.read(8)
+        if magic != b'#!TDV112':
+            raise NotImplementedError('Unsupported Tecplot binary file version: %s' % magic)
+        reader = _BinaryReader(file)
+        assert reader.int32() == 1, 'Big-endian files are not supported'
+        reader.int32()
+        reader.string()
+        variables = [reader.string() for _ in range(reader.int32())]
+        zone_headers = []
+        while True:
+            marker = reader.float32()
+            if marker == plt_end_of_header_marker:
+                break
+            if marker != plt_zone_marker:
+                raise NotImplementedError('Only zone records are supported in the header, marker %s' % marker)
+            reader.string()
+            reader.read('i', 2)
+            reader.read('d')
+            reader.int32()
+            zone_type = reader.int32()
+            if reader.int32() == 1 and any(reader.read('i', len(variables))):
+                raise NotImplementedError('Cell-centered variables are not supported')
+            if reader.int32() != 0:
+                raise NotImplementedError('Face neighbors are not supported')
+            if zone_type == plt_ordered_zone:
+                if reader.int32() != 0:
+                    raise NotImplementedError('Face neighbor connections are not supported')
+                header = {'type': zone_type, 'shape': reader.read('i', 3)}
+            elif zone_type == plt_febrick_zone:
+                if reader.int32() != 0:
+                    raise NotImplementedError('Face neighbor connections are not supported')
+                num_points, num_elements = reader.read('i', 2)
+                reader.read('i', 3)
+                header = {'type': zone_type, 'num_points': num_points, 'num_elements': num_elements}
+            else:
+                raise NotImplementedError('Zone type %s is not supported' % zone_type)
+            while reader.int32() == 1:
+                reader.string()
+                reader.int32()
+                reader.string()
+            zone_headers.append(header)
+        zones = []
+        for header in zone_headers:
+            assert reader.float32() == plt_zone_marker, 'Zone marker is expected in the data section'
+            formats = reader.read('i', len(variables))
+            if reader.int32() == 1 and any(reader.read('i', len(variables))):
+                raise NotImplementedError('Passive variables are not supported')
+            if reader.int32() == 1 and any(share != -1 for share in reader.read('i', len(variables))):
+                raise NotImplementedError('Variable sharing is not supported')
+            share_connectivity = reader.int32()
+            reader.read('d', 2 * len(variables))
+            if header['type'] == plt_ordered_zone:
+                num_points = int(np.prod(header['shape']))
+            else:
+                num_points = header['num_points']
+            data = np.empty((len(variables), num_points), dtype=np.float64)
+            for n, data_format in enumerate(formats):
+                data[n] = reader.array(plt_data_formats[data_format], num_points)
+            if header['type'] == plt_ordered_zone:
+                cells = get_ordered_cells(*header['shape'])
+            else:
+                if share_connectivity != -1:
+                    raise NotImplementedError('Connectivity sharing is not supported')
+                cells = reader.array(np.int32, 8 * header['num_elements']).reshape(-1, 8).astype(np.int64)
+            zones.append(SolutionZone(variables, data, cells))
+    return zones
+
+
+# функции чтения файлов с решением по их расширению
+solution_readers = {'.plt': read_plt, '.npz': read_npz}
+
+
+def read_solution_file(filename) -> typing.List[SolutionZone]:
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in solution_readers:
+        raise NotImplementedError('Unsupported solution file: %s' % filename)
+    return solution_readers[extension](filename)
+
+
+def get_polyline_points(polyline: PolyLine) -> np.ndarray:
+    """
+    :return: координаты numpoints точек, равномерно распределенных по длине полилинии, массив (numpoints, 3)
+    """
+    nodes = np.array([[node.x, node.y, node.z] for node in polyline.nodes], dtype=np.float64)
+    length = np.append(0, np.cumsum(np.linalg.norm(np.diff(nodes, axis=0), axis=1)))
+    s = np.linspace(0, length[-1], polyline.numpoints)
+    return np.array([np.interp(s, length, nodes[:, n]) for n in range(3)]).T
+
+
+def get_hex_weights(local: np.ndarray) -> np.ndarray:
+    """
+    :param local: локальные координаты точек в ячейках, массив (..., 3)
+    :return: веса трилинейной интерполяции по узлам ячеек, массив (..., 8)
+    """
+    local = local[..., np.newaxis, :]
+    factors = np.where(hex_local_coordinates == 1, local, 1 - local)
+    return factors.prod(axis=-1)
+
+
+def get_hex_weight_derivatives(local: np.ndarray) -> np.ndarray:
+    """
+    :return: производные весов по локальным координатам, массив (..., 8, 3)
+    """
+    local = local[..., np.newaxis, :]
+    factors = np.where(hex_local_coordinates == 1, local, 1 - local)
+    signs = np.where(hex_local_coordinates == 1, 1., -1.)
+    result = np.empty(factors.shape[:-2] + (8, 3))
+    for n in range(3):
+        other = [m for m in range(3) if m != n]
+        result[..., n] = signs[:, n] * factors[..., other[0]] * factors[..., other[1]]
+    return result
+
+
+class CellLocator:
+    """
+    Поиск ячеек, содержащих заданные точки, и интерполяция в них значений переменных. Кандидаты определяются
+    по KD-дереву центров ячеек, локальные координаты точек в кандидатах находятся векторизованными итерациями
+    Ньютона для обратного трилинейного отображения.
+    """
+    def __init__(self, zones: typing.List[SolutionZone], num_candidates=8, newton_iterations=12, tolerance=1e-6):
+        """
+        :param zones: зоны с решением, набор переменных во всех зонах должен быть одинаков
+        :param num_candidates: число ближайших по центру ячеек, проверяемых для каждой точки
+        :param newton_iterations: число итераций Ньютона
+        :param tolerance: допуск на выход локальных координат за пределы [0, 1]
+        """
+        from scipy.spatial import cKDTree
+        self.variables = zones[0].variables
+        offsets = np.cumsum([0] + [zone.data.shape[1] for zone in zones[:-1]])
+        self.data = np.concatenate([zone.data for zone in zones], axis=1)
+        self.cells = np.concatenate([zone.cells + offset for zone, offset in zip(zones, offsets)])
+        self.coordinates = np.array([self.data[self.variables.index(name)] for name in ('X', 'Y', 'Z')]).T
+        self.tree = cKDTree(self.coordinates[self.cells].mean(axis=1))
+        self.num_candidates = num_candidates
+        self.newton_iterations = newton_iterations
+        self.tolerance = tolerance
+
+    def _get_local_coordinates(self, points: np.ndarray, cells: np.ndarray) -> np.ndarray:
+        nodes = self.coordinates[self.cells[cells]]
+        local = np.full(points.shape, 0.5)
+        with np.errstate(all='ignore'):
+            for _ in range(self.newton_iterations):
+                local = self._newton_step(points, nodes, local)
+        return local
+
+    @staticmethod
+    def _newton_step(points: np.ndarray, nodes: np.ndarray, local: np.ndarray) -> np.ndarray:
+        residual = points - np.einsum('...a,...ai->...i', get_hex_weights(local), nodes)
+        jacobian = np.einsum('...ai,...aj->...ij', nodes, get_hex_weight_derivatives(local))
+        regular = np.abs(np.linalg.det(jacobian)) > 1e-300
+        step = np.zeros_like(local)
+        step[regular] = np.linalg.solve(jacobian[regular], residual[regular][..., np.newaxis])[..., 0]
+        local = local + step
+        # для вырожденных ячеек локальные координаты не определены, точка в них не ищется
+        local[~regular] = np.nan
+        return local
+
+    def locate(self, points: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :param points: координаты точек, массив (число точек, 3)
+        :return: маска найденных точек, номера содержащих их ячеек и веса интерполяции для найденных точек
+        """
+        num_candidates = min(self.num_candidates, len(self.cells))
+        candidates = self.tree.query(points, k=num_candidates)[1].reshape(len(points), num_candidates)
+        repeated = np.repeat(points[:, np.newaxis, :], num_candidates, axis=1)
+        local = self._get_local_coordinates(repeated, candidates)
+        inside = np.all((local >= -self.tolerance) & (local <= 1 + self.tolerance), axis=-1)
+        found = inside.any(axis=1)
+        first = inside.argmax(axis=1)[found]
+        cells = candidates[found, first]
+        weights = get_hex_weights(np.clip(local[found, first], 0, 1))
+        return found, cells, weights
+
+    def interpolate(self, points: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: маска найденных точек и значения всех переменных в них, массив (число переменных, число точек);
+            переменные X, Y, Z равны координатам точек
+        """
+        found, cells, weights = self.locate(points)
+        values = np.einsum('pa,vpa->vp', weights, self.data[:, self.cells[cells]])
+        for n, name in enumerate(('X', 'Y', 'Z')):
+            values[self.variables.index(name)] = points[found, n]
+        return found, values
+
+
+def _format_rows(data: np.ndarray) -> str:
+    return ''.join('%s \n' % ' '.join('%23.15G' % value for value in row) for row in data.T)
+
+
+def _format_header(variables: typing.List[str]) -> str:
+    return 'VARIABLES = %s\n' % '\n '.join('"%s"' % name for name in variables)
+
+
+def _format_data_types(variables: typing.List[str]) -> str:
+    return 'DT=(%s)\n' % ','.join(['DOUBLE'] * len(variables))
+
+
+def format_line_data(variables: typing.List[str], data: np.ndarray) -> str:
+    """
+    :return: текст файла в формате, который Tecplot записывает при извлечении данных по полилинии
+    """
+    return _format_header(variables) + 'ZONE\n' + _format_data_types(variables) + _format_rows(data)
+
+
+def format_line_block(block: LineBlock) -> str:
+    """
+    :return: текст файла, содержащего все линии блока, по одной зоне на линию
+    """
+    result = _format_header(block.variables)
+    for n, (name, length) in enumerate(zip(block.zone_names, block.lengths)):
+        result += 'ZONE T="%s", I=%s\n' % (name, length) + _format_data_types(block.variables)
+        result += _format_rows(block.line(n))
+    return result
+
+
+def write_line_data_file(filename, variables: typing.List[str], data: np.ndarray):
+    with open(filename, 'w') as file:
+        file.write(format_line_data(variables, data))
+
+
+def write_line_block_file(filename, block: LineBlock):
+    with open(filename, 'w') as file:
+        file.write(format_line_block(block))
+
+
+class NativeLineDataExtractor(CachedLineDataExtractor):
+    """
+    Аналог LineDataExtractor, извлекающий данные по полилиниям без Tecplot: файлы с решением (.plt версии 112
+    или экспортированная структурированная сетка .npz) считываются напрямую, а результат записывается в .dat
+    файлы того же формата и с теми же именами. Все полилинии набора данных обрабатываются за один проход;
+    при multi_zone=True они записываются в один файл <имя>_lines.dat с отдельной зоной для каждой полилинии,
+    который заменяет файлы отдельных линий. Точки полилиний, не попавшие ни в одну ячейку, в файлы не
+    записываются; о таких точках выдается предупреждение, а если их доля больше max_lost_fraction,
+    извлечение прерывается.
+    """
+    def __init__(self, datafiles_dir, output_dir, polylines_list: typing.List[typing.List[PolyLine]], macro_name=None,
+                 num_candidates=8, multi_zone=False, max_lost_fraction=0.01):
+        """
+        :param datafiles_dir: имя директории, в которой располагаются файлы с решением
+        :param output_dir: имя директории для извлеченных данных
+        :param polylines_list: список наборов полилиний, по одному для каждого файла с решением
+        :param macro_name: не используется, сохранен для совместимости с LineDataExtractor
+        :param num_candidates: число проверяемых для каждой точки ячеек
+        :param multi_zone: записывать ли все полилинии набора данных в один файл
+        :param max_lost_fraction: наибольшая допустимая доля точек полилинии, не найденных в ячейках
+        """
+        CachedLineDataExtractor.__init__(self, datafiles_dir, output_dir, polylines_list, macro_name)
+        self.num_candidates = num_candidates
+        self.multi_zone = multi_zone
+        self.max_lost_fraction = max_lost_fraction
+
+    def get_data_filenames(self) -> typing.List[str]:
+        result = sorted(filename for filename in os.listdir(self.datafiles_dir)
+                        if os.path.splitext(filename)[1].lower() in solution_readers)
+        assert len(self.polylines_list) == len(result), \
+            'Number of data files and number of sets of polylines must be same'
+        return result
+
+    def extract_block(self, filename, polylines: typing.List[PolyLine]) -> LineBlock:
+        """
+        :return: данные по всем полилиниям набора данных, полученные за один проход
+        """
+        locator = CellLocator(read_solution_file(os.path.join(self.datafiles_dir, filename)), self.num_candidates)
+        points = [get_polyline_points(polyline) for polyline in polylines]
+        found, values = locator.interpolate(np.concatenate(points))
+        line_numbers = np.repeat(np.arange(len(points)), [len(line_points) for line_points in points])
+        for n, line_points in enumerate(points):
+            lost = len(line_points) - np.count_nonzero(found[line_numbers == n])
+            if lost:
+                message = '%s, line %s: %s of %s points are outside the solution zones' % \
+                          (filename, n, lost, len(line_points))
+                if lost > self.max_lost_fraction * len(line_points):
+                    raise RuntimeError(message)
+                warnings.warn(message)
+        offsets = np.searchsorted(line_numbers[found], np.arange(len(points)))
+        return LineBlock(locator.variables, values, offsets.tolist())
+
+    def extract(self, filename, polylines: typing.List[PolyLine]):
+        block = self.extract_block(filename, polylines)
+        name = os.path.splitext(filename)[0]
+        block_filename = os.path.join(self.output_dir, name + '_lines.dat')
+        line_filenames = [os.path.join(self.output_dir, name + '_line_%s.dat' % n) for n in range(len(block))]
+        # загрузчик читает все .dat файлы папки, поэтому каждая линия должна храниться только в одном файле
+        for stale_filename in line_filenames if self.multi_zone else [block_filename]:
+            if os.path.exists(stale_filename):
+                os.remove(stale_filename)
+        if self.multi_zone:
+            write_line_block_file(block_filename, block)
+            return
+        for n, line_filename in enumerate(line_filenames):
+            write_line_data_file(line_filename, block.variables, block.line(n))
+
+    def run_extraction(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        with span('run_extraction', datafiles_dir=self.datafiles_dir):
+            for filename, polylines in zip(self.get_data_filenames(), self.polylines_list):
+                with span('extract', filename=filename):
+                    self.extract(filename, polylines)
+        with span('cache_update', dirname=self.output_dir):
+            LineDataCache(self.output_dir).update_all()
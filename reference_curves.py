@@ -0,0 +1,261 @@
+"""
+Кэш теоретических зависимостей: коэффициента трения по формулам Шлихтинга, Шульца-Грунова, Прандтля и Хьюза
+и закона стенки. Вычисленная кривая хранится по ключу (зависимость, интервал, состояние в ядре потока, число
+точек, масштаб), давно не использовавшиеся кривые вытесняются; при заданной папке кривые также сохраняются
+на диск. Объем кэша в памяти и на диске ограничен в байтах. Состояние в ядре потока может быть задано
+массивами - тогда кривые для всех состояний вычисляются сразу, как двумерный массив (число состояний, число
+точек).
+"""
+from plot_creation import CoreState, get_schlichting_friction_coefficient, get_schultz_grunov_friction_coefficient, \
+    get_prandtl_friction_coefficient, get_hughes_friction_coefficient, get_u_plus_theory
+import numpy as np
+import collections
+import hashlib
+import os
+import typing
+
+if typing.TYPE_CHECKING:
+    from case_registry import CaseRegistry
+
+# зависимости коэффициента трения от числа Рейнольдса Re_x
+friction_coefficient_correlations = {
+    'Schlichting': get_schlichting_friction_coefficient,
+    'Schultz_Grunov': get_schultz_grunov_friction_coefficient,
+    'Prandtl': get_prandtl_friction_coefficient,
+    'Hughes': get_hughes_friction_coefficient,
+}
+
+# зависимости от Y+, не зависящие от состояния в ядре потока
+wall_law_correlations = {
+    'u_plus': get_u_plus_theory,
+}
+
+# папка для хранения кривых на диске
+default_cache_dir = os.path.join('.cache', 'reference_curves')
+
+# x - значения координаты X (или Y+), Re - числа Рейнольдса Re_x (None для закона стенки)
+ReferenceCurve = collections.namedtuple('ReferenceCurve', ['x', 'Re', 'values'])
+
+
+def get_curve_key(correlation: str, x_range: tuple, core_state: CoreState, resolution: int, scale: str) -> str:
+    digest = hashlib.sha1(repr((correlation, tuple(float(value) for value in x_range), resolution, scale)).encode())
+    if core_state is not None:
+        for value in core_state:
+            array = np.asarray(value, dtype=np.float64)
+            digest.update(repr(array.shape).encode())
+            digest.update(array.tobytes())
+    return '%s_%s' % (correlation, digest.hexdigest())
+
+
+def get_coordinate(x_range: tuple, resolution: int, scale='linear') -> np.ndarray:
+    """
+    :param scale: 'linear' - равномерные точки на интервале x_range, 'log' - равномерные по логарифму точки
+        на интервале 10 ** x_range[0] ... 10 ** x_range[1]
+    """
+    if scale == 'log':
+        return np.array(np.logspace(x_range[0], x_range[1], resolution))
+    return np.array(np.linspace(x_range[0], x_range[1], resolution))
+
+
+def get_reynolds_numbers(x: np.ndarray, core_state: CoreState) -> np.ndarray:
+    """
+    :return: числа Рейнольдса Re_x; при состоянии в ядре потока, заданном массивами длины n, - массив
+        (n, число точек)
+    """
+    U0, RHO0, Vislam0 = [np.asarray(value, dtype=np.float64) for value in core_state]
+    if U0.ndim:
+        U0, RHO0, Vislam0 = U0[:, np.newaxis], RHO0[:, np.newaxis], Vislam0[:, np.newaxis]
+    return RHO0 * x * U0 / Vislam0
+
+
+def get_correlation_values(correlation: str, x: np.ndarray, Re_x: np.ndarray=None) -> np.ndarray:
+    if correlation in wall_law_correlations:
+        return wall_law_correlations[correlation](x)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return friction_coefficient_correlations[correlation](Re_x)
+
+
+def evaluate_curve(correlation: str, x_range: tuple, core_state: CoreState=None, resolution=1500,
+                   scale='linear') -> ReferenceCurve:
+    """
+    Вычисляет кривую без кэширования; при состоянии в ядре потока, заданном массивами длины n, значения
+    и числа Рейнольдса имеют размер (n, resolution).
+    """
+    x = get_coordinate(x_range, resolution, scale)
+    Re_x = get_reynolds_numbers(x, core_state) if correlation not in wall_law_correlations else None
+    return ReferenceCurve(x, Re_x, get_correlation_values(correlation, x, Re_x))
+
+
+class ReferenceCurveCache:
+    """
+    Кривые и числа Рейнольдса хранятся отдельными записями: числа Рейнольдса одного состояния в ядре потока
+    общие для всех зависимостей коэффициента трения. Объем записей в памяти ограничен max_bytes, давно не
+    использовавшиеся записи вытесняются. На диск записываются только записи не больше max_disk_entry_bytes
+    (кривые для больших наборов состояний быстрее вычислить заново, чем считать), общий объем файлов
+    ограничен max_disk_bytes, давно не использовавшиеся файлы удаляются.
+    """
+    def __init__(self, max_bytes=256 * 2 ** 20, dirname=None, max_disk_bytes=256 * 2 ** 20,
+                 max_disk_entry_bytes=16 * 2 ** 20):
+        """
+        :param max_bytes: наибольший объем массивов, хранимых в памяти
+        :param dirname: папка для хранения кривых на диске, по умолчанию кривые хранятся только в памяти
+        :param max_disk_bytes: наибольший объем файлов в папке dirname
+        :param max_disk_entry_bytes: наибольший объем записи, сохраняемой на диск
+        """
+        self.max_bytes = max_bytes
+        self.dirname = dirname
+        self.max_disk_bytes = max_disk_bytes
+        self.max_disk_entry_bytes = max_disk_entry_bytes
+        self._entries = collections.OrderedDict()
+        self._sizes = {}
+        self.nbytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _get_filename(self, key: str) -> str:
+        return os.path.join(self.dirname, key + '.npz')
+
+    def _read(self, key: str) -> typing.Optional[typing.Dict[str, np.ndarray]]:
+        if self.dirname is None or not os.path.exists(self._get_filename(key)):
+            return None
+        filename = self._get_filename(key)
+        # время изменения файла - время последнего использования, по нему удаляются давно не использовавшиеся
+        os.utime(filename)
+        with np.load(filename) as archive:
+            return {name: archive[name] for name in archive.files}
+
+    def _write(self, key: str, entry: typing.Dict[str, np.ndarray], nbytes: int):
+        if self.dirname is None or nbytes > self.max_disk_entry_bytes:
+            return
+        os.makedirs(self.dirname, exist_ok=True)
+        filename = self._get_filename(key)
+        with open(filename + '.tmp', 'wb') as file:
+            np.savez(file, **entry)
+        os.replace(filename + '.tmp', filename)
+        self._prune_disk()
+
+    def _prune_disk(self):
+        files = []
+        for name in os.listdir(self.dirname):
+            if name.endswith('.npz'):
+                stat = os.stat(os.path.join(self.dirname, name))
+                files.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(os.path.join(self.dirname, name))
+            total -= size
+
+    def _add(self, key: str, entry: typing.Dict[str, np.ndarray], nbytes: int):
+        if nbytes > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._sizes[key] = nbytes
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            old_key, _ = self._entries.popitem(last=False)
+            self.nbytes -= self._sizes.pop(old_key)
+
+    def _get_entry(self, key: str, evaluate: typing.Callable[[], typing.Dict[str, np.ndarray]], count=True) -> \
+            typing.Dict[str, np.ndarray]:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += count
+            return self._entries[key]
+        entry = self._read(key)
+        if entry is not None:
+            self.disk_hits += count
+            nbytes = sum(array.nbytes for array in entry.values())
+        else:
+            self.misses += count
+            entry = evaluate()
+            nbytes = sum(array.nbytes for array in entry.values())
+            self._write(key, entry, nbytes)
+        for array in entry.values():
+            array.flags.writeable = False
+        self._add(key, entry, nbytes)
+        return entry
+
+    def get(self, correlation: str, x_range: tuple=(0, 8), core_state: CoreState=None, resolution=1500,
+            scale='linear') -> ReferenceCurve:
+        """
+        :param correlation: имя зависимости из friction_coefficient_correlations или wall_law_correlations
+        :param x_range: интервал координаты X (для закона стенки - интервал lg(Y+) при scale='log')
+        :param core_state: скорость, плотность и вязкость в ядре потока, числа или массивы одной длины;
+            для закона стенки не используется
+        :param resolution: число точек
+        :param scale: 'linear' или 'log', см. get_coordinate
+        """
+        if correlation in wall_law_correlations:
+            core_state = None
+        elif correlation not in friction_coefficient_correlations:
+            raise KeyError('Unknown correlation: %s' % correlation)
+        Re_x = None
+        if core_state is not None:
+            Re_x = self._get_entry(
+                get_curve_key('Re_x', x_range, core_state, resolution, scale),
+                lambda: {'Re': get_reynolds_numbers(get_coordinate(x_range, resolution, scale), core_state)},
+                count=False)['Re']
+
+        def evaluate():
+            x = get_coordinate(x_range, resolution, scale)
+            return {'x': x, 'values': get_correlation_values(correlation, x, Re_x)}
+
+        entry = self._get_entry(get_curve_key(correlation, x_range, core_state, resolution, scale), evaluate)
+        return ReferenceCurve(entry['x'], Re_x, entry['values'])
+
+    def get_friction_coefficient_curves(self, core_state: CoreState, x_range: tuple=(0, 8), resolution=1500) -> \
+            typing.Dict[str, ReferenceCurve]:
+        return {name: self.get(name, x_range, core_state, resolution) for name in friction_coefficient_correlations}
+
+    def clear(self):
+        self._entries.clear()
+        self._sizes.clear()
+        self.nbytes = 0
+
+
+reference_curves = ReferenceCurveCache()
+
+
+def get_case_core_states(registry: 'CaseRegistry', cases: typing.List[typing.Tuple[str, str]], line=0) -> \
+        CoreState:
+    """
+    :param cases: расчетные случаи (solver, case)
+    :return: состояния в ядре потока всех расчетных случаев - массивы по числу случаев, определенные, как в
+        plot_creation.get_core_state, по последней точке линии line
+    """
+    from boundary_layer import stack_profiles, get_core_states
+    from wall_units import ace_schema, cfx_schema
+    schemas = {'ace': ace_schema, 'cfx': cfx_schema}
+    frames = registry.load_many([(solver, case, line) for solver, case in cases])
+    result = [np.empty(len(cases)) for _ in CoreState._fields]
+    for solver in {solver for solver, _ in cases}:
+        indexes = [n for n, (case_solver, _) in enumerate(cases) if case_solver == solver]
+        solver_frames = [frames[n] for n in indexes]
+        schema = schemas[solver]
+        states = get_core_states(stack_profiles(solver_frames, 'U'), stack_profiles(solver_frames, schema.density),
+                                 stack_profiles(solver_frames, schema.viscosity))
+        for values, solver_values in zip(result, states):
+            values[indexes] = solver_values
+    return CoreState(*result)
+
+
+if __name__ == '__main__':
+    import time
+    from plot_creation import registry
+    cases = [(key.solver, key.case) for key in registry.keys() if key.line == 0]
+    core_states = get_case_core_states(registry, cases)
+    cache = ReferenceCurveCache(dirname=default_cache_dir)
+    for attempt in range(2):
+        start = time.perf_counter()
+        curves = cache.get_friction_coefficient_curves(core_states)
+        print('%s cases: %.2f ms (hits = %s, disk hits = %s, misses = %s)' %
+              (len(cases), 1e3 * (time.perf_counter() - start), cache.hits, cache.disk_hits, cache.misses))
+    sweep = CoreState(*[np.repeat(value, 1000) * np.linspace(0.9, 1.1, 1000 * len(cases)) for value in core_states])
+    start = time.perf_counter()
+    cache.get_friction_coefficient_curves(sweep)
+    print('%s core states: %.2f ms' % (len(sweep.U0), 1e3 * (time.perf_counter() - start)))
+    for (solver, case), cf in zip(cases, curves['Prandtl'].values):
+        print('%s %-50s Cf_Prandtl(X = 4) = %.5f' % (solver, case, cf[len(cf) // 2]))
@@ -0,0 +1,233 @@
+"""
+Хранение извлеченных данных всего исследования (всех решателей, расчетных случаев и линий) в одном бинарном
+файле. Файл состоит из заголовка, значений переменных, записанных по столбцам (каждый столбец каждой линии -
+отдельный непрерывный участок, выровненный на align байт), и индекса в формате JSON в конце файла. Индекс
+содержит общий для всех решателей словарь имен переменных и для каждой линии - число точек, границы зон,
+смещения столбцов и размер, время изменения и SHA-1 исходного .dat файла, по которым определяется, что файл
+исследования устарел. Файл отображается в память, и несжатые столбцы возвращаются без копирования, поэтому при
+построении графика считываются только страницы файла с отображаемыми величинами.
+"""
+from case_registry import CaseKey, parse_data_filename
+import numpy as np
+import json
+import os
+import struct
+import typing
+import zlib
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+study_filename = os.path.join('extracted_data', 'study.bin')
+
+magic = b'PLTSTUDY'
+version = 2
+header_size = 64
+align = 64
+# смещение индекса, размер индекса, magic
+trailer_format = '<QQ8s'
+
+
+class StudyStoreWriter:
+    """
+    Последовательно записывает линии в файл; индекс записывается при вызове close.
+    """
+    def __init__(self, filename, dtype=np.float64, compression=None, compression_level=6):
+        """
+        :param filename: имя файла
+        :param dtype: тип хранимых значений, например, np.float32
+        :param compression: None или 'zlib'; сжатые столбцы при чтении распаковываются в память
+        :param compression_level: степень сжатия zlib
+        """
+        self.filename = filename
+        self.dtype = np.dtype(dtype)
+        self.compression = compression
+        self.compression_level = compression_level
+        self.variables = []
+        self._variable_ids = {}
+        self.lines = []
+        self._file = open(filename + '.tmp', 'wb')
+        self._file.write(magic + bytes(header_size - len(magic)))
+
+    def _get_variable_id(self, name: str) -> int:
+        if name not in self._variable_ids:
+            self._variable_ids[name] = len(self.variables)
+            self.variables.append(name)
+        return self._variable_ids[name]
+
+    def _write_column(self, values: np.ndarray) -> list:
+        position = self._file.tell()
+        self._file.write(bytes(-position % align))
+        offset = position + (-position % align)
+        data = np.ascontiguousarray(values, dtype=self.dtype.newbyteorder('<')).tobytes()
+        if self.compression == 'zlib':
+            data = zlib.compress(data, self.compression_level)
+        elif self.compression is not None:
+            raise ValueError('Unknown compression: %s' % self.compression)
+        self._file.write(data)
+        return [offset, len(data)]
+
+    def add(self, key: CaseKey, variables: typing.List[str], data: np.ndarray, zone_offsets: typing.List[int]=(0,),
+            source: dict=None):
+        """
+        :param key: ключ линии (solver, case, line)
+        :param variables: имена переменных
+        :param data: значения, массив (число переменных, число точек)
+        :param zone_offsets: индексы первых точек зон
+        :param source: размер, время изменения и SHA-1 исходного файла (get_source_fingerprint)
+        """
+        columns = [[self._get_variable_id(name)] + self._write_column(values)
+                   for name, values in zip(variables, data)]
+        self.lines.append({'solver': key[0], 'case': key[1], 'line': key[2], 'rows': int(data.shape[1]),
+                           'zone_offsets': [int(offset) for offset in zone_offsets], 'columns': columns,
+                           'source': source})
+
+    def close(self):
+        index = json.dumps({'version': version, 'dtype': self.dtype.newbyteorder('<').str,
+                            'compression': self.compression, 'variables': self.variables,
+                            'lines': self.lines}).encode()
+        position = self._file.tell()
+        self._file.write(index)
+        self._file.write(struct.pack(trailer_format, position, len(index), magic))
+        self._file.close()
+        os.replace(self.filename + '.tmp', self.filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self.filename + '.tmp')
+
+
+def get_source_fingerprint(filename) -> dict:
+    from line_data import get_file_hash
+    stat = os.stat(filename)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': get_file_hash(filename)}
+
+
+def export_study(filename, data_dirs: typing.Dict[str, str], columns: typing.Dict[str, typing.List[str]]=None,
+                 dtype=np.float64, compression=None) -> int:
+    """
+    Записывает все .dat файлы папок с извлеченными данными в один файл. Файлы считываются через бинарный
+    кэш (line_data.LineDataCache).
+
+    :param data_dirs: словарь, ставящий в соответствие имени решателя папку с извлеченными данными
+    :param columns: словарь, ставящий в соответствие имени решателя список записываемых переменных,
+        по умолчанию записываются все переменные
+    :param dtype: тип хранимых значений
+    :param compression: None или 'zlib'
+    :return: число записанных линий
+    """
+    from line_data import CachedLineDataLoader
+    columns = columns if columns is not None else {}
+    with StudyStoreWriter(filename, dtype, compression) as writer:
+        for solver, dirname in sorted(data_dirs.items()):
+            loader = CachedLineDataLoader(dirname, columns=columns.get(solver))
+            for name in sorted(os.listdir(dirname)):
+                parsed = parse_data_filename(name)
+                if parsed is not None:
+                    block = loader.load_block(name)
+                    writer.add(CaseKey(solver, *parsed), block.variables, block.data, block.offsets,
+                               get_source_fingerprint(os.path.join(dirname, name)))
+        return len(writer.lines)
+
+
+class StudyStore:
+    """
+    Чтение файла, записанного StudyStoreWriter или export_study.
+    """
+    def __init__(self, filename=study_filename):
+        self.filename = filename
+        self._buffer = np.memmap(filename, dtype=np.uint8, mode='r')
+        index_position, index_size, trailer_magic = struct.unpack(
+            trailer_format, bytes(self._buffer[-struct.calcsize(trailer_format):]))
+        if bytes(self._buffer[:len(magic)]) != magic or trailer_magic != magic:
+            raise ValueError('%s is not a study store file' % filename)
+        index = json.loads(bytes(self._buffer[index_position: index_position + index_size]).decode())
+        if index['version'] != version:
+            raise ValueError('Unsupported study store version: %s' % index['version'])
+        self.dtype = np.dtype(index['dtype'])
+        self.compression = index['compression']
+        self.variables = index['variables']
+        self.lines = {CaseKey(line['solver'], line['case'], line['line']): line for line in index['lines']}
+        self._columns = {key: {self.variables[variable_id]: (offset, size)
+                               for variable_id, offset, size in line['columns']}
+                         for key, line in self.lines.items()}
+
+    def keys(self) -> typing.List[CaseKey]:
+        return sorted(self.lines)
+
+    def get_variables(self, key) -> typing.List[str]:
+        return [self.variables[column[0]] for column in self.lines[CaseKey(*key)]['columns']]
+
+    def get_zone_offsets(self, key) -> typing.List[int]:
+        return self.lines[CaseKey(*key)]['zone_offsets']
+
+    def is_current(self, key, filename) -> bool:
+        """
+        Проверяет, что линия записана из текущего содержимого исходного файла; как и в line_data.LineDataCache,
+        при совпадении размера и времени изменения содержимое не сравнивается.
+
+        :param filename: полное имя исходного .dat файла
+        """
+        source = self.lines[CaseKey(*key)]['source']
+        if source is None:
+            return False
+        stat = os.stat(filename)
+        if stat.st_size != source['size']:
+            return False
+        if stat.st_mtime_ns == source['mtime_ns']:
+            return True
+        from line_data import get_file_hash
+        return get_file_hash(filename) == source['sha1']
+
+    def get_array(self, key, variable: str) -> np.ndarray:
+        """
+        :return: значения переменной на линии; несжатые данные возвращаются без копирования
+            (массив только для чтения, отображенный в память)
+        """
+        columns = self._columns[CaseKey(*key)]
+        if variable not in columns:
+            raise KeyError('%s: no variable %s' % (CaseKey(*key), variable))
+        offset, size = columns[variable]
+        data = self._buffer[offset: offset + size]
+        if self.compression == 'zlib':
+            return np.frombuffer(zlib.decompress(bytes(data)), dtype=self.dtype)
+        return data.view(self.dtype)
+
+    def frame(self, key, columns: typing.List[str]=None) -> 'pd.DataFrame':
+        import pandas as pd
+        columns = columns if columns is not None else self.get_variables(key)
+        return pd.DataFrame({name: self.get_array(key, name) for name in columns}, columns=columns, copy=False)
+
+    def load_many(self, keys, columns: typing.List[str]=None) -> typing.List['pd.DataFrame']:
+        return [self.frame(key, columns) for key in keys]
+
+
+def get_load_timing_report(filename, data_dirs: typing.Dict[str, str]) -> str:
+    """
+    Сравнивает время загрузки всех линий через бинарный кэш .dat файлов и из файла исследования.
+    """
+    import time
+    from line_data import CachedLineDataLoader
+    start = time.perf_counter()
+    for dirname in data_dirs.values():
+        CachedLineDataLoader(dirname).load()
+    cache_time = time.perf_counter() - start
+    start = time.perf_counter()
+    store = StudyStore(filename)
+    frames = store.load_many(store.keys())
+    store_time = time.perf_counter() - start
+    return '%s: %s lines, %.1f MB\n    %-20s %8.3f s\n    %-20s %8.3f s  (x%.1f)\n' % (
+        filename, len(frames), os.path.getsize(filename) / 2 ** 20, 'binary cache', cache_time, 'study store',
+        store_time, cache_time / store_time)
+
+
+if __name__ == '__main__':
+    data_dirs = {'ace': os.path.join('extracted_data', 'ace'), 'cfx': os.path.join('extracted_data', 'cfx')}
+    print('%s lines exported' % export_study(study_filename, data_dirs))
+    print(get_load_timing_report(study_filename, data_dirs))
@@ -0,0 +1,199 @@
+"""
+Параллельное выполнение макросов Tecplot в пакетном режиме: работа разбивается на отдельные макросы (по одному
+на набор данных или рисунок), которые выполняются одновременно несколькими процессами Tecplot.
+"""
+from tecplot_lib import PolyLine, LineDataExtractor, wrap_macro, get_data_file_extraction_macro_body
+import tecplot_lib
+from line_data import CachedLineDataExtractor, LineDataCache
+from instrumentation import span
+import collections
+import concurrent.futures
+import os
+import subprocess
+import time
+import typing
+
+# команда запуска Tecplot в пакетном режиме с выполнением макроса; может быть задана переменной окружения
+# TECPLOT_EXECUTABLE, например, 'python fake_tecplot.py' для проверки без Tecplot
+default_executable = os.environ.get('TECPLOT_EXECUTABLE', 'tec360')
+batch_args = ('-b', '-p')
+
+JobResult = collections.namedtuple('JobResult', ['name', 'status', 'attempts', 'duration', 'error'])
+
+
+class MacroJob:
+    def __init__(self, name: str, macro: str, macro_filename, outputs: typing.List[str],
+                 inputs: typing.List[str]=()):
+        """
+        :param name: имя задания
+        :param macro: текст макроса
+        :param macro_filename: имя файла, в который записывается макрос
+        :param outputs: имена файлов, создаваемых макросом
+        :param inputs: имена файлов, которые читает макрос
+        """
+        self.name = name
+        self.macro = macro
+        self.macro_filename = macro_filename
+        self.outputs = outputs
+        self.inputs = inputs
+
+    def is_up_to_date(self) -> bool:
+        """
+        :return: True, если макрос не изменился с прошлого выполнения, а все выходные файлы существуют и
+            новее входных файлов и файла макроса
+        """
+        if not os.path.exists(self.macro_filename) or not all(os.path.exists(name) for name in self.outputs):
+            return False
+        with open(self.macro_filename, 'r') as file:
+            if file.read() != self.macro:
+                return False
+        sources = [self.macro_filename] + [name for name in self.inputs if os.path.exists(name)]
+        return min(os.path.getmtime(name) for name in self.outputs) >= \
+            max(os.path.getmtime(name) for name in sources)
+
+
+class TecplotBatchScheduler:
+    """
+    Выполняет задания MacroJob в пуле из processes одновременно работающих процессов Tecplot. Задания,
+    результаты которых актуальны, пропускаются; задание, завершившееся с ошибкой, по таймауту или не
+    создавшее выходные файлы, повторяется до retries раз.
+    """
+    def __init__(self, executable=None, args: typing.Sequence[str]=batch_args, processes=None, timeout=None,
+                 retries=1, force=False):
+        """
+        :param executable: команда запуска Tecplot (может содержать аргументы, разделенные пробелами),
+            по умолчанию default_executable
+        :param args: аргументы пакетного режима, после них передается имя макроса
+        :param processes: число одновременно работающих процессов Tecplot, по умолчанию равно числу ядер
+        :param timeout: предельное время выполнения одного макроса в секундах
+        :param retries: число повторных попыток
+        :param force: выполнять ли задания с актуальными результатами
+        """
+        self.executable = executable if executable is not None else default_executable
+        self.args = list(args)
+        self.processes = processes if processes is not None else os.cpu_count()
+        self.timeout = timeout
+        self.retries = retries
+        self.force = force
+
+    def get_command(self, macro_filename) -> typing.List[str]:
+        return self.executable.split() + self.args + [macro_filename]
+
+    def _check_outputs(self, job: MacroJob, start_time: float) -> typing.Optional[str]:
+        missing = [name for name in job.outputs if not os.path.exists(name)]
+        if missing:
+            return 'outputs are not created: %s' % ', '.join(missing)
+        stale = [name for name in job.outputs if os.path.getmtime(name) < start_time - 1]
+        if stale:
+            return 'outputs are not updated: %s' % ', '.join(stale)
+        return None
+
+    def run_job(self, job: MacroJob) -> JobResult:
+        if not self.force and job.is_up_to_date():
+            return JobResult(job.name, 'skipped', 0, 0., None)
+        dirname = os.path.dirname(job.macro_filename)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        with open(job.macro_filename, 'w') as file:
+            file.write(job.macro)
+        start = time.time()
+        error = None
+        for attempt in range(1, self.retries + 2):
+            attempt_start = time.time()
+            with span('execute_macro', macro=job.macro_filename, attempt=attempt):
+                try:
+                    process = subprocess.run(self.get_command(job.macro_filename), stdout=subprocess.PIPE,
+                                             stderr=subprocess.STDOUT, timeout=self.timeout)
+                except subprocess.TimeoutExpired:
+                    error = 'timeout after %s s' % self.timeout
+                    continue
+                except OSError as exception:
+                    # исполняемый файл не найден, повторять бессмысленно
+                    return JobResult(job.name, 'failed', attempt, time.time() - start, str(exception))
+            if process.returncode != 0:
+                error = 'exit code %s: %s' % (process.returncode, process.stdout.decode(errors='replace')[-500:])
+                continue
+            error = self._check_outputs(job, attempt_start)
+            if error is None:
+                return JobResult(job.name, 'done', attempt, time.time() - start, None)
+        # при неудаче макрос удаляется, чтобы задание не считалось актуальным при следующем запуске
+        os.remove(job.macro_filename)
+        return JobResult(job.name, 'failed', self.retries + 1, time.time() - start, error)
+
+    def run(self, jobs: typing.List[MacroJob]) -> typing.List[JobResult]:
+        """
+        :return: результаты заданий в порядке заданий
+        """
+        names = [job.macro_filename for job in jobs]
+        assert len(set(names)) == len(names), 'Macro file names of jobs must be different'
+        with concurrent.futures.ThreadPoolExecutor(max(1, self.processes)) as executor:
+            return list(executor.map(self.run_job, jobs))
+
+
+def get_extraction_jobs(extractor: LineDataExtractor) -> typing.List[MacroJob]:
+    """
+    :return: по одному заданию на каждый файл с решением; макрос задания называется так же, как макрос
+        извлекателя, с добавлением имени файла
+    """
+    data_filenames = sorted(os.listdir(extractor.datafiles_dir))
+    assert len(extractor.polylines_list) == len(data_filenames), \
+        'Number of data files and number of sets of polylines must be same'
+    macro_name, extension = os.path.splitext(extractor.macro_name)
+    result = []
+    for filename, polylines in zip(data_filenames, extractor.polylines_list):
+        name = os.path.splitext(filename)[0]
+        data_filename = os.path.join(extractor.datafiles_dir, filename)
+        macro = wrap_macro(get_data_file_extraction_macro_body(data_filename, polylines, extractor.output_dir))
+        outputs = [os.path.join(extractor.output_dir, '%s_line_%s.dat' % (name, n)) for n in range(len(polylines))]
+        result.append(MacroJob(name, macro, '%s_%s%s' % (macro_name, name, extension), outputs, [data_filename]))
+    return result
+
+
+def get_picture_macro(picture_creator) -> str:
+    """
+    :return: макрос, который создает PictureCreator.run_creation (при этом макрос только записывается в файл
+        picture_creator.macro_filename, но не выполняется; файл затем удаляется)
+    """
+    execute_macro = tecplot_lib.execute_macro
+    tecplot_lib.execute_macro = lambda filename: None
+    try:
+        picture_creator.run_creation()
+    finally:
+        tecplot_lib.execute_macro = execute_macro
+    with open(picture_creator.macro_filename, 'r') as file:
+        macro = file.read()
+    os.remove(picture_creator.macro_filename)
+    return macro
+
+
+def get_picture_job(picture_creator, name: str=None) -> MacroJob:
+    """
+    Формирует задание из макроса, который создает PictureCreator.run_creation.
+    """
+    macro = get_picture_macro(picture_creator)
+    exportfname = picture_creator.export_settings.exportfname
+    return MacroJob(name if name is not None else os.path.basename(exportfname), macro,
+                    picture_creator.macro_filename, [exportfname], [picture_creator.source_file])
+
+
+class BatchLineDataExtractor(CachedLineDataExtractor):
+    """
+    Аналог LineDataExtractor, извлекающий данные каждого файла с решением отдельным макросом; макросы
+    выполняются параллельно планировщиком TecplotBatchScheduler.
+    """
+    def __init__(self, datafiles_dir, output_dir, polylines_list: typing.List[typing.List[PolyLine]], macro_name,
+                 scheduler: TecplotBatchScheduler=None):
+        CachedLineDataExtractor.__init__(self, datafiles_dir, output_dir, polylines_list, macro_name)
+        self.scheduler = scheduler if scheduler is not None else TecplotBatchScheduler()
+        self.results = []
+
+    def run_extraction(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        with span('run_extraction', datafiles_dir=self.datafiles_dir, processes=self.scheduler.processes):
+            self.results = self.scheduler.run(get_extraction_jobs(self))
+        with span('cache_update', dirname=self.output_dir):
+            LineDataCache(self.output_dir).update_all()
+        failed = [result for result in self.results if result.status == 'failed']
+        if failed:
+            raise RuntimeError('Extraction failed for %s' % ', '.join('%s (%s)' % (result.name, result.error)
+                                                                      for result in failed))
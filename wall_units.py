@@ -0,0 +1,105 @@
+from instrumentation import span
+import numpy as np
+import collections
+import typing
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+# соответствие величин, необходимых для расчета в универсальных координатах, столбцам данных решателя;
+# если коэффициент трения решателем не записывается (skin_friction = None), он вычисляется по касательному
+# напряжению на стенке wall_shear
+WallSchema = collections.namedtuple('WallSchema', ['density', 'viscosity', 'skin_friction', 'wall_shear'])
+
+ace_schema = WallSchema(density='RHO', viscosity='Vislam', skin_friction='SkinFrictionCoefficient', wall_shear=None)
+cfx_schema = WallSchema(density='Density', viscosity='Dynamic Viscosity', skin_friction=None,
+                        wall_shear='X Wall Shear')
+
+# имя столбца коэффициента трения в дополненных данных
+skin_friction_column = 'SkinFrictionCoefficient'
+
+# номера линий, направленных по нормали к стенке, для остальных линий величины в универсальных координатах
+# не имеют смысла
+wall_normal_lines = (0, 1)
+
+
+def get_wall_indexes(z: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    :param z: массив расстояний до стенки для нескольких профилей, записанных подряд
+    :param offsets: индексы начала профилей в массиве z
+    :return: индексы точек на стенке, по одной для каждого профиля (первая точка с минимальным |Z|)
+    """
+    abs_z = np.abs(z)
+    lengths = np.diff(np.append(offsets, len(z)))
+    min_z = np.minimum.reduceat(abs_z, offsets)
+    wall_points = np.flatnonzero(abs_z == np.repeat(min_z, lengths))
+    return wall_points[np.searchsorted(wall_points, offsets)]
+
+
+def _stack(frames: typing.List['pd.DataFrame'], column: str) -> np.ndarray:
+    return np.concatenate([np.asarray(frame[column], dtype=np.float64) for frame in frames])
+
+
+def _unstack(frames: typing.List['pd.DataFrame'], column: str, values: np.ndarray, offsets: np.ndarray):
+    for frame, frame_values in zip(frames, np.split(values, offsets[1:])):
+        frame[column] = frame_values
+
+
+def get_offsets(frames: typing.List['pd.DataFrame']) -> np.ndarray:
+    return np.cumsum([0] + [len(frame) for frame in frames[:-1]])
+
+
+def add_skin_friction_coefficient(frames: typing.List['pd.DataFrame'], schema: WallSchema, u_ref):
+    """
+    Добавляет в данные решателя, не записывающего коэффициент трения, столбец SkinFrictionCoefficient,
+    вычисленный по касательному напряжению на стенке и скорости u_ref.
+    """
+    if not frames or schema.skin_friction is not None:
+        return
+    offsets = get_offsets(frames)
+    cf = 2 * _stack(frames, schema.wall_shear) / (_stack(frames, schema.density) * u_ref ** 2)
+    _unstack(frames, skin_friction_column, cf, offsets)
+
+
+def add_wall_units(frames: typing.List['pd.DataFrame'], schema: WallSchema, u_ref):
+    """
+    Добавляет в профили, направленные по нормали к стенке, столбцы UPLUS, YPLUSPrime и TAU. Величины на стенке
+    определяются один раз для каждого профиля, расчет выполняется за один проход по объединенным массивам
+    всех профилей.
+
+    :param frames: список профилей
+    :param schema: соответствие величин столбцам данных решателя
+    :param u_ref: скорость, по которой определен коэффициент трения
+    """
+    if not frames:
+        return
+    offsets = get_offsets(frames)
+    lengths = np.array([len(frame) for frame in frames])
+    z = _stack(frames, 'Z')
+    wall = get_wall_indexes(z, offsets)
+    density = np.repeat(_stack(frames, schema.density)[wall], lengths)
+    viscosity = np.repeat(_stack(frames, schema.viscosity)[wall], lengths)
+    cf = np.repeat(_stack(frames, schema.skin_friction or skin_friction_column)[wall], lengths)
+    u_tau = u_ref * np.sqrt(cf / 2)
+    _unstack(frames, 'UPLUS', _stack(frames, 'U') / u_tau, offsets)
+    _unstack(frames, 'YPLUSPrime', density / viscosity * z * u_tau, offsets)
+    _unstack(frames, 'TAU', 0.5 * density * u_ref ** 2 * cf, offsets)
+
+
+def apply_wall_units(keys: typing.List[tuple], frames: typing.List['pd.DataFrame'], schema: WallSchema, u_ref,
+                     skin_friction_u_ref=None):
+    """
+    Дополняет загруженные линии производными величинами: коэффициентом трения (для всех линий, если решатель
+    его не записывает) и величинами в универсальных координатах (только для линий wall_normal_lines).
+
+    :param keys: ключи линий (solver, case, line)
+    :param frames: данные линий
+    :param schema: соответствие величин столбцам данных решателя
+    :param u_ref: скорость, по которой определяются величины в универсальных координатах
+    :param skin_friction_u_ref: скорость, по которой коэффициент трения вычисляется из касательного
+        напряжения, по умолчанию равна u_ref
+    """
+    with span('derive', lines=len(frames)):
+        add_skin_friction_coefficient(frames, schema,
+                                      skin_friction_u_ref if skin_friction_u_ref is not None else u_ref)
+        add_wall_units([frame for key, frame in zip(keys, frames) if key[2] in wall_normal_lines], schema, u_ref)